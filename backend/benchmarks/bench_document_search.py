@@ -0,0 +1,122 @@
+"""Document search: unanchored $regex scan versus the documents_text index.
+
+Seeds a throwaway database with synthetic documents (once), then times
+both search paths and reports how many documents each one examined.
+Needs a running MongoDB at MONGO_URL. Run from the backend directory:
+
+    python -m benchmarks.bench_document_search --documents 1000000
+"""
+from motor.motor_asyncio import AsyncIOMotorClient
+from config import settings
+from datetime import datetime, timedelta, timezone
+import argparse
+import asyncio
+import random
+import statistics
+import time
+
+WORDS = [
+    "finance", "report", "annual", "market", "analysis", "crypto", "ledger", "contract",
+    "legal", "template", "invoice", "tax", "audit", "strategy", "growth", "startup",
+    "pitch", "deck", "research", "paper", "thesis", "physics", "biology", "history",
+    "marketing", "plan", "budget", "forecast", "risk", "compliance", "policy", "manual",
+    "guide", "python", "database", "network", "security", "design", "pattern", "study"
+]
+CATEGORIES = ["finance", "legal", "education", "technology", "business"]
+
+def synthetic_document(i: int, rng: random.Random) -> dict:
+    created_at = datetime(2024, 1, 1, tzinfo=timezone.utc) + timedelta(minutes=i)
+    return {
+        "id": f"bench-{i}",
+        "title": " ".join(rng.choices(WORDS, k=4)),
+        "description": " ".join(rng.choices(WORDS, k=20)),
+        "category": rng.choice(CATEGORIES),
+        "price": round(rng.uniform(1, 500), 2),
+        "tags": rng.sample(WORDS, 3),
+        "status": "approved" if rng.random() < 0.8 else "pending",
+        "created_at": created_at.isoformat(),
+        "updated_at": created_at.isoformat()
+    }
+
+async def seed(collection, total: int):
+    existing = await collection.estimated_document_count()
+    if existing >= total:
+        return
+    rng = random.Random(42)
+    batch = []
+    for i in range(existing, total):
+        batch.append(synthetic_document(i, rng))
+        if len(batch) == 10000:
+            await collection.insert_many(batch, ordered=False)
+            batch = []
+    if batch:
+        await collection.insert_many(batch, ordered=False)
+
+    await collection.create_index([("status", 1), ("created_at", -1)])
+    await collection.create_index(
+        [("title", "text"), ("tags", "text"), ("description", "text")],
+        weights={"title": 10, "tags": 5, "description": 1},
+        name="documents_text"
+    )
+
+def regex_query(term: str) -> dict:
+    # The previous get_documents search path
+    return {
+        "status": "approved",
+        "$or": [
+            {"title": {"$regex": term, "$options": "i"}},
+            {"description": {"$regex": term, "$options": "i"}},
+            {"tags": {"$in": [term]}}
+        ]
+    }
+
+async def time_path(collection, name: str, terms, build):
+    latencies = []
+    examined = []
+    for term in terms:
+        query, projection, sort = build(term)
+        started = time.perf_counter()
+        await collection.find(query, projection).sort(sort).limit(20).to_list(20)
+        latencies.append((time.perf_counter() - started) * 1000)
+
+        plan = await collection.find(query, projection).sort(sort).limit(20).explain()
+        examined.append(plan["executionStats"]["totalDocsExamined"])
+
+    latencies.sort()
+    print(
+        f"{name:>6}: p50={statistics.median(latencies):8.1f}ms "
+        f"p99={latencies[int(0.99 * (len(latencies) - 1))]:8.1f}ms "
+        f"docs examined/query={statistics.mean(examined):12,.0f}"
+    )
+
+async def main(total: int, queries: int):
+    client = AsyncIOMotorClient(settings.MONGO_URL)
+    collection = client[f"{settings.DB_NAME}_bench"]["documents"]
+
+    started = time.perf_counter()
+    await seed(collection, total)
+    print(f"seeded {total:,} documents in {time.perf_counter() - started:.1f}s")
+
+    rng = random.Random(7)
+    terms = [rng.choice(WORDS) for _ in range(queries)]
+
+    await time_path(
+        collection, "regex", terms,
+        lambda term: (regex_query(term), {"_id": 0}, [("created_at", -1)])
+    )
+    await time_path(
+        collection, "text", terms,
+        lambda term: (
+            {"status": "approved", "$text": {"$search": term}},
+            {"_id": 0, "score": {"$meta": "textScore"}},
+            [("score", {"$meta": "textScore"}), ("created_at", -1)]
+        )
+    )
+    client.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--documents", type=int, default=1000000)
+    parser.add_argument("--queries", type=int, default=50)
+    args = parser.parse_args()
+    asyncio.run(main(args.documents, args.queries))
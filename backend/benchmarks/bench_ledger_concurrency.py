@@ -0,0 +1,90 @@
+"""Concurrent wallet locks: read-then-write versus the conditional ledger update.
+
+Seeds wallets that can each afford ``--affordable`` locks, then fires
+``--attempts`` concurrent lock requests per wallet through the previous
+find_one + update_one sequence and through services.ledger. Reports
+throughput and how many wallets ended up with locked_balance above
+balance. Needs a running MongoDB at MONGO_URL. Run from the backend
+directory:
+
+    python -m benchmarks.bench_ledger_concurrency --wallets 1000 --attempts 20 --affordable 5
+"""
+from motor.motor_asyncio import AsyncIOMotorClient
+from fastapi import HTTPException
+from services.ledger import ledger
+from services.money import type_registry
+from config import settings
+from datetime import timezone
+import argparse
+import asyncio
+import time
+
+AMOUNT = 100.0
+
+async def legacy_lock(db, user_id: str, amount: float):
+    # The previous route body: check in Python, then $inc separately
+    wallet = await db.wallets.find_one({"user_id": user_id}, {"_id": 0})
+    if wallet["balance"] - wallet["locked_balance"] < amount:
+        raise HTTPException(status_code=400, detail="Insufficient available balance")
+    await db.wallets.update_one({"user_id": user_id}, {"$inc": {"locked_balance": amount}})
+
+async def seed(db, wallets: int, affordable: int):
+    await db.wallets.drop()
+    await db.ledger_entries.drop()
+    await db.wallets.insert_many([
+        {"user_id": f"user-{i}", "balance": AMOUNT * affordable, "locked_balance": 0.0}
+        for i in range(wallets)
+    ])
+    await db.wallets.create_index("user_id", unique=True)
+
+async def run(lock, db, wallets: int, attempts: int, concurrency: int) -> dict:
+    semaphore = asyncio.Semaphore(concurrency)
+    outcomes = {"locked": 0, "rejected": 0}
+
+    async def attempt(user_id: str):
+        async with semaphore:
+            try:
+                await lock(db, user_id, AMOUNT)
+                outcomes["locked"] += 1
+            except HTTPException:
+                outcomes["rejected"] += 1
+
+    # Interleave users so each wallet sees its requests at the same time
+    requests = [f"user-{i}" for _ in range(attempts) for i in range(wallets)]
+    started = time.perf_counter()
+    await asyncio.gather(*(attempt(user_id) for user_id in requests))
+    elapsed = time.perf_counter() - started
+
+    outcomes["overdrawn"] = await db.wallets.count_documents(
+        {"$expr": {"$gt": ["$locked_balance", "$balance"]}}
+    )
+    outcomes["ops_per_second"] = len(requests) / elapsed
+    return outcomes
+
+async def main(wallets: int, attempts: int, affordable: int, concurrency: int):
+    client = AsyncIOMotorClient(settings.MONGO_URL, tz_aware=True, tzinfo=timezone.utc, type_registry=type_registry)
+    db = client[f"{settings.DB_NAME}_bench"]
+
+    for name, lock in (("read-then-write", legacy_lock), ("ledger", ledger.lock)):
+        await seed(db, wallets, affordable)
+        result = await run(lock, db, wallets, attempts, concurrency)
+        print(
+            f"{name:16s} {result['ops_per_second']:9.0f} ops/s  "
+            f"locked {result['locked']:7d}  rejected {result['rejected']:7d}  "
+            f"overdrawn wallets {result['overdrawn']}"
+        )
+
+    # The ledger must grant exactly what each wallet can afford
+    assert result["overdrawn"] == 0
+    assert result["locked"] == wallets * min(attempts, affordable)
+
+    client.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--wallets", type=int, default=1000)
+    parser.add_argument("--attempts", type=int, default=20)
+    parser.add_argument("--affordable", type=int, default=5)
+    parser.add_argument("--concurrency", type=int, default=200)
+    args = parser.parse_args()
+    asyncio.run(main(args.wallets, args.attempts, args.affordable, args.concurrency))
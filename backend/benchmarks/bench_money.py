@@ -0,0 +1,100 @@
+"""Float money versus exact Decimal / int64 minor-unit money.
+
+Times the batch math of an investment settlement (returns per position)
+and a document sale (one share per investor) three ways: the previous
+per-row float loop, a per-row Decimal loop and the vectorised int64
+minor-unit path in services.money. Also reports how far each drifts from
+the exact total, and with --mongo compares $inc throughput on double and
+Decimal128 wallet balances against MONGO_URL. Run from the backend
+directory:
+
+    python -m benchmarks.bench_money --rows 1000000 [--mongo --wallets 1000 --increments 20000]
+"""
+from motor.motor_asyncio import AsyncIOMotorClient
+from services.money import (
+    to_money, from_minor, minor_array, rate_array, percent_of_minor, type_registry
+)
+from config import settings
+from datetime import timezone
+from decimal import Decimal, ROUND_HALF_EVEN
+import argparse
+import asyncio
+import random
+import time
+
+def float_returns(amounts, rates) -> float:
+    # The previous MaturityEngine body: one float multiply per position
+    return sum(amount * (rate / 100) for amount, rate in zip(amounts, rates))
+
+def decimal_returns(amounts, rates) -> Decimal:
+    return sum(
+        (to_money(amount) * Decimal(repr(rate)) / 100).quantize(Decimal("0.01"), rounding=ROUND_HALF_EVEN)
+        for amount, rate in zip(amounts, rates)
+    )
+
+def minor_returns(amounts, rates) -> Decimal:
+    returns = percent_of_minor(minor_array(amounts), rate_array(rates))
+    return from_minor(returns.sum())
+
+def timed(fn, *args):
+    started = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - started
+
+async def bench_mongo(wallets: int, increments: int, concurrency: int):
+    client = AsyncIOMotorClient(settings.MONGO_URL, tz_aware=True, tzinfo=timezone.utc, type_registry=type_registry)
+    db = client[f"{settings.DB_NAME}_bench"]
+    semaphore = asyncio.Semaphore(concurrency)
+
+    for name, zero, step in (("double", 0.0, 0.1), ("Decimal128", Decimal("0.00"), Decimal("0.10"))):
+        await db.money_wallets.drop()
+        await db.money_wallets.insert_many([{"user_id": f"user-{i}", "balance": zero} for i in range(wallets)])
+        await db.money_wallets.create_index("user_id", unique=True)
+
+        async def increment(user_id: str):
+            async with semaphore:
+                await db.money_wallets.update_one({"user_id": user_id}, {"$inc": {"balance": step}})
+
+        user_ids = [f"user-{i % wallets}" for i in range(increments)]
+        started = time.perf_counter()
+        await asyncio.gather(*(increment(user_id) for user_id in user_ids))
+        elapsed = time.perf_counter() - started
+
+        wallet = await db.money_wallets.find_one({"user_id": "user-0"})
+        print(f"$inc {name:11s} {increments / elapsed:9.0f} ops/s  user-0 balance {wallet['balance']!r}")
+
+    await db.money_wallets.drop()
+    client.close()
+
+def main(rows: int):
+    # Two-place amounts and rates as the API accepts them
+    amounts = [random.randint(1, 1000000) / 100 for _ in range(rows)]
+    rates = [random.choice((8, 12, 15, 3.3333, 12.5)) for _ in range(rows)]
+
+    exact, _ = timed(decimal_returns, amounts, rates)
+    for name, fn in (("float loop", float_returns), ("Decimal loop", decimal_returns), ("int64 minor", minor_returns)):
+        total, elapsed = timed(fn, amounts, rates)
+        drift = abs(Decimal(repr(total)) - exact) if isinstance(total, float) else abs(total - exact)
+        print(f"{name:13s} {rows / elapsed:11.0f} rows/s  total {total}  off by {drift}")
+
+    # The cent-rounded paths must agree exactly
+    assert minor_returns(amounts, rates) == exact
+
+    # Classic drift: ten cents added a million times
+    steps = 1000000
+    float_total = 0.0
+    for _ in range(steps):
+        float_total += 0.1
+    print(f"0.10 x {steps}: float {float_total!r}, minor units {from_minor(minor_array([0.1] * steps).sum())}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1000000)
+    parser.add_argument("--mongo", action="store_true")
+    parser.add_argument("--wallets", type=int, default=1000)
+    parser.add_argument("--increments", type=int, default=20000)
+    parser.add_argument("--concurrency", type=int, default=200)
+    args = parser.parse_args()
+    main(args.rows)
+    if args.mongo:
+        asyncio.run(bench_mongo(args.wallets, args.increments, args.concurrency))
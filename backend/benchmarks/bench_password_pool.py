@@ -0,0 +1,99 @@
+"""Latency of an unrelated endpoint while a login storm is running.
+
+Compares bcrypt verification inline on the event loop with the bounded
+password worker pool. Run from the backend directory:
+
+    python -m benchmarks.bench_password_pool --concurrency 32 --duration 5
+"""
+from fastapi import FastAPI, HTTPException
+from security import hash_password, verify_password, verify_password_async
+from services.password_pool import password_pool
+import argparse
+import asyncio
+import statistics
+import time
+import httpx
+
+PASSWORD = "correct horse battery staple"
+
+def build_app(password_hash: str) -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/balance")
+    async def balance():
+        return {"balance": 0.0}
+
+    @app.post("/login-inline")
+    async def login_inline():
+        return {"ok": verify_password(PASSWORD, password_hash)}
+
+    @app.post("/login-pool")
+    async def login_pool():
+        return {"ok": await verify_password_async(PASSWORD, password_hash)}
+
+    return app
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+async def run_scenario(app: FastAPI, login_path: str, concurrency: int, duration: float) -> dict:
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        deadline = time.perf_counter() + duration
+        logins = 0
+        rejected = 0
+        probe_latencies = []
+
+        async def storm():
+            nonlocal logins, rejected
+            while time.perf_counter() < deadline:
+                resp = await client.post(login_path)
+                if resp.status_code == 503:
+                    rejected += 1
+                    await asyncio.sleep(0.01)
+                else:
+                    logins += 1
+
+        async def probe():
+            while time.perf_counter() < deadline:
+                started = time.perf_counter()
+                await client.get("/balance")
+                probe_latencies.append((time.perf_counter() - started) * 1000)
+                await asyncio.sleep(0.01)
+
+        await asyncio.gather(probe(), *(storm() for _ in range(concurrency)))
+
+    return {
+        "logins_per_sec": logins / duration,
+        "rejected": rejected,
+        "probe_p50_ms": statistics.median(probe_latencies),
+        "probe_p99_ms": percentile(probe_latencies, 99),
+        "probe_max_ms": max(probe_latencies),
+        "probe_samples": len(probe_latencies)
+    }
+
+async def main(concurrency: int, duration: float):
+    app = build_app(hash_password(PASSWORD))
+
+    for name, path in (("inline", "/login-inline"), ("pool", "/login-pool")):
+        result = await run_scenario(app, path, concurrency, duration)
+        print(
+            f"{name:>6}: {result['logins_per_sec']:7.1f} logins/s  "
+            f"rejected={result['rejected']:<5d} "
+            f"/balance p50={result['probe_p50_ms']:7.2f}ms "
+            f"p99={result['probe_p99_ms']:7.2f}ms "
+            f"max={result['probe_max_ms']:7.2f}ms "
+            f"(n={result['probe_samples']})"
+        )
+
+    print(f"pool stats: {password_pool.stats()}")
+    password_pool.shutdown()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--duration", type=float, default=5.0)
+    args = parser.parse_args()
+    asyncio.run(main(args.concurrency, args.duration))
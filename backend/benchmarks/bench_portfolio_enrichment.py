@@ -0,0 +1,85 @@
+"""Round trips per document-investment portfolio request.
+
+Counts the MongoDB commands issued while enriching a portfolio with
+document titles, per-investment lookups versus services.enrichment.
+Needs a running MongoDB at MONGO_URL. Run from the backend directory:
+
+    python -m benchmarks.bench_portfolio_enrichment --sizes 1 10 100 1000
+"""
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import monitoring
+from services.enrichment import attach_documents
+from config import settings
+import argparse
+import asyncio
+import time
+
+class CommandCounter(monitoring.CommandListener):
+    def __init__(self):
+        self.count = 0
+
+    def started(self, event):
+        self.count += 1
+
+    def succeeded(self, event):
+        pass
+
+    def failed(self, event):
+        pass
+
+async def load_portfolio(db, user_id: str):
+    return await db.document_investments.find(
+        {"user_id": user_id},
+        {"_id": 0}
+    ).sort("created_at", -1).to_list(None)
+
+async def enrich_per_row(db, investments):
+    # The previous get_document_investment_portfolio loop
+    for inv in investments:
+        document = await db.documents.find_one({"id": inv["document_id"]}, {"_id": 0})
+        if document:
+            inv["document_title"] = document["title"]
+            inv["document_revenue"] = document.get("revenue", 0)
+    return investments
+
+async def seed(db, user_id: str, size: int):
+    await db.documents.delete_many({})
+    await db.document_investments.delete_many({})
+    await db.documents.insert_many([
+        {"id": f"doc-{i}", "title": f"Document {i}", "revenue": float(i)} for i in range(size)
+    ])
+    await db.document_investments.insert_many([
+        {"id": f"inv-{i}", "user_id": user_id, "document_id": f"doc-{i}", "created_at": f"2024-01-01T00:{i % 60:02d}:00"}
+        for i in range(size)
+    ])
+    await db.documents.create_index("id")
+    await db.document_investments.create_index([("user_id", 1), ("created_at", -1)])
+
+async def measure(db, counter: CommandCounter, enrich, user_id: str):
+    counter.count = 0
+    started = time.perf_counter()
+    await enrich(db, await load_portfolio(db, user_id))
+    return counter.count, (time.perf_counter() - started) * 1000
+
+async def main(sizes):
+    counter = CommandCounter()
+    client = AsyncIOMotorClient(settings.MONGO_URL, event_listeners=[counter])
+    db = client[f"{settings.DB_NAME}_bench"]
+    user_id = "bench-user"
+
+    for size in sizes:
+        await seed(db, user_id, size)
+        per_row = await measure(db, counter, enrich_per_row, user_id)
+        batched = await measure(db, counter, attach_documents, user_id)
+        print(
+            f"{size:6d} investments: per-row {per_row[0]:5d} round trips {per_row[1]:8.1f}ms | "
+            f"batched {batched[0]:3d} round trips {batched[1]:8.1f}ms"
+        )
+
+    client.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1, 10, 100, 1000])
+    args = parser.parse_args()
+    asyncio.run(main(args.sizes))
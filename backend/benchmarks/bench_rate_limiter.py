@@ -0,0 +1,78 @@
+"""Rate limiter throughput and memory with many distinct client IPs.
+
+Compares the previous per-IP timestamp-list limiter with the in-memory
+sliding-window counter backend. Run from the backend directory:
+
+    python -m benchmarks.bench_rate_limiter --ips 100000 --hits 5
+"""
+from services.rate_limiter import MemoryRateLimitBackend
+import argparse
+import asyncio
+import time
+import tracemalloc
+
+LIMIT = 100
+WINDOW = 60
+
+def list_limiter_hit(storage: dict, key: str, now: float) -> bool:
+    # The previous middleware.rate_limit algorithm
+    if key not in storage:
+        storage[key] = []
+    storage[key] = [t for t in storage[key] if now - t < WINDOW]
+    if len(storage[key]) >= LIMIT:
+        return False
+    storage[key].append(now)
+    return True
+
+def bench_list(keys, hits: int):
+    storage = {}
+    started = time.perf_counter()
+    now = time.time()
+    for i in range(hits):
+        for key in keys:
+            list_limiter_hit(storage, key, now + i * 0.01)
+    return time.perf_counter() - started, storage
+
+async def bench_counter(keys, hits: int):
+    backend = MemoryRateLimitBackend(max_keys=len(keys) * 2)
+    started = time.perf_counter()
+    now = time.time()
+    for i in range(hits):
+        for key in keys:
+            await backend.hit(key, LIMIT, WINDOW, now + i * 0.01)
+    return time.perf_counter() - started, backend
+
+def traced(func, *args):
+    """Run ``func`` again under tracemalloc and return its peak memory"""
+    tracemalloc.start()
+    func(*args)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak
+
+def report(name: str, elapsed: float, checks: int, peak: int):
+    print(
+        f"{name:>8}: {checks / elapsed:12,.0f} checks/s  "
+        f"{elapsed / checks * 1e6:6.2f} us/check  peak memory {peak / 1024 / 1024:7.1f} MiB"
+    )
+
+def main(ips: int, hits: int):
+    keys = [f"routes.auth.login:10.{i >> 16 & 255}.{i >> 8 & 255}.{i & 255}" for i in range(ips)]
+    checks = ips * hits
+
+    elapsed, _ = bench_list(keys, hits)
+    report("list", elapsed, checks, traced(bench_list, keys, hits))
+
+    elapsed, backend = asyncio.run(bench_counter(keys, hits))
+    report("counter", elapsed, checks, traced(lambda: asyncio.run(bench_counter(keys, hits))))
+
+    started = time.perf_counter()
+    removed = asyncio.run(backend.sweep(time.time() + 3 * WINDOW))
+    print(f"   sweep: evicted {removed:,} idle keys in {(time.perf_counter() - started) * 1000:.1f} ms")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--ips", type=int, default=100000)
+    parser.add_argument("--hits", type=int, default=5, help="hits per IP")
+    args = parser.parse_args()
+    main(args.ips, args.hits)
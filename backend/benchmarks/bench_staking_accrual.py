@@ -0,0 +1,103 @@
+"""Staking reward accrual job versus per-request recomputation.
+
+Seeds active staking positions, then times the old GET /staking/rewards
+loop, one full accrual run (pipeline update plus summary $merge) and the
+single-document summary read that replaces the loop. Needs a running
+MongoDB at MONGO_URL. Run from the backend directory:
+
+    python -m benchmarks.bench_staking_accrual --positions 1000000 --users 100000
+"""
+from motor.motor_asyncio import AsyncIOMotorClient
+from services.staking_rewards import staking_accrual
+from services.money import type_registry
+from config import settings
+from datetime import datetime, timedelta, timezone
+import argparse
+import asyncio
+import random
+import statistics
+import time
+
+INSERT_BATCH = 10000
+
+async def legacy_rewards(db, user_id: str) -> dict:
+    # The previous get_staking_rewards body
+    positions = await db.staking_positions.find({"user_id": user_id}, {"_id": 0}).to_list(1000)
+    total_earned = sum(pos.get("rewards_earned", 0) for pos in positions)
+    active_positions = [pos for pos in positions if pos["status"] == "active"]
+    pending_rewards = 0
+    for pos in active_positions:
+        days_staked = (datetime.now(timezone.utc) - pos["created_at"]).days
+        pending_rewards += pos["amount"] * (pos["apy"] / 100) / 365 * days_staked
+    return {"total_earned": total_earned, "pending_rewards": pending_rewards, "active_positions": len(active_positions)}
+
+async def seed(db, positions: int, users: int):
+    await db.staking_positions.drop()
+    await db.staking_summaries.drop()
+    now = datetime.now(timezone.utc)
+    plans = list(settings.STAKING_PLANS.items())
+    batch = []
+    for i in range(positions):
+        plan, config = plans[i % len(plans)]
+        batch.append({
+            "id": f"pos-{i}",
+            "user_id": f"user-{i % users}",
+            "plan": plan,
+            "amount": float(config["min_amount"] * random.randint(1, 10)),
+            "apy": config["apy"],
+            "status": "active",
+            "rewards_earned": 0.0,
+            "created_at": now - timedelta(days=random.randint(0, 365), seconds=random.randint(0, 86399))
+        })
+        if len(batch) == INSERT_BATCH:
+            await db.staking_positions.insert_many(batch, ordered=False)
+            batch = []
+    if batch:
+        await db.staking_positions.insert_many(batch, ordered=False)
+    await db.staking_positions.create_index([("user_id", 1), ("created_at", -1)])
+    await db.staking_positions.create_index("status")
+
+async def time_reads(read, db, user_ids):
+    samples = []
+    for user_id in user_ids:
+        started = time.perf_counter()
+        await read(db, user_id)
+        samples.append((time.perf_counter() - started) * 1000)
+    samples.sort()
+    return statistics.median(samples), samples[int(len(samples) * 0.99) - 1]
+
+async def main(positions: int, users: int, sample: int):
+    client = AsyncIOMotorClient(settings.MONGO_URL, tz_aware=True, tzinfo=timezone.utc, type_registry=type_registry)
+    db = client[f"{settings.DB_NAME}_bench"]
+
+    print(f"Seeding {positions} active positions across {users} users...")
+    await seed(db, positions, users)
+    user_ids = [f"user-{random.randrange(users)}" for _ in range(sample)]
+
+    p50, p99 = await time_reads(legacy_rewards, db, user_ids)
+    print(f"per-request loop   p50 {p50:7.2f}ms  p99 {p99:7.2f}ms")
+
+    started = time.perf_counter()
+    updated = await staking_accrual._accrue(db, {}, datetime.now(timezone.utc))
+    print(f"accrual run        {time.perf_counter() - started:7.1f}s for {updated} positions")
+
+    p50, p99 = await time_reads(staking_accrual.read_summary, db, user_ids)
+    print(f"summary read       p50 {p50:7.2f}ms  p99 {p99:7.2f}ms")
+
+    # Both paths must agree on what a user is owed
+    for user_id in user_ids[:20]:
+        legacy = await legacy_rewards(db, user_id)
+        summary = await staking_accrual.read_summary(db, user_id)
+        # Accrued rewards are rounded to the cent per position
+        assert abs(legacy["pending_rewards"] - float(summary["pending_rewards"])) <= 0.005 * legacy["active_positions"] + 1e-6
+        assert legacy["active_positions"] == summary["active_positions"]
+
+    client.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--positions", type=int, default=1000000)
+    parser.add_argument("--users", type=int, default=100000)
+    parser.add_argument("--sample", type=int, default=1000)
+    args = parser.parse_args()
+    asyncio.run(main(args.positions, args.users, args.sample))
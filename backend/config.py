@@ -9,6 +9,7 @@ class Settings:
     # MongoDB
     MONGO_URL = os.environ['MONGO_URL']
     DB_NAME = os.environ.get('DB_NAME', 'document_exchange')
+    MONGO_USE_TRANSACTIONS = os.environ.get('MONGO_USE_TRANSACTIONS', 'true').lower() == 'true'
     
     # Security
     JWT_SECRET_KEY = os.environ.get('JWT_SECRET_KEY', 'your-secret-key-change-in-production-min-32-chars-long')
@@ -16,15 +17,65 @@ class Settings:
     ACCESS_TOKEN_EXPIRE_MINUTES = 30
     REFRESH_TOKEN_EXPIRE_DAYS = 7
     
+    # Authenticated principal cache
+    PRINCIPAL_CACHE_TTL = int(os.environ.get('PRINCIPAL_CACHE_TTL', 30))  # seconds
+    PRINCIPAL_CACHE_SIZE = int(os.environ.get('PRINCIPAL_CACHE_SIZE', 10000))
+    
+    # Password hashing worker pool
+    PASSWORD_HASH_WORKERS = int(os.environ.get('PASSWORD_HASH_WORKERS', 4))
+    PASSWORD_HASH_MAX_QUEUE = int(os.environ.get('PASSWORD_HASH_MAX_QUEUE', 64))
+    
     # CORS
     CORS_ORIGINS = os.environ.get('CORS_ORIGINS', '*').split(',')
     
     # Rate Limiting
     RATE_LIMIT_PER_MINUTE = 100
+    RATE_LIMIT_BACKEND = os.environ.get('RATE_LIMIT_BACKEND', 'memory')  # memory, mongo
+    RATE_LIMIT_MAX_KEYS = int(os.environ.get('RATE_LIMIT_MAX_KEYS', 200000))
+    RATE_LIMIT_SWEEP_INTERVAL = 60  # seconds
+    
+    # Audit logs are buffered and written in batches
+    AUDIT_QUEUE_SIZE = int(os.environ.get('AUDIT_QUEUE_SIZE', 10000))
+    AUDIT_QUEUE_POLICY = os.environ.get('AUDIT_QUEUE_POLICY', 'block')  # block, drop
+    AUDIT_BATCH_SIZE = 500
+    AUDIT_FLUSH_INTERVAL = 1.0  # seconds
+    # Monthly audit partitions older than this are archived to gzip JSONL
+    AUDIT_HOT_MONTHS = int(os.environ.get('AUDIT_HOT_MONTHS', 6))
+    AUDIT_ARCHIVE_DIR = Path(os.environ.get('AUDIT_ARCHIVE_DIR', ROOT_DIR / 'audit_archive'))
+    AUDIT_ARCHIVE_INTERVAL = 86400  # seconds
+    # A worker's claim on a partition it is archiving expires after this
+    AUDIT_ARCHIVE_LEASE = int(os.environ.get('AUDIT_ARCHIVE_LEASE', 3600))  # seconds
+    
+    # Whole-response cache for public GET endpoints (services.response_cache)
+    RESPONSE_CACHE_ENABLED = os.environ.get('RESPONSE_CACHE_ENABLED', 'true').lower() == 'true'
+    RESPONSE_CACHE_SIZE = int(os.environ.get('RESPONSE_CACHE_SIZE', 5000))
+    
+    # Conditional wallet updates retry transient driver errors
+    LEDGER_MAX_RETRIES = 3
+    LEDGER_RETRY_BACKOFF = 0.05  # seconds, doubled per attempt
+    # Every wallet is reconciled against its ledger entries daily
+    LEDGER_AUDIT_INTERVAL = int(os.environ.get('LEDGER_AUDIT_INTERVAL', 86400))  # seconds
+    LEDGER_AUDIT_CONCURRENCY = 32
+    
+    # Admin batch processing of deposit and withdrawal requests
+    ADMIN_BATCH_MAX_SIZE = int(os.environ.get('ADMIN_BATCH_MAX_SIZE', 1000))
+    
+    # Pagination
+    PAGINATION_COUNT_CACHE_TTL = 60  # seconds a filtered listing total is reused
+    
+    # Per-user transaction summaries, invalidated on new transactions
+    TRANSACTION_SUMMARY_CACHE_TTL = int(os.environ.get('TRANSACTION_SUMMARY_CACHE_TTL', 300))  # seconds
+    TRANSACTION_SUMMARY_CACHE_SIZE = 10000
+    TRANSACTION_SUMMARY_MAX_VARIANTS = 16  # bucket/date-range combinations kept per user
+    
+    # Platform analytics counters are rebuilt from source collections
+    METRICS_RECONCILE_INTERVAL = int(os.environ.get('METRICS_RECONCILE_INTERVAL', 3600))  # seconds
     
     # File Upload
     MAX_FILE_SIZE = 100 * 1024 * 1024  # 100MB
     ALLOWED_FILE_TYPES = ['.pdf', '.doc', '.docx', '.txt', '.xls', '.xlsx', '.ppt', '.pptx', '.zip', '.rar']
+    UPLOAD_CHUNK_SIZE = 1024 * 1024  # 1MB, read and written per step
+    DOWNLOAD_CHUNK_SIZE = 255 * 1024  # One default GridFS chunk per read
     
     # Staking Plans
     STAKING_PLANS = {
@@ -33,6 +84,9 @@ class Settings:
         'vip': {'min_amount': 10000, 'apy': 15, 'lock_days': 180}
     }
     
+    # Pending staking rewards are materialised by a daily job
+    STAKING_ACCRUAL_INTERVAL = int(os.environ.get('STAKING_ACCRUAL_INTERVAL', 86400))  # seconds
+    
     # Investment Packages
     INVESTMENT_PACKAGES = {
         'starter': {'price': 500, 'expected_return': 8, 'duration_days': 60},
@@ -40,6 +94,12 @@ class Settings:
         'premium': {'price': 10000, 'expected_return': 18, 'duration_days': 180}
     }
     
+    # Matured investment positions are settled by a background job
+    MATURITY_SETTLE_INTERVAL = int(os.environ.get('MATURITY_SETTLE_INTERVAL', 60))  # seconds
+    MATURITY_BATCH_SIZE = 500
+    # Batches still settling after this long are treated as abandoned and resumed
+    MATURITY_CLAIM_LEASE = int(os.environ.get('MATURITY_CLAIM_LEASE', MATURITY_SETTLE_INTERVAL * 10))  # seconds
+    
     # Crypto (Mock)
     COINBASE_API_KEY = os.environ.get('COINBASE_API_KEY', 'mock-api-key')
     COINBASE_API_SECRET = os.environ.get('COINBASE_API_SECRET', 'mock-api-secret')
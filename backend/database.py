@@ -1,5 +1,7 @@
 from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorGridFSBucket
+from services.money import type_registry
 from config import settings
+from datetime import timezone
 import logging
 
 logger = logging.getLogger(__name__)
@@ -8,19 +10,39 @@ class Database:
     client: AsyncIOMotorClient = None
     db = None
     fs = None  # GridFS
+    supports_transactions: bool = False
 
 db_instance = Database()
 
+# after_commit callbacks by id() of the session running the transaction
+_commit_hooks = {}
+
 async def connect_to_mongo():
     """Connect to MongoDB"""
     logger.info("Connecting to MongoDB...")
-    db_instance.client = AsyncIOMotorClient(settings.MONGO_URL)
+    # Timestamps are stored as BSON dates and read back as aware UTC datetimes;
+    # money is stored as Decimal128 and read back as Decimal
+    db_instance.client = AsyncIOMotorClient(
+        settings.MONGO_URL, tz_aware=True, tzinfo=timezone.utc, type_registry=type_registry
+    )
     db_instance.db = db_instance.client[settings.DB_NAME]
     db_instance.fs = AsyncIOMotorGridFSBucket(db_instance.db)
+    db_instance.supports_transactions = await _supports_transactions(db_instance.client)
     logger.info("Connected to MongoDB successfully")
-    
-    # Create indexes
-    await create_indexes()
+
+async def _supports_transactions(client) -> bool:
+    """Multi-document transactions need a replica set or sharded cluster"""
+    if not settings.MONGO_USE_TRANSACTIONS:
+        return False
+    try:
+        hello = await client.admin.command("hello")
+    except Exception as e:
+        logger.warning(f"Could not detect MongoDB topology: {e}")
+        return False
+    supported = "setName" in hello or hello.get("msg") == "isdbgrid"
+    if not supported:
+        logger.warning("MongoDB is standalone; multi-document writes will not be atomic")
+    return supported
 
 async def close_mongo_connection():
     """Close MongoDB connection"""
@@ -28,43 +50,42 @@ async def close_mongo_connection():
     db_instance.client.close()
     logger.info("MongoDB connection closed")
 
-async def create_indexes():
-    """Create database indexes for performance and security"""
-    db = db_instance.db
-    
-    # Users indexes
-    await db.users.create_index("email", unique=True)
-    await db.users.create_index("username", unique=True)
-    await db.users.create_index("created_at")
-    
-    # Sessions indexes
-    await db.sessions.create_index("session_token", unique=True)
-    await db.sessions.create_index("user_id")
-    await db.sessions.create_index("expires_at")
-    
-    # Documents indexes
-    await db.documents.create_index("seller_id")
-    await db.documents.create_index("category")
-    await db.documents.create_index("status")
-    await db.documents.create_index("created_at")
-    
-    # Transactions indexes
-    await db.transactions.create_index("user_id")
-    await db.transactions.create_index("type")
-    await db.transactions.create_index("created_at")
-    
-    # Wallets indexes
-    await db.wallets.create_index("user_id", unique=True)
-    
-    # Audit logs indexes
-    await db.audit_logs.create_index("user_id")
-    await db.audit_logs.create_index("action")
-    await db.audit_logs.create_index("timestamp")
-    
-    logger.info("Database indexes created successfully")
-
 def get_database():
     return db_instance.db
 
 def get_gridfs():
     return db_instance.fs
+
+def get_client():
+    return db_instance.client
+
+async def run_in_transaction(callback):
+    """Run ``await callback(session)`` inside a MongoDB transaction
+
+    The driver retries the callback on transient errors, so it must only
+    write through ``session``. On standalone servers the callback runs
+    with ``session=None`` and no atomicity guarantee.
+    """
+    if not db_instance.supports_transactions:
+        return await callback(None)
+    async with await db_instance.client.start_session() as session:
+        async def attempt(session):
+            # A retried attempt starts over, so drop hooks from the last one
+            _commit_hooks[id(session)] = []
+            return await callback(session)
+
+        try:
+            result = await session.with_transaction(attempt)
+            hooks = _commit_hooks.get(id(session), [])
+        finally:
+            _commit_hooks.pop(id(session), None)
+    for hook in hooks:
+        await hook()
+    return result
+
+def after_commit(session, hook):
+    """Run ``await hook()`` once the transaction on ``session`` has committed
+
+    Hooks registered by an attempt that is retried or aborted never run.
+    """
+    _commit_hooks[id(session)].append(hook)
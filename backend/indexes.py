@@ -0,0 +1,102 @@
+from pymongo import IndexModel, ASCENDING, DESCENDING, TEXT
+
+# Every index the application relies on, per collection. services.index_manager
+# diffs this against the live database at startup and builds what is missing.
+INDEXES = {
+    "users": [
+        IndexModel("email", unique=True),
+        IndexModel("username", unique=True),
+        IndexModel("id"),
+        IndexModel([("created_at", DESCENDING), ("_id", DESCENDING)]),
+    ],
+    "sessions": [
+        IndexModel("session_token", unique=True),
+        IndexModel("user_id"),
+        # Expired sessions are purged by the TTL monitor
+        IndexModel("expires_at", expireAfterSeconds=0),
+    ],
+    "documents": [
+        IndexModel("id"),
+        IndexModel("seller_id"),
+        IndexModel("category"),
+        IndexModel("status"),
+        IndexModel([("created_at", DESCENDING), ("_id", DESCENDING)]),
+        IndexModel([("status", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)]),
+        IndexModel(
+            [("title", TEXT), ("tags", TEXT), ("description", TEXT)],
+            weights={"title": 10, "tags": 5, "description": 1},
+            name="documents_text"
+        ),
+    ],
+    "transactions": [
+        IndexModel("user_id"),
+        IndexModel("type"),
+        IndexModel([("created_at", DESCENDING), ("_id", DESCENDING)]),
+        IndexModel([("user_id", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)]),
+        # Already-purchased check and pending deposit/withdrawal lookups
+        IndexModel([("user_id", ASCENDING), ("type", ASCENDING), ("metadata.document_id", ASCENDING), ("status", ASCENDING)]),
+        IndexModel("metadata.position_id", sparse=True),
+        # Deposit and withdrawal requests point here through transaction_id
+        IndexModel("id", unique=True, partialFilterExpression={"id": {"$exists": True}}),
+    ],
+    "wallets": [
+        IndexModel("user_id", unique=True),
+    ],
+    # Append-only double-entry journal; platform-side legs have no user_id
+    "ledger_entries": [
+        IndexModel(
+            [("user_id", ASCENDING), ("seq", ASCENDING), ("account", ASCENDING)],
+            unique=True,
+            partialFilterExpression={"user_id": {"$exists": True}}
+        ),
+        IndexModel("journal_id"),
+        # Positions a maturity journal paid, checked before a batch is resumed
+        IndexModel("ref.position_ids", sparse=True),
+    ],
+    "ledger_snapshots": [
+        IndexModel([("user_id", ASCENDING), ("seq", DESCENDING)], unique=True),
+    ],
+    "crypto_wallets": [
+        IndexModel("id"),
+        IndexModel([("user_id", ASCENDING), ("crypto_type", ASCENDING)]),
+    ],
+    "staking_positions": [
+        IndexModel("id"),
+        IndexModel([("user_id", ASCENDING), ("created_at", DESCENDING)]),
+        IndexModel("status"),
+    ],
+    "investment_positions": [
+        IndexModel("id"),
+        IndexModel([("user_id", ASCENDING), ("created_at", DESCENDING)]),
+        IndexModel([("user_id", ASCENDING), ("status", ASCENDING), ("expires_at", ASCENDING)]),
+        # Maturity scan
+        IndexModel([("status", ASCENDING), ("expires_at", ASCENDING)]),
+        IndexModel("settlement_id", sparse=True),
+    ],
+    "document_investments": [
+        IndexModel("id"),
+        IndexModel("document_id"),
+        IndexModel([("user_id", ASCENDING), ("created_at", DESCENDING)]),
+    ],
+    "kyc_submissions": [
+        IndexModel([("user_id", ASCENDING), ("submitted_at", DESCENDING)]),
+        IndexModel("status"),
+    ],
+    # audit_logs_YYYY_MM partitions index themselves (services.audit_store)
+    # Admin request queues, listed newest first per status. Older rows get
+    # their id from migrations.request_ids, which also makes it unique.
+    "deposit_requests": [
+        IndexModel("id", unique=True),
+        IndexModel([("status", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)]),
+        IndexModel([("user_id", ASCENDING), ("status", ASCENDING)]),
+    ],
+    "withdrawal_requests": [
+        IndexModel("id", unique=True),
+        IndexModel([("status", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)]),
+        IndexModel([("user_id", ASCENDING), ("status", ASCENDING)]),
+    ],
+    # Shared rate limit counters expire on their own
+    "rate_limits": [
+        IndexModel("expires_at", expireAfterSeconds=0),
+    ],
+}
@@ -5,37 +5,23 @@ from security import decode_token
 from database import get_database
 from datetime import datetime, timezone
 from models import UserRole
+from services.rate_limiter import rate_limiter
+from services.principal_cache import principal_cache
+from services.sessions import find_live_session
+from services.dates import as_datetime
+from services.audit_writer import audit_writer
 import logging
 
 logger = logging.getLogger(__name__)
 
-# In-memory rate limiting (simple implementation)
-rate_limit_storage = {}
-
 def rate_limit(max_calls: int = 100, time_window: int = 60):
-    """Rate limiting decorator"""
+    """Rate limiting decorator, counted per route and client IP"""
     def decorator(func):
+        scope = f"{func.__module__}.{func.__name__}"
+        
         @wraps(func)
         async def wrapper(request: Request, *args, **kwargs):
-            client_ip = request.client.host
-            current_time = datetime.now(timezone.utc).timestamp()
-            
-            if client_ip not in rate_limit_storage:
-                rate_limit_storage[client_ip] = []
-            
-            # Remove old entries
-            rate_limit_storage[client_ip] = [
-                t for t in rate_limit_storage[client_ip] 
-                if current_time - t < time_window
-            ]
-            
-            if len(rate_limit_storage[client_ip]) >= max_calls:
-                raise HTTPException(
-                    status_code=status.HTTP_429_TOO_MANY_REQUESTS,
-                    detail="Too many requests. Please try again later."
-                )
-            
-            rate_limit_storage[client_ip].append(current_time)
+            await rate_limiter.check(f"{scope}:{request.client.host}", max_calls, time_window)
             return await func(request, *args, **kwargs)
         return wrapper
     return decorator
@@ -48,10 +34,18 @@ async def get_current_user(request: Request):
     session_token = request.cookies.get("session_token")
     
     if session_token:
-        session = await db.sessions.find_one({"session_token": session_token})
-        if session and session["expires_at"] > datetime.now(timezone.utc):
+        cache_key = principal_cache.session_key(session_token)
+        user = principal_cache.get(cache_key)
+        if user:
+            return user
+        
+        session = await find_live_session(db, session_token)
+        if session:
             user = await db.users.find_one({"id": session["user_id"]}, {"_id": 0})
             if user:
+                # Never cache a session past its own expiry
+                remaining = (as_datetime(session["expires_at"]) - datetime.now(timezone.utc)).total_seconds()
+                principal_cache.put(cache_key, user, ttl=remaining)
                 return user
     
     # Try Authorization header
@@ -73,6 +67,11 @@ async def get_current_user(request: Request):
             headers={"WWW-Authenticate": "Bearer"},
         )
     
+    cache_key = principal_cache.user_key(token_data.user_id)
+    user = principal_cache.get(cache_key)
+    if user:
+        return user
+    
     user = await db.users.find_one({"id": token_data.user_id}, {"_id": 0})
     if user is None:
         raise HTTPException(
@@ -80,6 +79,7 @@ async def get_current_user(request: Request):
             detail="User not found"
         )
     
+    principal_cache.put(cache_key, user)
     return user
 
 async def get_optional_user(request: Request):
@@ -100,7 +100,7 @@ async def require_admin(request: Request):
     return user
 
 async def log_audit(db, user_id: Optional[str], action: str, details: dict, request: Request):
-    """Log audit trail"""
+    """Queue an audit trail entry for the batched writer"""
     try:
         audit_log = {
             "user_id": user_id,
@@ -108,8 +108,8 @@ async def log_audit(db, user_id: Optional[str], action: str, details: dict, requ
             "details": details,
             "ip_address": request.client.host,
             "user_agent": request.headers.get("user-agent"),
-            "timestamp": datetime.now(timezone.utc).isoformat()
+            "timestamp": datetime.now(timezone.utc)
         }
-        await db.audit_logs.insert_one(audit_log)
+        await audit_writer.enqueue(audit_log)
     except Exception as e:
         logger.error(f"Failed to log audit: {e}")
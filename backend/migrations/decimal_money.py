@@ -0,0 +1,90 @@
+"""Convert float money fields to exact Decimal128 amounts.
+
+Walks each collection in _id order and rewrites, in bulk batches, any of
+its money fields still stored as a double (or int) with the two-place
+value services.money.to_money gives it, e.g. 0.30000000000000004 becomes
+0.30. Each update is conditional on the field still holding the number
+that was read, so a concurrent $inc is never overwritten; re-run to pick
+up rows skipped that way. Run from the backend directory:
+
+    python -m migrations.decimal_money [--batch-size 1000] [--dry-run] [collection ...]
+"""
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import UpdateOne
+from services.money import to_money, type_registry
+from config import settings
+from datetime import timezone
+import argparse
+import asyncio
+import time
+
+MONEY_FIELDS = {
+    "wallets": ("balance", "locked_balance"),
+    "transactions": ("amount",),
+    "documents": ("price", "revenue"),
+    "deposit_requests": ("amount",),
+    "withdrawal_requests": ("amount",),
+    "staking_positions": ("amount", "rewards_earned", "accrued_rewards"),
+    "investment_positions": ("amount", "returns_earned"),
+    "document_investments": ("amount", "revenue_earned"),
+    "ledger_entries": ("amount",),
+    "ledger_snapshots": ("balance", "locked_balance"),
+}
+
+def convert_row(row: dict, fields) -> list:
+    """One conditional UpdateOne per non-decimal field of ``row``"""
+    updates = []
+    for field in fields:
+        value = row.get(field)
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            updates.append(UpdateOne(
+                {"_id": row["_id"], field: value},
+                {"$set": {field: to_money(value)}}
+            ))
+    return updates
+
+async def migrate_collection(db, name: str, fields, batch_size: int, dry_run: bool) -> int:
+    collection = db[name]
+    number_filter = {"$or": [{field: {"$type": ["double", "int", "long"]}} for field in fields]}
+    projection = {field: 1 for field in fields}
+    converted = 0
+    last_id = None
+
+    while True:
+        query = number_filter if last_id is None else {"$and": [number_filter, {"_id": {"$gt": last_id}}]}
+        rows = await collection.find(query, projection).sort("_id", 1).limit(batch_size).to_list(batch_size)
+        if not rows:
+            break
+        last_id = rows[-1]["_id"]
+
+        updates = [update for row in rows for update in convert_row(row, fields)]
+        if updates and not dry_run:
+            result = await collection.bulk_write(updates, ordered=False)
+            converted += result.modified_count
+        else:
+            converted += len(updates)
+
+    return converted
+
+async def main(collections, batch_size: int, dry_run: bool):
+    client = AsyncIOMotorClient(settings.MONGO_URL, tz_aware=True, tzinfo=timezone.utc, type_registry=type_registry)
+    db = client[settings.DB_NAME]
+
+    for name in collections:
+        started = time.perf_counter()
+        converted = await migrate_collection(db, name, MONEY_FIELDS[name], batch_size, dry_run)
+        verb = "would convert" if dry_run else "converted"
+        print(f"{name:22s} {verb} {converted} fields in {time.perf_counter() - started:.1f}s")
+
+    client.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("collections", nargs="*", help="defaults to every collection with money fields")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--dry-run", action="store_true")
+    args = parser.parse_args()
+    unknown = set(args.collections) - set(MONEY_FIELDS)
+    if unknown:
+        parser.error(f"unknown collections: {', '.join(sorted(unknown))}")
+    asyncio.run(main(args.collections or list(MONEY_FIELDS), args.batch_size, args.dry_run))
@@ -0,0 +1,92 @@
+"""Convert isoformat timestamp strings to native BSON dates.
+
+Walks each collection in _id order and rewrites, in bulk batches, any of
+its date fields still stored as a string. Each update is conditional on
+the field still holding the string that was read, so it is safe to run
+against a live database and to re-run after an interruption. Run from the
+backend directory:
+
+    python -m migrations.iso_dates [--batch-size 1000] [--dry-run] [collection ...]
+"""
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import UpdateOne
+from services.dates import as_datetime as parse
+from config import settings
+from datetime import timezone
+import argparse
+import asyncio
+import time
+
+DATE_FIELDS = {
+    "users": ("created_at", "updated_at"),
+    "sessions": ("created_at", "expires_at"),
+    "documents": ("created_at", "updated_at", "reviewed_at"),
+    "wallets": ("created_at", "updated_at"),
+    "transactions": ("created_at",),
+    "deposit_requests": ("created_at", "processed_at"),
+    "withdrawal_requests": ("created_at", "processed_at"),
+    "crypto_wallets": ("created_at",),
+    "staking_positions": ("created_at", "locked_until"),
+    "investment_positions": ("created_at", "expires_at"),
+    "document_investments": ("created_at",),
+    "kyc_submissions": ("submitted_at", "reviewed_at"),
+    "audit_logs": ("timestamp",),
+}
+
+def convert_row(row: dict, fields) -> list:
+    """One conditional UpdateOne per string field of ``row``"""
+    updates = []
+    for field in fields:
+        value = row.get(field)
+        if isinstance(value, str):
+            updates.append(UpdateOne(
+                {"_id": row["_id"], field: value},
+                {"$set": {field: parse(value)}}
+            ))
+    return updates
+
+async def migrate_collection(db, name: str, fields, batch_size: int, dry_run: bool) -> int:
+    collection = db[name]
+    string_filter = {"$or": [{field: {"$type": "string"}} for field in fields]}
+    projection = {field: 1 for field in fields}
+    converted = 0
+    last_id = None
+
+    while True:
+        query = string_filter if last_id is None else {"$and": [string_filter, {"_id": {"$gt": last_id}}]}
+        rows = await collection.find(query, projection).sort("_id", 1).limit(batch_size).to_list(batch_size)
+        if not rows:
+            break
+        last_id = rows[-1]["_id"]
+
+        updates = [update for row in rows for update in convert_row(row, fields)]
+        if updates and not dry_run:
+            result = await collection.bulk_write(updates, ordered=False)
+            converted += result.modified_count
+        else:
+            converted += len(updates)
+
+    return converted
+
+async def main(collections, batch_size: int, dry_run: bool):
+    client = AsyncIOMotorClient(settings.MONGO_URL, tz_aware=True, tzinfo=timezone.utc)
+    db = client[settings.DB_NAME]
+
+    for name in collections:
+        started = time.perf_counter()
+        converted = await migrate_collection(db, name, DATE_FIELDS[name], batch_size, dry_run)
+        verb = "would convert" if dry_run else "converted"
+        print(f"{name:22s} {verb} {converted} fields in {time.perf_counter() - started:.1f}s")
+
+    client.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("collections", nargs="*", help="defaults to every collection with date fields")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--dry-run", action="store_true")
+    args = parser.parse_args()
+    unknown = set(args.collections) - set(DATE_FIELDS)
+    if unknown:
+        parser.error(f"unknown collections: {', '.join(sorted(unknown))}")
+    asyncio.run(main(args.collections or list(DATE_FIELDS), args.batch_size, args.dry_run))
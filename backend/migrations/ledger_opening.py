@@ -0,0 +1,104 @@
+"""Open the ledger for wallets whose balance predates it.
+
+For each wallet without opening entries, posts seq-0 entries equal to the
+wallet's balance minus everything its existing ledger entries already
+account for, against the platform "opening" account. Wallets are read in
+_id order and each opening is computed from a single wallet read, so it is
+safe to run against a live database and to re-run. Run from the backend
+directory:
+
+    python -m migrations.ledger_opening [--batch-size 1000] [--dry-run]
+"""
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo.errors import BulkWriteError
+from services.ledger import available, locked, platform, OPENING, LOCKED
+from services.money import ZERO, to_money, type_registry
+from config import settings
+from datetime import datetime, timezone
+import argparse
+import asyncio
+import time
+import uuid
+
+async def opening_legs(db, wallet: dict) -> list:
+    """Legs that bring the replayed ledger in line with the wallet"""
+    seq = wallet.get("ledger_seq", 0)
+    rows = await db.ledger_entries.aggregate([
+        {"$match": {"user_id": wallet["user_id"], "seq": {"$gt": 0, "$lte": seq}}},
+        {"$group": {"_id": "$account", "amount": {"$sum": "$amount"}}}
+    ]).to_list(None)
+    replayed = {row["_id"]: to_money(row["amount"]) for row in rows}
+    balance, locked_balance = to_money(wallet["balance"]), to_money(wallet["locked_balance"])
+    locked_amount = locked_balance - replayed.get(LOCKED, ZERO)
+    available_amount = (balance - locked_balance) - (sum(replayed.values(), ZERO) - replayed.get(LOCKED, ZERO))
+
+    legs = []
+    if available_amount != 0:
+        legs.append(available(wallet["user_id"], available_amount))
+    if locked_amount != 0:
+        legs.append(locked(wallet["user_id"], locked_amount))
+    if legs:
+        legs.append(platform(OPENING, -(available_amount + locked_amount)))
+    return legs
+
+async def migrate(db, batch_size: int, dry_run: bool) -> int:
+    opened = 0
+    last_id = None
+
+    while True:
+        query = {} if last_id is None else {"_id": {"$gt": last_id}}
+        wallets = await db.wallets.find(
+            query,
+            {"user_id": 1, "balance": 1, "locked_balance": 1, "ledger_seq": 1}
+        ).sort("_id", 1).limit(batch_size).to_list(batch_size)
+        if not wallets:
+            break
+        last_id = wallets[-1]["_id"]
+
+        already_open = set(await db.ledger_entries.distinct(
+            "user_id",
+            {"user_id": {"$in": [wallet["user_id"] for wallet in wallets]}, "seq": 0}
+        ))
+        entries = []
+        now = datetime.now(timezone.utc)
+        for wallet in wallets:
+            if wallet["user_id"] in already_open:
+                continue
+            legs = await opening_legs(db, wallet)
+            if not legs:
+                continue
+            journal_id = str(uuid.uuid4())
+            for leg in legs:
+                entry = {"journal_id": journal_id, "kind": "opening", **leg, "ref": {}, "created_at": now}
+                if "user_id" in leg:
+                    entry["seq"] = 0
+                entries.append(entry)
+            opened += 1
+
+        if entries and not dry_run:
+            try:
+                await db.ledger_entries.insert_many(entries, ordered=False)
+            except BulkWriteError as e:
+                # Another run opened some of these wallets first
+                if any(error["code"] != 11000 for error in e.details["writeErrors"]):
+                    raise
+
+    return opened
+
+async def main(batch_size: int, dry_run: bool):
+    client = AsyncIOMotorClient(settings.MONGO_URL, tz_aware=True, tzinfo=timezone.utc, type_registry=type_registry)
+    db = client[settings.DB_NAME]
+
+    started = time.perf_counter()
+    opened = await migrate(db, batch_size, dry_run)
+    verb = "would open" if dry_run else "opened"
+    print(f"{verb} {opened} wallets in {time.perf_counter() - started:.1f}s")
+
+    client.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--dry-run", action="store_true")
+    args = parser.parse_args()
+    asyncio.run(main(args.batch_size, args.dry_run))
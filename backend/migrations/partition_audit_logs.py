@@ -0,0 +1,75 @@
+"""Move the single audit_logs collection into monthly partitions.
+
+Reads audit_logs in _id order, inserts each batch into its
+audit_logs_YYYY_MM partitions (keeping the original _id) and then deletes
+the batch from audit_logs. A batch that was copied but not yet deleted
+when the run stopped is copied again as duplicate-key no-ops, so the
+migration can be re-run after an interruption. Run migrations.iso_dates
+first if audit timestamps may still be strings. From the backend
+directory:
+
+    python -m migrations.partition_audit_logs [--batch-size 1000] [--dry-run]
+"""
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo.errors import BulkWriteError
+from services.audit_store import audit_store, partition_name
+from migrations.iso_dates import parse
+from config import settings
+from collections import Counter
+from datetime import timezone
+import argparse
+import asyncio
+import time
+
+DUPLICATE_KEY = 11000
+
+async def copy_batch(db, rows: list):
+    try:
+        await audit_store.write(db, rows)
+    except BulkWriteError as e:
+        if any(error["code"] != DUPLICATE_KEY for error in e.details["writeErrors"]):
+            raise
+
+async def migrate(db, batch_size: int, dry_run: bool) -> Counter:
+    moved = Counter()
+    last_id = None
+
+    while True:
+        query = {} if last_id is None else {"_id": {"$gt": last_id}}
+        rows = await db.audit_logs.find(query).sort("_id", 1).limit(batch_size).to_list(batch_size)
+        if not rows:
+            break
+        last_id = rows[-1]["_id"]
+
+        for row in rows:
+            if isinstance(row.get("timestamp"), str):
+                row["timestamp"] = parse(row["timestamp"])
+            moved[partition_name(row["timestamp"])] += 1
+        if not dry_run:
+            await copy_batch(db, rows)
+            await db.audit_logs.delete_many({"_id": {"$in": [row["_id"] for row in rows]}})
+
+    return moved
+
+async def main(batch_size: int, dry_run: bool):
+    client = AsyncIOMotorClient(settings.MONGO_URL, tz_aware=True, tzinfo=timezone.utc)
+    db = client[settings.DB_NAME]
+
+    started = time.perf_counter()
+    moved = await migrate(db, batch_size, dry_run)
+    verb = "would move" if dry_run else "moved"
+    for name, count in sorted(moved.items()):
+        print(f"{name:22s} {verb} {count} entries")
+    print(f"{sum(moved.values())} entries in {time.perf_counter() - started:.1f}s")
+
+    if not dry_run and await db.audit_logs.estimated_document_count() == 0:
+        await db.audit_logs.drop()
+
+    client.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--dry-run", action="store_true")
+    args = parser.parse_args()
+    asyncio.run(main(args.batch_size, args.dry_run))
@@ -0,0 +1,140 @@
+"""Give deposit and withdrawal requests stable ids and link their transactions.
+
+Walks each request collection in _id order and, in bulk batches, gives
+every request without an ``id`` a uuid and sets ``transaction_id`` to the
+transaction it created. Older requests have no such link, so each is
+paired with an unlinked transaction of the same user, type, amount and
+status, oldest first; the transaction gets an ``id`` too if it lacks one.
+Requests with no matching transaction get ``transaction_id: null``. Every
+update is conditional on the field still being absent, so it is safe to
+run against a live database and to re-run.
+
+Afterwards the plain ``id`` index on each request collection is replaced
+with the unique index declared in indexes.py. Run from the backend
+directory:
+
+    python -m migrations.request_ids [--batch-size 1000] [--dry-run] [collection ...]
+"""
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import UpdateOne
+from models import TransactionType
+from indexes import INDEXES
+from services.money import to_money, type_registry
+from config import settings
+from datetime import timezone
+import argparse
+import asyncio
+import time
+import uuid
+
+TRANSACTION_TYPES = {
+    "deposit_requests": TransactionType.DEPOSIT,
+    "withdrawal_requests": TransactionType.WITHDRAWAL,
+}
+
+async def link_batch(db, name: str, rows: list) -> tuple:
+    """Request and transaction updates for one batch of requests"""
+    users = list({row["user_id"] for row in rows})
+    linked = set(await db[name].distinct("transaction_id", {"user_id": {"$in": users}})) - {None}
+    transactions = await db.transactions.find(
+        {"user_id": {"$in": users}, "type": TRANSACTION_TYPES[name]},
+        {"_id": 1, "id": 1, "user_id": 1, "amount": 1, "status": 1}
+    ).sort("created_at", 1).to_list(None)
+    candidates = {}
+    for tx in transactions:
+        if tx.get("id") not in linked:
+            candidates.setdefault((tx["user_id"], to_money(tx["amount"]), tx["status"]), []).append(tx)
+
+    request_updates, transaction_updates = [], []
+    for row in rows:
+        if "id" not in row:
+            request_updates.append(UpdateOne(
+                {"_id": row["_id"], "id": {"$exists": False}},
+                {"$set": {"id": str(uuid.uuid4())}}
+            ))
+        if "transaction_id" in row:
+            continue
+        matches = candidates.get((row["user_id"], to_money(row["amount"]), row["status"]))
+        transaction_id = None
+        if matches:
+            tx = matches.pop(0)
+            transaction_id = tx.get("id")
+            if transaction_id is None:
+                transaction_id = str(uuid.uuid4())
+                transaction_updates.append(UpdateOne(
+                    {"_id": tx["_id"], "id": {"$exists": False}},
+                    {"$set": {"id": transaction_id}}
+                ))
+        request_updates.append(UpdateOne(
+            {"_id": row["_id"], "transaction_id": {"$exists": False}},
+            {"$set": {"transaction_id": transaction_id}}
+        ))
+    return request_updates, transaction_updates
+
+async def migrate_collection(db, name: str, batch_size: int, dry_run: bool) -> dict:
+    collection = db[name]
+    unlinked = {"$or": [{"id": {"$exists": False}}, {"transaction_id": {"$exists": False}}]}
+    projection = {"id": 1, "transaction_id": 1, "user_id": 1, "amount": 1, "status": 1}
+    counts = {"requests": 0, "transactions": 0}
+    last_id = None
+
+    while True:
+        query = unlinked if last_id is None else {"$and": [unlinked, {"_id": {"$gt": last_id}}]}
+        rows = await collection.find(query, projection).sort("_id", 1).limit(batch_size).to_list(batch_size)
+        if not rows:
+            break
+        last_id = rows[-1]["_id"]
+
+        request_updates, transaction_updates = await link_batch(db, name, rows)
+        if dry_run:
+            counts["requests"] += len(request_updates)
+            counts["transactions"] += len(transaction_updates)
+            continue
+        # Ids go on the transactions first so a link never points at nothing
+        if transaction_updates:
+            result = await db.transactions.bulk_write(transaction_updates, ordered=False)
+            counts["transactions"] += result.modified_count
+        if request_updates:
+            result = await collection.bulk_write(request_updates, ordered=False)
+            counts["requests"] += result.modified_count
+
+    return counts
+
+async def make_id_unique(db, name: str, dry_run: bool) -> bool:
+    """Swap a non-unique ``id_1`` index for the declared unique one"""
+    model = next(model for model in INDEXES[name] if model.document["name"] == "id_1")
+    live = await db[name].index_information()
+    if live.get("id_1", {}).get("unique"):
+        return False
+    if not dry_run:
+        if "id_1" in live:
+            await db[name].drop_index("id_1")
+        await db[name].create_indexes([model])
+    return True
+
+async def main(collections, batch_size: int, dry_run: bool):
+    client = AsyncIOMotorClient(settings.MONGO_URL, tz_aware=True, tzinfo=timezone.utc, type_registry=type_registry)
+    db = client[settings.DB_NAME]
+
+    for name in collections:
+        started = time.perf_counter()
+        counts = await migrate_collection(db, name, batch_size, dry_run)
+        rebuilt = await make_id_unique(db, name, dry_run)
+        verb = "would update" if dry_run else "updated"
+        print(
+            f"{name:22s} {verb} {counts['requests']} request and {counts['transactions']} transaction fields"
+            f"{', unique id index' if rebuilt else ''} in {time.perf_counter() - started:.1f}s"
+        )
+
+    client.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("collections", nargs="*", help="defaults to both request collections")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--dry-run", action="store_true")
+    args = parser.parse_args()
+    unknown = set(args.collections) - set(TRANSACTION_TYPES)
+    if unknown:
+        parser.error(f"unknown collections: {', '.join(sorted(unknown))}")
+    asyncio.run(main(args.collections or list(TRANSACTION_TYPES), args.batch_size, args.dry_run))
@@ -1,4 +1,5 @@
 from pydantic import BaseModel, Field, EmailStr, ConfigDict, field_validator
+from services.money import Money, ZERO
 from typing import Optional, List, Dict, Any
 from datetime import datetime, timezone
 from enum import Enum
@@ -117,7 +118,7 @@ class DocumentCreate(BaseModel):
     title: str
     description: str
     category: str
-    price: float
+    price: Money
     tags: List[str] = []
 
 class Document(BaseModel):
@@ -127,15 +128,16 @@ class Document(BaseModel):
     title: str
     description: str
     category: str
-    price: float
+    price: Money
     seller_id: str
     file_id: str  # GridFS file ID
     file_name: str
     file_size: int
+    file_hash: Optional[str] = None  # SHA-256 of the file content
     tags: List[str] = []
     status: DocumentStatus = DocumentStatus.PENDING
     downloads: int = 0
-    revenue: float = 0.0
+    revenue: Money = ZERO
     created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
     updated_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
 
@@ -145,21 +147,29 @@ class Wallet(BaseModel):
     
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
     user_id: str
-    balance: float = 0.0
-    locked_balance: float = 0.0  # Locked in staking/investments
+    balance: Money = ZERO
+    locked_balance: Money = ZERO  # Locked in staking/investments
     created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
     updated_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
 
 class DepositRequest(BaseModel):
-    amount: float
+    amount: Money
     payment_method: str
     payment_proof: Optional[str] = None
 
 class WithdrawalRequest(BaseModel):
-    amount: float
+    amount: Money
     withdrawal_method: str
     withdrawal_address: str
 
+class BatchProcessRequest(BaseModel):
+    ids: List[str] = Field(min_length=1)
+    approved: bool = True
+    reason: str = ""
+
+class WithdrawalBatchProcessRequest(BatchProcessRequest):
+    tx_hashes: Dict[str, str] = {}  # withdrawal id -> payout transaction hash
+
 # Transaction Models
 class Transaction(BaseModel):
     model_config = ConfigDict(extra="ignore")
@@ -167,7 +177,7 @@ class Transaction(BaseModel):
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
     user_id: str
     type: TransactionType
-    amount: float
+    amount: Money
     status: TransactionStatus = TransactionStatus.PENDING
     description: str
     metadata: Dict[str, Any] = {}
@@ -201,16 +211,16 @@ class StakingPosition(BaseModel):
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
     user_id: str
     plan: str  # basic, premium, vip
-    amount: float
+    amount: Money
     apy: float
     locked_until: datetime
-    rewards_earned: float = 0.0
-    status: str = "active"  # active, completed
+    rewards_earned: Money = ZERO
+    status: str = "active"  # pending (until its amount is locked), active, completed
     created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
 
 class StakingRequest(BaseModel):
     plan: str
-    amount: float
+    amount: Money
 
 # Investment Models
 class InvestmentPosition(BaseModel):
@@ -219,11 +229,11 @@ class InvestmentPosition(BaseModel):
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
     user_id: str
     package: str  # starter, growth, premium
-    amount: float
+    amount: Money
     expected_return: float
     expires_at: datetime
-    returns_earned: float = 0.0
-    status: str = "active"  # active, completed
+    returns_earned: Money = ZERO
+    status: str = "active"  # pending (until its amount is locked), active, settling, completed
     created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
 
 class InvestmentRequest(BaseModel):
@@ -236,14 +246,18 @@ class DocumentInvestment(BaseModel):
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
     user_id: str
     document_id: str
-    amount: float
+    amount: Money
     share_percentage: float
-    revenue_earned: float = 0.0
+    revenue_earned: Money = ZERO
     created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
 
+class DocumentInvestmentView(DocumentInvestment):
+    document_title: Optional[str] = None
+    document_revenue: Optional[Money] = None
+
 class DocumentInvestmentRequest(BaseModel):
     document_id: str
-    amount: float
+    amount: Money
 
 # KYC Models
 class KYCSubmission(BaseModel):
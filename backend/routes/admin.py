@@ -1,7 +1,24 @@
 from fastapi import APIRouter, HTTPException, status, Request, Query
-from models import User, Document, DocumentStatus, KYCStatus, TransactionStatus, UserRole
+from models import User, Document, DocumentStatus, KYCStatus, TransactionStatus, UserRole, BatchProcessRequest, WithdrawalBatchProcessRequest
 from middleware import require_admin, log_audit, rate_limit
 from database import get_database
+from pymongo import ReturnDocument
+from services.pagination import keyset_page, count_total
+from services.password_pool import password_pool
+from services.platform_metrics import platform_metrics, document_status_deltas
+from services.principal_cache import principal_cache
+from services.rate_limiter import rate_limiter
+from services.scheduler import scheduler
+from services.maturity import maturity_engine
+from services.staking_rewards import staking_accrual
+from services.transaction_summary import transaction_summary
+from services.index_manager import index_manager
+from services.audit_writer import audit_writer
+from services.audit_store import audit_store
+from services.response_cache import response_cache
+from services.ledger import ledger
+from services.sessions import live_session_count
+from services.request_processing import request_processor, NOT_FOUND, ALREADY_PROCESSED, WALLET_NOT_FOUND
 from datetime import datetime, timezone
 from typing import List, Optional
 
@@ -12,8 +29,9 @@ async def get_users(
     request: Request,
     role: Optional[str] = None,
     kyc_status: Optional[str] = None,
-    skip: int = Query(0, ge=0),
-    limit: int = Query(50, ge=1, le=200)
+    cursor: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=200),
+    include_total: bool = True
 ):
     """Get all users (admin only)"""
     admin = await require_admin(request)
@@ -25,14 +43,15 @@ async def get_users(
     if kyc_status:
         query["kyc_status"] = kyc_status
     
-    users = await db.users.find(
-        query,
-        {"_id": 0, "password_hash": 0, "totp_secret": 0}
-    ).skip(skip).limit(limit).to_list(limit)
+    users, next_cursor = await keyset_page(
+        db.users, query, "created_at", cursor, limit,
+        projection={"_id": 0, "password_hash": 0, "totp_secret": 0}
+    )
     
     return {
         "users": users,
-        "total": await db.users.count_documents(query)
+        "next_cursor": next_cursor,
+        "total": await count_total(db.users, query) if include_total else None
     }
 
 @router.get("/users/{user_id}")
@@ -94,24 +113,41 @@ async def verify_kyc(user_id: str, request: Request, approved: bool = True, reas
     
     new_status = KYCStatus.VERIFIED if approved else KYCStatus.REJECTED
     
-    # Update KYC submission
-    await db.kyc_submissions.update_one(
+    # Update latest KYC submission
+    previous_kyc = await db.kyc_submissions.find_one_and_update(
         {"user_id": user_id},
         {
             "$set": {
                 "status": new_status,
                 "reviewed_by": admin["id"],
-                "reviewed_at": datetime.now(timezone.utc).isoformat(),
+                "reviewed_at": datetime.now(timezone.utc),
                 "reason": reason
             }
-        }
+        },
+        projection={"_id": 0, "status": 1},
+        sort=[("submitted_at", -1)],
+        return_document=ReturnDocument.BEFORE
     )
     
     # Update user KYC status
-    await db.users.update_one(
+    previous_user = await db.users.find_one_and_update(
         {"id": user_id},
-        {"$set": {"kyc_status": new_status}}
+        {"$set": {"kyc_status": new_status}},
+        projection={"_id": 0, "kyc_status": 1},
+        return_document=ReturnDocument.BEFORE
     )
+    principal_cache.invalidate_user(user_id)
+    
+    deltas = {}
+    if previous_kyc and previous_kyc.get("status") == KYCStatus.PENDING:
+        deltas["pending.kyc"] = -1
+    if previous_user:
+        was_verified = previous_user.get("kyc_status") == KYCStatus.VERIFIED
+        if approved and not was_verified:
+            deltas["users.verified"] = 1
+        elif not approved and was_verified:
+            deltas["users.verified"] = -1
+    await platform_metrics.increment(db, deltas)
     
     await log_audit(db, admin["id"], "KYC_REVIEWED", {"user_id": user_id, "approved": approved}, request)
     
@@ -130,6 +166,7 @@ async def update_user_role(user_id: str, role: UserRole, request: Request):
         {"id": user_id},
         {"$set": {"role": role}}
     )
+    principal_cache.invalidate_user(user_id)
     
     await log_audit(db, admin["id"], "USER_ROLE_UPDATED", {"user_id": user_id, "new_role": role}, request)
     
@@ -139,8 +176,9 @@ async def update_user_role(user_id: str, role: UserRole, request: Request):
 async def get_all_documents(
     request: Request,
     status: Optional[str] = None,
-    skip: int = Query(0, ge=0),
-    limit: int = Query(50, ge=1, le=200)
+    cursor: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=200),
+    include_total: bool = True
 ):
     """Get all documents (admin only)"""
     admin = await require_admin(request)
@@ -150,14 +188,12 @@ async def get_all_documents(
     if status:
         query["status"] = status
     
-    documents = await db.documents.find(
-        query,
-        {"_id": 0}
-    ).skip(skip).limit(limit).to_list(limit)
+    documents, next_cursor = await keyset_page(db.documents, query, "created_at", cursor, limit)
     
     return {
         "documents": documents,
-        "total": await db.documents.count_documents(query)
+        "next_cursor": next_cursor,
+        "total": await count_total(db.documents, query) if include_total else None
     }
 
 @router.put("/documents/{document_id}/approve")
@@ -177,17 +213,22 @@ async def approve_document(document_id: str, request: Request, approved: bool =
     
     new_status = DocumentStatus.APPROVED if approved else DocumentStatus.REJECTED
     
-    await db.documents.update_one(
+    previous = await db.documents.find_one_and_update(
         {"id": document_id},
         {
             "$set": {
                 "status": new_status,
                 "reviewed_by": admin["id"],
-                "reviewed_at": datetime.now(timezone.utc).isoformat(),
+                "reviewed_at": datetime.now(timezone.utc),
                 "rejection_reason": reason if not approved else None
             }
-        }
+        },
+        projection={"_id": 0, "status": 1},
+        return_document=ReturnDocument.BEFORE
     )
+    if previous:
+        await platform_metrics.increment(db, document_status_deltas(previous["status"], new_status))
+    response_cache.invalidate_document(document_id)
     
     await log_audit(db, admin["id"], "DOCUMENT_REVIEWED", {"document_id": document_id, "approved": approved}, request)
     
@@ -202,8 +243,9 @@ async def get_all_transactions(
     user_id: Optional[str] = None,
     type: Optional[str] = None,
     status: Optional[str] = None,
-    skip: int = Query(0, ge=0),
-    limit: int = Query(50, ge=1, le=200)
+    cursor: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=200),
+    include_total: bool = True
 ):
     """Get all transactions (admin only)"""
     admin = await require_admin(request)
@@ -217,22 +259,21 @@ async def get_all_transactions(
     if status:
         query["status"] = status
     
-    transactions = await db.transactions.find(
-        query,
-        {"_id": 0}
-    ).sort("created_at", -1).skip(skip).limit(limit).to_list(limit)
+    transactions, next_cursor = await keyset_page(db.transactions, query, "created_at", cursor, limit)
     
     return {
         "transactions": transactions,
-        "total": await db.transactions.count_documents(query)
+        "next_cursor": next_cursor,
+        "total": await count_total(db.transactions, query) if include_total else None
     }
 
 @router.get("/deposits")
 async def get_deposit_requests(
     request: Request,
     status: Optional[str] = None,
-    skip: int = Query(0, ge=0),
-    limit: int = Query(50, ge=1, le=200)
+    cursor: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=200),
+    include_total: bool = True
 ):
     """Get deposit requests (admin only)"""
     admin = await require_admin(request)
@@ -244,14 +285,12 @@ async def get_deposit_requests(
     else:
         query["status"] = TransactionStatus.PENDING  # Default to pending
     
-    deposits = await db.deposit_requests.find(
-        query,
-        {"_id": 0}
-    ).sort("created_at", -1).skip(skip).limit(limit).to_list(limit)
+    deposits, next_cursor = await keyset_page(db.deposit_requests, query, "created_at", cursor, limit)
     
     return {
         "deposits": deposits,
-        "total": await db.deposit_requests.count_documents(query)
+        "next_cursor": next_cursor,
+        "total": await count_total(db.deposit_requests, query) if include_total else None
     }
 
 @router.put("/deposits/{deposit_id}/process")
@@ -261,84 +300,53 @@ async def process_deposit(deposit_id: str, request: Request, approved: bool = Tr
     admin = await require_admin(request)
     db = get_database()
     
-    deposit = await db.deposit_requests.find_one({"id": deposit_id}, {"_id": 0})
+    batch = await request_processor.process(db, "deposit", [deposit_id], approved, admin["id"], reason)
+    result = batch["results"][0]["result"]
     
-    if not deposit:
-        # Try matching by user_id and amount (fallback)
-        deposits = await db.deposit_requests.find({"status": TransactionStatus.PENDING}, {"_id": 0}).to_list(1000)
-        if deposits:
-            deposit = deposits[0]  # Use first pending deposit
-        else:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail="Deposit request not found"
-            )
+    if result == NOT_FOUND:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Deposit request not found"
+        )
     
-    if deposit["status"] != TransactionStatus.PENDING:
+    if result == ALREADY_PROCESSED:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Deposit already processed"
         )
     
-    user_id = deposit["user_id"]
-    amount = deposit["amount"]
-    
-    if approved:
-        # Add to wallet
-        await db.wallets.update_one(
-            {"user_id": user_id},
-            {"$inc": {"balance": amount}}
-        )
-        
-        # Update transaction status
-        await db.transactions.update_one(
-            {
-                "user_id": user_id,
-                "type": "deposit",
-                "amount": amount,
-                "status": TransactionStatus.PENDING
-            },
-            {"$set": {"status": TransactionStatus.COMPLETED}}
-        )
-    else:
-        # Update transaction status to failed
-        await db.transactions.update_one(
-            {
-                "user_id": user_id,
-                "type": "deposit",
-                "amount": amount,
-                "status": TransactionStatus.PENDING
-            },
-            {"$set": {"status": TransactionStatus.FAILED}}
+    if result == WALLET_NOT_FOUND:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Wallet not found"
         )
     
-    # Update deposit request
-    new_status = TransactionStatus.COMPLETED if approved else TransactionStatus.FAILED
-    await db.deposit_requests.update_many(
-        {"user_id": user_id, "amount": amount, "status": TransactionStatus.PENDING},
-        {
-            "$set": {
-                "status": new_status,
-                "processed_by": admin["id"],
-                "processed_at": datetime.now(timezone.utc).isoformat(),
-                "reason": reason
-            }
-        }
-    )
-    
-    await log_audit(db, admin["id"], "DEPOSIT_PROCESSED", {"user_id": user_id, "amount": amount, "approved": approved}, request)
+    await _log_processed(db, admin, "deposit", batch, approved, request)
     
     return {
         "success": True,
         "message": f"Deposit {'approved' if approved else 'rejected'} successfully"
     }
 
+@router.post("/deposits/process")
+@rate_limit(max_calls=100, time_window=3600)
+async def process_deposits(batch_req: BatchProcessRequest, request: Request):
+    """Approve or reject several deposit requests by id (admin only)"""
+    admin = await require_admin(request)
+    db = get_database()
+    
+    batch = await request_processor.process(db, "deposit", batch_req.ids, batch_req.approved, admin["id"], batch_req.reason)
+    await _log_processed(db, admin, "deposit", batch, batch_req.approved, request)
+    
+    return _batch_response(batch)
+
 @router.get("/withdrawals")
 async def get_withdrawal_requests(
     request: Request,
     status: Optional[str] = None,
-    skip: int = Query(0, ge=0),
-    limit: int = Query(50, ge=1, le=200)
+    cursor: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=200),
+    include_total: bool = True
 ):
     """Get withdrawal requests (admin only)"""
     admin = await require_admin(request)
@@ -350,14 +358,12 @@ async def get_withdrawal_requests(
     else:
         query["status"] = TransactionStatus.PENDING  # Default to pending
     
-    withdrawals = await db.withdrawal_requests.find(
-        query,
-        {"_id": 0}
-    ).sort("created_at", -1).skip(skip).limit(limit).to_list(limit)
+    withdrawals, next_cursor = await keyset_page(db.withdrawal_requests, query, "created_at", cursor, limit)
     
     return {
         "withdrawals": withdrawals,
-        "total": await db.withdrawal_requests.count_documents(query)
+        "next_cursor": next_cursor,
+        "total": await count_total(db.withdrawal_requests, query) if include_total else None
     }
 
 @router.put("/withdrawals/{withdrawal_id}/process")
@@ -367,154 +373,170 @@ async def process_withdrawal(withdrawal_id: str, request: Request, approved: boo
     admin = await require_admin(request)
     db = get_database()
     
-    withdrawal = await db.withdrawal_requests.find_one({"id": withdrawal_id}, {"_id": 0})
+    batch = await request_processor.process(
+        db, "withdrawal", [withdrawal_id], approved, admin["id"], reason, {withdrawal_id: tx_hash}
+    )
+    result = batch["results"][0]["result"]
     
-    if not withdrawal:
-        # Fallback
-        withdrawals = await db.withdrawal_requests.find({"status": TransactionStatus.PENDING}, {"_id": 0}).to_list(1000)
-        if withdrawals:
-            withdrawal = withdrawals[0]
-        else:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail="Withdrawal request not found"
-            )
+    if result == NOT_FOUND:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Withdrawal request not found"
+        )
     
-    if withdrawal["status"] != TransactionStatus.PENDING:
+    if result == ALREADY_PROCESSED:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Withdrawal already processed"
         )
     
-    user_id = withdrawal["user_id"]
-    amount = withdrawal["amount"]
-    
-    if approved:
-        # Deduct from wallet (already locked, so just deduct from locked and total)
-        await db.wallets.update_one(
-            {"user_id": user_id},
-            {
-                "$inc": {
-                    "balance": -amount,
-                    "locked_balance": -amount
-                }
-            }
-        )
-        
-        # Update transaction status
-        await db.transactions.update_one(
-            {
-                "user_id": user_id,
-                "type": "withdrawal",
-                "amount": amount,
-                "status": TransactionStatus.PENDING
-            },
-            {
-                "$set": {
-                    "status": TransactionStatus.COMPLETED,
-                    "metadata.tx_hash": tx_hash
-                }
-            }
-        )
-    else:
-        # Unlock amount
-        await db.wallets.update_one(
-            {"user_id": user_id},
-            {"$inc": {"locked_balance": -amount}}
-        )
-        
-        # Update transaction status to failed
-        await db.transactions.update_one(
-            {
-                "user_id": user_id,
-                "type": "withdrawal",
-                "amount": amount,
-                "status": TransactionStatus.PENDING
-            },
-            {"$set": {"status": TransactionStatus.FAILED}}
+    if result == WALLET_NOT_FOUND:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Wallet not found"
         )
     
-    # Update withdrawal request
-    new_status = TransactionStatus.COMPLETED if approved else TransactionStatus.FAILED
-    await db.withdrawal_requests.update_many(
-        {"user_id": user_id, "amount": amount, "status": TransactionStatus.PENDING},
-        {
-            "$set": {
-                "status": new_status,
-                "processed_by": admin["id"],
-                "processed_at": datetime.now(timezone.utc).isoformat(),
-                "tx_hash": tx_hash if approved else None,
-                "reason": reason
-            }
-        }
-    )
-    
-    await log_audit(db, admin["id"], "WITHDRAWAL_PROCESSED", {"user_id": user_id, "amount": amount, "approved": approved}, request)
+    await _log_processed(db, admin, "withdrawal", batch, approved, request)
     
     return {
         "success": True,
         "message": f"Withdrawal {'approved' if approved else 'rejected'} successfully"
     }
 
+@router.post("/withdrawals/process")
+@rate_limit(max_calls=100, time_window=3600)
+async def process_withdrawals(batch_req: WithdrawalBatchProcessRequest, request: Request):
+    """Approve or reject several withdrawal requests by id (admin only)"""
+    admin = await require_admin(request)
+    db = get_database()
+    
+    batch = await request_processor.process(
+        db, "withdrawal", batch_req.ids, batch_req.approved, admin["id"], batch_req.reason, batch_req.tx_hashes
+    )
+    await _log_processed(db, admin, "withdrawal", batch, batch_req.approved, request)
+    
+    return _batch_response(batch)
+
+async def _log_processed(db, admin: dict, kind: str, batch: dict, approved: bool, request: Request):
+    for req in batch["requests"]:
+        await log_audit(
+            db,
+            admin["id"],
+            f"{kind.upper()}_PROCESSED",
+            {
+                f"{kind}_id": req["id"],
+                "user_id": req["user_id"],
+                "amount": req["amount"],
+                "approved": approved,
+                "batch_id": batch["batch_id"]
+            },
+            request
+        )
+
+def _batch_response(batch: dict) -> dict:
+    return {
+        "success": True,
+        "batch_id": batch["batch_id"],
+        "processed": len(batch["requests"]),
+        "results": batch["results"]
+    }
+
 @router.get("/analytics")
 async def get_analytics(request: Request):
     """Get platform analytics (admin only)"""
     admin = await require_admin(request)
     db = get_database()
     
-    # User stats
-    total_users = await db.users.count_documents({})
-    verified_users = await db.users.count_documents({"kyc_status": KYCStatus.VERIFIED})
-    
-    # Document stats
-    total_documents = await db.documents.count_documents({})
-    approved_documents = await db.documents.count_documents({"status": DocumentStatus.APPROVED})
-    
-    # Transaction stats
-    total_transactions = await db.transactions.count_documents({})
-    completed_transactions = await db.transactions.count_documents({"status": TransactionStatus.COMPLETED})
-    
-    # Calculate total volume
-    transactions = await db.transactions.find({"status": TransactionStatus.COMPLETED}, {"_id": 0}).to_list(10000)
-    total_volume = sum(tx["amount"] for tx in transactions)
-    
-    # Pending requests
-    pending_deposits = await db.deposit_requests.count_documents({"status": TransactionStatus.PENDING})
-    pending_withdrawals = await db.withdrawal_requests.count_documents({"status": TransactionStatus.PENDING})
-    pending_kyc = await db.kyc_submissions.count_documents({"status": KYCStatus.PENDING})
-    pending_documents = await db.documents.count_documents({"status": DocumentStatus.PENDING})
+    # Pre-aggregated counters, see services/platform_metrics.py
+    metrics = await platform_metrics.read(db)
+    users = metrics.get("users", {})
+    documents = metrics.get("documents", {})
+    documents_by_status = documents.get("by_status", {})
+    transactions = metrics.get("transactions", {})
+    pending = metrics.get("pending", {})
     
     return {
         "users": {
-            "total": total_users,
-            "verified": verified_users
+            "total": users.get("total", 0),
+            "verified": users.get("verified", 0)
         },
         "documents": {
-            "total": total_documents,
-            "approved": approved_documents,
-            "pending": pending_documents
+            "total": documents.get("total", 0),
+            "approved": documents_by_status.get(DocumentStatus.APPROVED.value, 0),
+            "pending": documents_by_status.get(DocumentStatus.PENDING.value, 0),
+            "by_status": documents_by_status
         },
         "transactions": {
-            "total": total_transactions,
-            "completed": completed_transactions,
-            "total_volume": total_volume
+            "total": transactions.get("total", 0),
+            "completed": transactions.get("by_status", {}).get(TransactionStatus.COMPLETED.value, 0),
+            "total_volume": transactions.get("volume", 0),
+            "by_status": transactions.get("by_status", {}),
+            "by_type": transactions.get("by_type", {})
         },
         "pending_requests": {
-            "deposits": pending_deposits,
-            "withdrawals": pending_withdrawals,
-            "kyc": pending_kyc
+            "deposits": pending.get("deposits", 0),
+            "withdrawals": pending.get("withdrawals", 0),
+            "kyc": pending.get("kyc", 0)
         }
     }
 
+@router.get("/metrics")
+async def get_metrics(request: Request):
+    """Get runtime worker metrics (admin only)"""
+    admin = await require_admin(request)
+    
+    return {
+        "password_hashing": password_pool.stats(),
+        "rate_limiter": rate_limiter.stats(),
+        "principal_cache": principal_cache.stats(),
+        "background_tasks": scheduler.stats(),
+        "investment_maturity": maturity_engine.stats(),
+        "staking_accrual": staking_accrual.stats(),
+        "transaction_summary_cache": transaction_summary.stats(),
+        "index_build": index_manager.stats(),
+        "audit_writer": audit_writer.stats(),
+        "audit_store": audit_store.stats(),
+        "response_cache": response_cache.stats(),
+        "ledger": ledger.stats(),
+        "request_processing": request_processor.stats(),
+        "sessions": {"live": await live_session_count(get_database())}
+    }
+
+@router.get("/indexes")
+async def get_index_report(request: Request):
+    """Get missing, conflicting, extra and unused indexes (admin only)"""
+    admin = await require_admin(request)
+    db = get_database()
+    
+    return await index_manager.report(db)
+
+@router.get("/ledger/reconcile/{user_id}")
+async def reconcile_wallet(user_id: str, request: Request):
+    """Check a wallet against its ledger entries since the last snapshot (admin only)"""
+    admin = await require_admin(request)
+    db = get_database()
+    
+    return await ledger.reconcile(db, user_id)
+
+@router.get("/ledger/audit")
+async def get_ledger_audit(request: Request):
+    """Get the result of the last full ledger audit (admin only)"""
+    admin = await require_admin(request)
+    
+    return ledger.last_audit or {"checked": 0, "mismatched": [], "finished_at": None}
+
 @router.get("/audit-logs")
 async def get_audit_logs(
     request: Request,
     user_id: Optional[str] = None,
     action: Optional[str] = None,
-    skip: int = Query(0, ge=0),
-    limit: int = Query(100, ge=1, le=500)
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=500),
+    include_total: bool = True
 ):
-    """Get audit logs (admin only)"""
+    """Get audit logs, newest first, from the monthly partitions overlapping [since, until) (admin only)"""
     admin = await require_admin(request)
     db = get_database()
     
@@ -524,12 +546,10 @@ async def get_audit_logs(
     if action:
         query["action"] = action
     
-    logs = await db.audit_logs.find(
-        query,
-        {"_id": 0}
-    ).sort("timestamp", -1).skip(skip).limit(limit).to_list(limit)
+    logs, next_cursor = await audit_store.query(db, query, since, until, cursor, limit)
     
     return {
         "logs": logs,
-        "total": await db.audit_logs.count_documents(query)
+        "next_cursor": next_cursor,
+        "total": await audit_store.count(db, query, since, until) if include_total else None
     }
@@ -4,11 +4,14 @@ from models import (
     PasswordResetRequest, PasswordReset, Session
 )
 from security import (
-    hash_password, verify_password, create_access_token, 
+    hash_password_async, verify_password_async, create_access_token, 
     create_refresh_token, decode_token, generate_reset_token, hash_token
 )
 from database import get_database
 from middleware import rate_limit, log_audit
+from services.principal_cache import principal_cache
+from services.platform_metrics import platform_metrics
+from services.money import ZERO
 from datetime import datetime, timedelta, timezone
 import pyotp
 import qrcode
@@ -39,19 +42,19 @@ async def register(user_data: UserCreate, request: Request):
     # Create user
     user = User(**user_data.model_dump(exclude={"password"}))
     user_dict = user.model_dump()
-    user_dict["password_hash"] = hash_password(user_data.password)
-    user_dict["created_at"] = user_dict["created_at"].isoformat()
-    user_dict["updated_at"] = user_dict["updated_at"].isoformat()
+    user_dict["password_hash"] = await hash_password_async(user_data.password)
     
     await db.users.insert_one(user_dict)
+    await platform_metrics.increment(db, {"users.total": 1})
     
     # Create wallet for user
     wallet = {
         "user_id": user.id,
-        "balance": 0.0,
-        "locked_balance": 0.0,
-        "created_at": datetime.now(timezone.utc).isoformat(),
-        "updated_at": datetime.now(timezone.utc).isoformat()
+        "balance": ZERO,
+        "locked_balance": ZERO,
+        "ledger_seq": 0,
+        "created_at": datetime.now(timezone.utc),
+        "updated_at": datetime.now(timezone.utc)
     }
     await db.wallets.insert_one(wallet)
     
@@ -76,7 +79,7 @@ async def login(login_data: UserLogin, request: Request, response: Response):
     # Find user
     user = await db.users.find_one({"email": login_data.email}, {"_id": 0})
     
-    if not user or not verify_password(login_data.password, user["password_hash"]):
+    if not user or not await verify_password_async(login_data.password, user["password_hash"]):
         await log_audit(db, None, "LOGIN_FAILED", {"email": login_data.email}, request)
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -172,6 +175,7 @@ async def setup_2fa(request: Request):
         {"id": user["id"]},
         {"$set": {"totp_secret_temp": secret}}
     )
+    principal_cache.invalidate_user(user["id"])
     
     await log_audit(db, user["id"], "2FA_SETUP_INITIATED", {}, request)
     
@@ -211,6 +215,7 @@ async def verify_2fa(verify_data: TwoFactorVerify, request: Request):
             "$unset": {"totp_secret_temp": ""}
         }
     )
+    principal_cache.invalidate_user(user["id"])
     
     await log_audit(db, user["id"], "2FA_ENABLED", {}, request)
     
@@ -247,6 +252,7 @@ async def disable_2fa(verify_data: TwoFactorVerify, request: Request):
             "$unset": {"totp_secret": ""}
         }
     )
+    principal_cache.invalidate_user(user["id"])
     
     await log_audit(db, user["id"], "2FA_DISABLED", {}, request)
     
@@ -301,18 +307,18 @@ async def create_session_from_google(request: Request, response: Response):
         )
         user_dict = new_user.model_dump()
         user_dict["password_hash"] = ""  # No password for OAuth users
-        user_dict["created_at"] = user_dict["created_at"].isoformat()
-        user_dict["updated_at"] = user_dict["updated_at"].isoformat()
         
         await db.users.insert_one(user_dict)
+        await platform_metrics.increment(db, {"users.total": 1})
         
         # Create wallet
         wallet = {
             "user_id": new_user.id,
-            "balance": 0.0,
-            "locked_balance": 0.0,
-            "created_at": datetime.now(timezone.utc).isoformat(),
-            "updated_at": datetime.now(timezone.utc).isoformat()
+            "balance": ZERO,
+            "locked_balance": ZERO,
+            "ledger_seq": 0,
+            "created_at": datetime.now(timezone.utc),
+            "updated_at": datetime.now(timezone.utc)
         }
         await db.wallets.insert_one(wallet)
         
@@ -330,8 +336,6 @@ async def create_session_from_google(request: Request, response: Response):
     )
     
     session_dict = session.model_dump()
-    session_dict["expires_at"] = session_dict["expires_at"].isoformat()
-    session_dict["created_at"] = session_dict["created_at"].isoformat()
     
     await db.sessions.insert_one(session_dict)
     
@@ -371,6 +375,7 @@ async def logout(request: Request, response: Response):
     session_token = request.cookies.get("session_token")
     if session_token:
         await db.sessions.delete_one({"session_token": session_token})
+        principal_cache.invalidate_session(session_token)
         response.delete_cookie("session_token", path="/")
     
     await log_audit(db, user["id"], "USER_LOGOUT", {}, request)
@@ -1,9 +1,13 @@
-from fastapi import APIRouter, HTTPException, status, Request, Query
+from fastapi import APIRouter, HTTPException, status, Request, Response, Query
 from models import CryptoWallet, CryptoDepositRequest, CryptoWithdrawalRequest, CryptoType, TransactionType, TransactionStatus
 from middleware import get_current_user, rate_limit, log_audit
 from database import get_database
+from services.transactions import record_transaction
+from services.ledger import ledger, available, platform, EXTERNAL
+from services.money import to_money
+from services.pagination import keyset_page
 from datetime import datetime, timezone
-from typing import List
+from typing import List, Optional
 import secrets
 import hashlib
 
@@ -67,7 +71,7 @@ async def create_crypto_wallet(crypto_type: CryptoType, request: Request):
         "crypto_type": crypto_type,
         "address": address,
         "balance": 0.0,
-        "created_at": datetime.now(timezone.utc).isoformat()
+        "created_at": datetime.now(timezone.utc)
     }
     
     await db.crypto_wallets.insert_one(wallet)
@@ -94,11 +98,6 @@ async def get_crypto_wallets(request: Request):
         {"_id": 0}
     ).to_list(100)
     
-    # Convert datetime strings
-    for wallet in wallets:
-        if isinstance(wallet["created_at"], str):
-            wallet["created_at"] = datetime.fromisoformat(wallet["created_at"])
-    
     return wallets
 
 @router.get("/wallets/{wallet_id}/balance")
@@ -162,11 +161,13 @@ async def crypto_deposit(deposit_req: CryptoDepositRequest, request: Request):
     
     # Convert to internal currency and add to main wallet
     rate = get_crypto_rate(deposit_req.crypto_type)
-    usd_amount = deposit_req.amount * rate
+    usd_amount = to_money(deposit_req.amount * rate)
     
-    await db.wallets.update_one(
-        {"user_id": user["id"]},
-        {"$inc": {"balance": usd_amount}}
+    await ledger.post(
+        db,
+        "crypto_deposit",
+        [available(user["id"], usd_amount), platform(EXTERNAL, -usd_amount)],
+        {"tx_hash": deposit_req.tx_hash}
     )
     
     # Create transaction
@@ -182,10 +183,10 @@ async def crypto_deposit(deposit_req: CryptoDepositRequest, request: Request):
             "tx_hash": deposit_req.tx_hash,
             "rate": rate
         },
-        "created_at": datetime.now(timezone.utc).isoformat()
+        "created_at": datetime.now(timezone.utc)
     }
     
-    await db.transactions.insert_one(transaction)
+    await record_transaction(db, transaction)
     
     await log_audit(db, user["id"], "CRYPTO_DEPOSIT", {"amount": deposit_req.amount, "crypto_type": deposit_req.crypto_type}, request)
     
@@ -201,36 +202,15 @@ async def crypto_withdraw(withdrawal_req: CryptoWithdrawalRequest, request: Requ
     user = await get_current_user(request)
     db = get_database()
     
-    # Get wallet
-    wallet = await db.crypto_wallets.find_one({
-        "user_id": user["id"],
-        "crypto_type": withdrawal_req.crypto_type
-    }, {"_id": 0})
-    
-    if not wallet:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Crypto wallet not found"
-        )
-    
-    if wallet["balance"] < withdrawal_req.amount:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Insufficient crypto balance"
-        )
+    # Debit first so concurrent withdrawals cannot both pass the balance check
+    await ledger.debit_crypto(db, user["id"], withdrawal_req.crypto_type, withdrawal_req.amount)
     
     # Send transaction (mock)
     tx_hash = send_crypto_transaction(withdrawal_req.to_address, withdrawal_req.amount, withdrawal_req.crypto_type)
     
-    # Update balance
-    await db.crypto_wallets.update_one(
-        {"user_id": user["id"], "crypto_type": withdrawal_req.crypto_type},
-        {"$inc": {"balance": -withdrawal_req.amount}}
-    )
-    
     # Create transaction
     rate = get_crypto_rate(withdrawal_req.crypto_type)
-    usd_amount = withdrawal_req.amount * rate
+    usd_amount = to_money(withdrawal_req.amount * rate)
     
     transaction = {
         "user_id": user["id"],
@@ -245,10 +225,10 @@ async def crypto_withdraw(withdrawal_req: CryptoWithdrawalRequest, request: Requ
             "tx_hash": tx_hash,
             "rate": rate
         },
-        "created_at": datetime.now(timezone.utc).isoformat()
+        "created_at": datetime.now(timezone.utc)
     }
     
-    await db.transactions.insert_one(transaction)
+    await record_transaction(db, transaction)
     
     await log_audit(db, user["id"], "CRYPTO_WITHDRAWAL", {"amount": withdrawal_req.amount, "crypto_type": withdrawal_req.crypto_type}, request)
     
@@ -261,25 +241,26 @@ async def crypto_withdraw(withdrawal_req: CryptoWithdrawalRequest, request: Requ
 @router.get("/transactions")
 async def get_crypto_transactions(
     request: Request,
-    skip: int = Query(0, ge=0),
+    response: Response,
+    cursor: Optional[str] = None,
     limit: int = Query(20, ge=1, le=100)
 ):
-    """Get crypto transaction history"""
+    """Get crypto transaction history (next page cursor in X-Next-Cursor)"""
     user = await get_current_user(request)
     db = get_database()
     
-    transactions = await db.transactions.find(
+    transactions, next_cursor = await keyset_page(
+        db.transactions,
         {
             "user_id": user["id"],
             "metadata.crypto_type": {"$exists": True}
         },
-        {"_id": 0}
-    ).sort("created_at", -1).skip(skip).limit(limit).to_list(limit)
-    
-    # Convert datetime strings
-    for tx in transactions:
-        if isinstance(tx["created_at"], str):
-            tx["created_at"] = datetime.fromisoformat(tx["created_at"])
+        "created_at",
+        cursor,
+        limit
+    )
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
     
     return transactions
 
@@ -1,7 +1,12 @@
 from fastapi import APIRouter, HTTPException, status, Request
-from models import DocumentInvestment, DocumentInvestmentRequest, DocumentStatus, TransactionType, TransactionStatus
+from models import DocumentInvestment, DocumentInvestmentView, DocumentInvestmentRequest, DocumentStatus, TransactionType, TransactionStatus
 from middleware import get_current_user, rate_limit, log_audit
-from database import get_database
+from database import get_database, run_in_transaction
+from services.transactions import record_transaction
+from services.ledger import ledger, available, locked
+from services.money import to_money
+from services.enrichment import attach_documents
+from services.portfolio_analytics import PositionFrame, DOCUMENT_INVESTMENT_FIELDS, document_investment_summary
 from datetime import datetime, timezone
 from typing import List
 
@@ -29,25 +34,9 @@ async def invest_in_document(investment_req: DocumentInvestmentRequest, request:
             detail="Can only invest in approved documents"
         )
     
-    # Check balance
-    wallet = await db.wallets.find_one({"user_id": user["id"]}, {"_id": 0})
-    available_balance = wallet["balance"] - wallet["locked_balance"]
-    
-    if available_balance < investment_req.amount:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Insufficient available balance"
-        )
-    
     # Calculate share percentage (simple: amount / document price)
     # In real scenario, this would be more complex
-    share_percentage = min((investment_req.amount / document["price"]) * 10, 50)  # Max 50% share
-    
-    # Lock amount in wallet
-    await db.wallets.update_one(
-        {"user_id": user["id"]},
-        {"$inc": {"locked_balance": investment_req.amount}}
-    )
+    share_percentage = float(min((investment_req.amount / to_money(document["price"])) * 10, 50))  # Max 50% share
     
     # Create investment
     investment = DocumentInvestment(
@@ -58,9 +47,26 @@ async def invest_in_document(investment_req: DocumentInvestmentRequest, request:
     )
     
     investment_dict = investment.model_dump()
-    investment_dict["created_at"] = investment_dict["created_at"].isoformat()
     
-    await db.document_investments.insert_one(investment_dict)
+    ref = {"document_id": investment_req.document_id, "investment_id": investment.id}
+    
+    async def open_investment(session):
+        # Lock amount in wallet if the available balance covers it
+        await ledger.lock(db, user["id"], investment_req.amount, "document_investment", ref, session=session)
+        try:
+            await db.document_investments.insert_one(investment_dict, session=session)
+        except Exception:
+            if session is None:
+                # No transaction to roll back the lock
+                await ledger.post(
+                    db,
+                    "document_investment_reversal",
+                    [locked(user["id"], -investment_req.amount), available(user["id"], investment_req.amount)],
+                    ref
+                )
+            raise
+    
+    await run_in_transaction(open_investment)
     
     # Create transaction
     transaction = {
@@ -70,10 +76,10 @@ async def invest_in_document(investment_req: DocumentInvestmentRequest, request:
         "status": TransactionStatus.COMPLETED,
         "description": f"Invested in document: {document['title']}",
         "metadata": {"document_id": investment_req.document_id, "share_percentage": share_percentage},
-        "created_at": datetime.now(timezone.utc).isoformat()
+        "created_at": datetime.now(timezone.utc)
     }
     
-    await db.transactions.insert_one(transaction)
+    await record_transaction(db, transaction)
     
     await log_audit(db, user["id"], "DOCUMENT_INVESTMENT", {"amount": investment_req.amount, "document_id": investment_req.document_id}, request)
     
@@ -83,7 +89,7 @@ async def invest_in_document(investment_req: DocumentInvestmentRequest, request:
         "share_percentage": share_percentage
     }
 
-@router.get("/portfolio", response_model=List[DocumentInvestment])
+@router.get("/portfolio", response_model=List[DocumentInvestmentView])
 async def get_document_investment_portfolio(request: Request):
     """Get user's document investment portfolio"""
     user = await get_current_user(request)
@@ -94,18 +100,8 @@ async def get_document_investment_portfolio(request: Request):
         {"_id": 0}
     ).sort("created_at", -1).to_list(100)
     
-    # Convert datetime strings and enrich with document info
-    for inv in investments:
-        if isinstance(inv["created_at"], str):
-            inv["created_at"] = datetime.fromisoformat(inv["created_at"])
-        
-        # Get document info
-        document = await db.documents.find_one({"id": inv["document_id"]}, {"_id": 0})
-        if document:
-            inv["document_title"] = document["title"]
-            inv["document_revenue"] = document.get("revenue", 0)
-    
-    return investments
+    # Enrich with document info in one query
+    return await attach_documents(db, investments)
 
 @router.get("/returns")
 async def get_document_investment_returns(request: Request):
@@ -113,16 +109,5 @@ async def get_document_investment_returns(request: Request):
     user = await get_current_user(request)
     db = get_database()
     
-    investments = await db.document_investments.find(
-        {"user_id": user["id"]},
-        {"_id": 0}
-    ).to_list(1000)
-    
-    total_invested = sum(inv["amount"] for inv in investments)
-    total_earned = sum(inv.get("revenue_earned", 0) for inv in investments)
-    
-    return {
-        "total_invested": total_invested,
-        "total_earned": total_earned,
-        "total_investments": len(investments)
-    }
+    investments = await PositionFrame.load(db.document_investments, {"user_id": user["id"]}, **DOCUMENT_INVESTMENT_FIELDS)
+    return document_investment_summary(investments)
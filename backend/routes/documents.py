@@ -1,11 +1,17 @@
-from fastapi import APIRouter, HTTPException, status, Request, UploadFile, File, Query
+from fastapi import APIRouter, HTTPException, status, Request, Response, UploadFile, File, Query
 from models import DocumentCreate, Document, DocumentStatus, TransactionType, TransactionStatus
 from middleware import get_current_user, get_optional_user, rate_limit, log_audit
 from database import get_database, get_gridfs
-from datetime import datetime, timezone
+from services.revenue_distribution import distribute_purchase
+from services.platform_metrics import platform_metrics
+from services.response_cache import response_cache
+from services.file_storage import (
+    check_file_type, stream_upload_to_gridfs, parse_range_header, etag_matches, iter_gridfs_range
+)
+from services.pagination import keyset_page, encode_cursor, decode_offset_cursor
+from config import settings
 from typing import List, Optional
 from fastapi.responses import StreamingResponse
-import io
 
 router = APIRouter(prefix="/documents", tags=["Documents"])
 
@@ -25,19 +31,20 @@ async def upload_document(
     db = get_database()
     fs = get_gridfs()
     
-    # Read file
-    file_content = await file.read()
-    file_size = len(file_content)
+    check_file_type(file.filename, settings.ALLOWED_FILE_TYPES)
     
-    # Upload to GridFS
-    file_id = await fs.upload_from_stream(
+    # Stream to GridFS
+    stored = await stream_upload_to_gridfs(
+        fs,
+        file,
         file.filename,
-        file_content,
         metadata={
             "user_id": user["id"],
             "type": "document",
             "category": category
-        }
+        },
+        max_size=settings.MAX_FILE_SIZE,
+        chunk_size=settings.UPLOAD_CHUNK_SIZE
     )
     
     # Create document
@@ -47,17 +54,17 @@ async def upload_document(
         category=category,
         price=price,
         seller_id=user["id"],
-        file_id=str(file_id),
+        file_id=str(stored.file_id),
         file_name=file.filename,
-        file_size=file_size,
+        file_size=stored.size,
+        file_hash=stored.sha256,
         tags=tags.split(",") if tags else []
     )
     
     doc_dict = doc.model_dump()
-    doc_dict["created_at"] = doc_dict["created_at"].isoformat()
-    doc_dict["updated_at"] = doc_dict["updated_at"].isoformat()
     
     await db.documents.insert_one(doc_dict)
+    await platform_metrics.increment(db, {"documents.total": 1, f"documents.by_status.{DocumentStatus.PENDING.value}": 1})
     
     await log_audit(db, user["id"], "DOCUMENT_UPLOADED", {"document_id": doc.id, "title": title}, request)
     
@@ -66,13 +73,19 @@ async def upload_document(
 @router.get("", response_model=List[Document])
 async def get_documents(
     request: Request,
+    response: Response,
     category: Optional[str] = None,
     status: Optional[str] = None,
     search: Optional[str] = None,
-    skip: int = Query(0, ge=0),
+    min_price: Optional[float] = Query(None, ge=0),
+    max_price: Optional[float] = Query(None, ge=0),
+    cursor: Optional[str] = None,
     limit: int = Query(20, ge=1, le=100)
 ):
-    """Get list of documents"""
+    """Get list of documents, ranked by relevance when searching
+
+    The next page cursor is returned in the X-Next-Cursor header.
+    """
     db = get_database()
     user = await get_optional_user(request)
     
@@ -88,21 +101,33 @@ async def get_documents(
     if category:
         query["category"] = category
     
-    if search:
-        query["$or"] = [
-            {"title": {"$regex": search, "$options": "i"}},
-            {"description": {"$regex": search, "$options": "i"}},
-            {"tags": {"$in": [search]}}
-        ]
+    if min_price is not None or max_price is not None:
+        query["price"] = {}
+        if min_price is not None:
+            query["price"]["$gte"] = min_price
+        if max_price is not None:
+            query["price"]["$lte"] = max_price
     
-    documents = await db.documents.find(query, {"_id": 0}).skip(skip).limit(limit).to_list(limit)
+    if search:
+        # Served by the documents_text index (title, tags, description).
+        # Relevance order has no stable key to seek on, so search cursors
+        # carry an offset into the ranked results instead.
+        query["$text"] = {"$search": search}
+        offset = decode_offset_cursor(cursor)
+        documents = await db.documents.find(
+            query,
+            {"_id": 0, "score": {"$meta": "textScore"}}
+        ).sort([("score", {"$meta": "textScore"}), ("created_at", -1)]).skip(offset).limit(limit + 1).to_list(limit + 1)
+        
+        next_cursor = None
+        if len(documents) > limit:
+            documents = documents[:limit]
+            next_cursor = encode_cursor({"offset": offset + limit})
+    else:
+        documents, next_cursor = await keyset_page(db.documents, query, "created_at", cursor, limit)
     
-    # Convert datetime strings
-    for doc in documents:
-        if isinstance(doc["created_at"], str):
-            doc["created_at"] = datetime.fromisoformat(doc["created_at"])
-        if isinstance(doc["updated_at"], str):
-            doc["updated_at"] = datetime.fromisoformat(doc["updated_at"])
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
     
     return documents
 
@@ -119,12 +144,6 @@ async def get_document(document_id: str, request: Request):
             detail="Document not found"
         )
     
-    # Convert datetime strings
-    if isinstance(document["created_at"], str):
-        document["created_at"] = datetime.fromisoformat(document["created_at"])
-    if isinstance(document["updated_at"], str):
-        document["updated_at"] = datetime.fromisoformat(document["updated_at"])
-    
     return document
 
 @router.get("/{document_id}/download")
@@ -158,17 +177,44 @@ async def download_document(document_id: str, request: Request):
                 detail="You must purchase this document first"
             )
     
-    # Download from GridFS
+    # Stream from GridFS
     from bson import ObjectId
-    file_stream = await fs.open_download_stream(ObjectId(document["file_id"]))
-    file_content = await file_stream.read()
+    etag = f'"{document.get("file_hash") or document["file_id"]}"'
+    headers = {
+        "ETag": etag,
+        "Accept-Ranges": "bytes",
+        "Cache-Control": "private, no-cache"
+    }
+    
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    
+    grid_out = await fs.open_download_stream(ObjectId(document["file_id"]))
+    length = grid_out.length
     
-    await log_audit(db, user["id"], "DOCUMENT_DOWNLOADED", {"document_id": document_id}, request)
+    # If-Range: only honour Range while the client's copy is still current
+    if_range = request.headers.get("if-range")
+    byte_range = None
+    if not if_range or if_range == etag:
+        byte_range = parse_range_header(request.headers.get("range"), length)
+    
+    if byte_range:
+        start, end = byte_range
+        status_code = status.HTTP_206_PARTIAL_CONTENT
+        headers["Content-Range"] = f"bytes {start}-{end}/{length}"
+    else:
+        start, end = 0, length - 1
+        status_code = status.HTTP_200_OK
+    headers["Content-Length"] = str(end - start + 1)
+    headers["Content-Disposition"] = f"attachment; filename={document['file_name']}"
+    
+    await log_audit(db, user["id"], "DOCUMENT_DOWNLOADED", {"document_id": document_id, "range": headers.get("Content-Range")}, request)
     
     return StreamingResponse(
-        io.BytesIO(file_content),
+        iter_gridfs_range(grid_out, start, end, settings.DOWNLOAD_CHUNK_SIZE),
+        status_code=status_code,
         media_type="application/octet-stream",
-        headers={"Content-Disposition": f"attachment; filename={document['file_name']}"}
+        headers=headers
     )
 
 @router.post("/{document_id}/purchase")
@@ -206,83 +252,9 @@ async def purchase_document(document_id: str, request: Request):
             detail="You have already purchased this document"
         )
     
-    # Get wallet
-    wallet = await db.wallets.find_one({"user_id": user["id"]}, {"_id": 0})
-    
-    if wallet["balance"] < document["price"]:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Insufficient balance"
-        )
-    
-    # Deduct from buyer
-    await db.wallets.update_one(
-        {"user_id": user["id"]},
-        {"$inc": {"balance": -document["price"]}}
-    )
-    
-    # Add to seller
-    await db.wallets.update_one(
-        {"user_id": document["seller_id"]},
-        {"$inc": {"balance": document["price"]}}
-    )
-    
-    # Create purchase transaction
-    transaction = {
-        "user_id": user["id"],
-        "type": TransactionType.PURCHASE,
-        "amount": document["price"],
-        "status": TransactionStatus.COMPLETED,
-        "description": f"Purchased document: {document['title']}",
-        "metadata": {"document_id": document_id},
-        "created_at": datetime.now(timezone.utc).isoformat()
-    }
-    await db.transactions.insert_one(transaction)
-    
-    # Create sale transaction for seller
-    sale_transaction = {
-        "user_id": document["seller_id"],
-        "type": TransactionType.SALE,
-        "amount": document["price"],
-        "status": TransactionStatus.COMPLETED,
-        "description": f"Sold document: {document['title']}",
-        "metadata": {"document_id": document_id, "buyer_id": user["id"]},
-        "created_at": datetime.now(timezone.utc).isoformat()
-    }
-    await db.transactions.insert_one(sale_transaction)
-    
-    # Update document stats
-    await db.documents.update_one(
-        {"id": document_id},
-        {"$inc": {"downloads": 1, "revenue": document["price"]}}
-    )
-    
-    # Distribute to investors if any
-    investments = await db.document_investments.find({"document_id": document_id}).to_list(100)
-    for investment in investments:
-        investor_share = document["price"] * (investment["share_percentage"] / 100)
-        
-        await db.wallets.update_one(
-            {"user_id": investment["user_id"]},
-            {"$inc": {"balance": investor_share}}
-        )
-        
-        await db.document_investments.update_one(
-            {"id": investment["id"]},
-            {"$inc": {"revenue_earned": investor_share}}
-        )
-        
-        # Create reward transaction
-        reward_tx = {
-            "user_id": investment["user_id"],
-            "type": TransactionType.REWARD,
-            "amount": investor_share,
-            "status": TransactionStatus.COMPLETED,
-            "description": f"Investment return from document: {document['title']}",
-            "metadata": {"document_id": document_id},
-            "created_at": datetime.now(timezone.utc).isoformat()
-        }
-        await db.transactions.insert_one(reward_tx)
+    # Debit, credits, transactions and investor payouts commit together
+    await distribute_purchase(db, document, user["id"])
+    response_cache.invalidate_document(document_id)
     
     await log_audit(db, user["id"], "DOCUMENT_PURCHASED", {"document_id": document_id, "price": document["price"]}, request)
     
@@ -316,7 +288,13 @@ async def delete_document(document_id: str, request: Request):
     await fs.delete(ObjectId(document["file_id"]))
     
     # Delete document
-    await db.documents.delete_one({"id": document_id})
+    result = await db.documents.delete_one({"id": document_id})
+    if result.deleted_count:
+        await platform_metrics.increment(db, {
+            "documents.total": -1,
+            f"documents.by_status.{document['status']}": -1
+        })
+    response_cache.invalidate_document(document_id)
     
     await log_audit(db, user["id"], "DOCUMENT_DELETED", {"document_id": document_id}, request)
     
@@ -1,7 +1,12 @@
 from fastapi import APIRouter, HTTPException, status, Request, Query
 from models import InvestmentPosition, InvestmentRequest, DocumentInvestment, DocumentInvestmentRequest, TransactionType, TransactionStatus
 from middleware import get_current_user, rate_limit, log_audit
-from database import get_database
+from database import get_database, run_in_transaction
+from services.transactions import record_transaction
+from services.ledger import ledger
+from services.portfolio_analytics import (
+    PositionFrame, INVESTMENT_FIELDS, STAKING_FIELDS, investment_summary, staking_summary, projection_series
+)
 from config import settings
 from datetime import datetime, timedelta, timezone
 from typing import List
@@ -53,22 +58,6 @@ async def purchase_investment(investment_req: InvestmentRequest, request: Reques
     
     package_config = settings.INVESTMENT_PACKAGES[investment_req.package]
     
-    # Check balance
-    wallet = await db.wallets.find_one({"user_id": user["id"]}, {"_id": 0})
-    available_balance = wallet["balance"] - wallet["locked_balance"]
-    
-    if available_balance < package_config["price"]:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Insufficient available balance"
-        )
-    
-    # Lock amount in wallet
-    await db.wallets.update_one(
-        {"user_id": user["id"]},
-        {"$inc": {"locked_balance": package_config["price"]}}
-    )
-    
     # Create investment position
     expires_at = datetime.now(timezone.utc) + timedelta(days=package_config["duration_days"])
     
@@ -81,23 +70,39 @@ async def purchase_investment(investment_req: InvestmentRequest, request: Reques
     )
     
     position_dict = position.model_dump()
-    position_dict["expires_at"] = position_dict["expires_at"].isoformat()
-    position_dict["created_at"] = position_dict["created_at"].isoformat()
     
-    await db.investment_positions.insert_one(position_dict)
+    async def open_position(session):
+        # Inserted as pending and only activated once the amount is locked,
+        # so without a transaction a failure in between never leaves an
+        # active position that was not paid for
+        await db.investment_positions.insert_one({**position_dict, "status": "pending"}, session=session)
+        try:
+            # Lock amount in wallet if the available balance covers it
+            await ledger.lock(db, user["id"], position.amount, "investment", {"position_id": position.id}, session=session)
+        except Exception:
+            if session is None:
+                await db.investment_positions.delete_one({"id": position.id, "status": "pending"})
+            raise
+        await db.investment_positions.update_one(
+            {"id": position.id, "status": "pending"},
+            {"$set": {"status": "active"}},
+            session=session
+        )
+    
+    await run_in_transaction(open_position)
     
     # Create transaction
     transaction = {
         "user_id": user["id"],
         "type": TransactionType.INVESTMENT,
-        "amount": package_config["price"],
+        "amount": position.amount,
         "status": TransactionStatus.COMPLETED,
         "description": f"Invested in {investment_req.package} package",
         "metadata": {"package": investment_req.package, "position_id": position.id},
-        "created_at": datetime.now(timezone.utc).isoformat()
+        "created_at": datetime.now(timezone.utc)
     }
     
-    await db.transactions.insert_one(transaction)
+    await record_transaction(db, transaction)
     
     await log_audit(db, user["id"], "INVESTMENT_PURCHASED", {"amount": package_config["price"], "package": investment_req.package}, request)
     
@@ -118,57 +123,6 @@ async def get_investment_portfolio(request: Request):
         {"_id": 0}
     ).sort("created_at", -1).to_list(100)
     
-    # Convert datetime strings and check for matured investments
-    current_time = datetime.now(timezone.utc)
-    
-    for pos in positions:
-        if isinstance(pos["created_at"], str):
-            pos["created_at"] = datetime.fromisoformat(pos["created_at"])
-        if isinstance(pos["expires_at"], str):
-            pos["expires_at"] = datetime.fromisoformat(pos["expires_at"])
-        
-        # Auto-complete matured investments
-        if pos["status"] == "active" and current_time >= pos["expires_at"]:
-            returns = pos["amount"] * (pos["expected_return"] / 100)
-            total_return = pos["amount"] + returns
-            
-            # Unlock and add returns
-            await db.wallets.update_one(
-                {"user_id": user["id"]},
-                {
-                    "$inc": {
-                        "balance": returns,
-                        "locked_balance": -pos["amount"]
-                    }
-                }
-            )
-            
-            # Update position
-            await db.investment_positions.update_one(
-                {"id": pos["id"]},
-                {
-                    "$set": {
-                        "status": "completed",
-                        "returns_earned": returns
-                    }
-                }
-            )
-            
-            # Create reward transaction
-            reward_tx = {
-                "user_id": user["id"],
-                "type": TransactionType.REWARD,
-                "amount": returns,
-                "status": TransactionStatus.COMPLETED,
-                "description": f"Investment returns from {pos['package']} package",
-                "metadata": {"position_id": pos["id"]},
-                "created_at": current_time.isoformat()
-            }
-            await db.transactions.insert_one(reward_tx)
-            
-            pos["status"] = "completed"
-            pos["returns_earned"] = returns
-    
     return positions
 
 @router.get("/returns")
@@ -177,24 +131,27 @@ async def get_investment_returns(request: Request):
     user = await get_current_user(request)
     db = get_database()
     
-    positions = await db.investment_positions.find(
-        {"user_id": user["id"]},
-        {"_id": 0}
-    ).to_list(1000)
-    
-    total_invested = sum(pos["amount"] for pos in positions)
-    total_earned = sum(pos.get("returns_earned", 0) for pos in positions)
-    active_positions = [pos for pos in positions if pos["status"] == "active"]
+    positions = await PositionFrame.load(db.investment_positions, {"user_id": user["id"]}, **INVESTMENT_FIELDS)
+    return investment_summary(positions)
+
+@router.get("/projection")
+async def get_portfolio_projection(
+    request: Request,
+    days: int = Query(90, ge=1, le=730),
+    step: int = Query(1, ge=1, le=30)
+):
+    """Get projected portfolio value with investment and staking breakdowns"""
+    user = await get_current_user(request)
+    db = get_database()
     
-    # Calculate expected returns from active positions
-    expected_returns = sum(
-        pos["amount"] * (pos["expected_return"] / 100)
-        for pos in active_positions
-    )
+    investments = await PositionFrame.load(db.investment_positions, {"user_id": user["id"]}, **INVESTMENT_FIELDS)
+    staking = await PositionFrame.load(db.staking_positions, {"user_id": user["id"]}, **STAKING_FIELDS)
+    now = datetime.now(timezone.utc)
     
     return {
-        "total_invested": total_invested,
-        "total_earned": total_earned,
-        "expected_returns": expected_returns,
-        "active_positions": len(active_positions)
+        "days": days,
+        "step": step,
+        "investments": investment_summary(investments),
+        "staking": staking_summary(staking, now),
+        "points": projection_series(investments, staking, now, days, step)
     }
@@ -1,7 +1,12 @@
 from fastapi import APIRouter, HTTPException, status, Request, Query
 from models import StakingPosition, StakingRequest, TransactionType, TransactionStatus
 from middleware import get_current_user, rate_limit, log_audit
-from database import get_database
+from database import get_database, run_in_transaction
+from services.transactions import record_transaction
+from services.ledger import ledger, available, locked, platform, REWARDS
+from services.staking_rewards import staking_accrual, staking_reward, days_staked
+from services.money import ZERO, to_money
+from services.dates import as_datetime
 from config import settings
 from datetime import datetime, timedelta, timezone
 from typing import List
@@ -60,22 +65,6 @@ async def stake_coins(stake_req: StakingRequest, request: Request):
             detail=f"Minimum amount for {stake_req.plan} plan is {plan_config['min_amount']}"
         )
     
-    # Check balance
-    wallet = await db.wallets.find_one({"user_id": user["id"]}, {"_id": 0})
-    available_balance = wallet["balance"] - wallet["locked_balance"]
-    
-    if available_balance < stake_req.amount:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Insufficient available balance"
-        )
-    
-    # Lock amount in wallet
-    await db.wallets.update_one(
-        {"user_id": user["id"]},
-        {"$inc": {"locked_balance": stake_req.amount}}
-    )
-    
     # Create staking position
     locked_until = datetime.now(timezone.utc) + timedelta(days=plan_config["lock_days"])
     
@@ -88,10 +77,26 @@ async def stake_coins(stake_req: StakingRequest, request: Request):
     )
     
     position_dict = position.model_dump()
-    position_dict["locked_until"] = position_dict["locked_until"].isoformat()
-    position_dict["created_at"] = position_dict["created_at"].isoformat()
     
-    await db.staking_positions.insert_one(position_dict)
+    async def open_position(session):
+        # Inserted as pending and only activated once the amount is locked,
+        # so without a transaction a failure in between never leaves an
+        # active position that was not paid for
+        await db.staking_positions.insert_one({**position_dict, "status": "pending"}, session=session)
+        try:
+            # Lock amount in wallet if the available balance covers it
+            await ledger.lock(db, user["id"], stake_req.amount, "staking", {"position_id": position.id}, session=session)
+        except Exception:
+            if session is None:
+                await db.staking_positions.delete_one({"id": position.id, "status": "pending"})
+            raise
+        await db.staking_positions.update_one(
+            {"id": position.id, "status": "pending"},
+            {"$set": {"status": "active"}},
+            session=session
+        )
+    
+    await run_in_transaction(open_position)
     
     # Create transaction
     transaction = {
@@ -101,10 +106,11 @@ async def stake_coins(stake_req: StakingRequest, request: Request):
         "status": TransactionStatus.COMPLETED,
         "description": f"Staked {stake_req.amount} in {stake_req.plan} plan",
         "metadata": {"plan": stake_req.plan, "position_id": position.id},
-        "created_at": datetime.now(timezone.utc).isoformat()
+        "created_at": datetime.now(timezone.utc)
     }
     
-    await db.transactions.insert_one(transaction)
+    await record_transaction(db, transaction)
+    await staking_accrual.refresh_user(db, user["id"])
     
     await log_audit(db, user["id"], "COINS_STAKED", {"amount": stake_req.amount, "plan": stake_req.plan}, request)
     
@@ -139,7 +145,7 @@ async def unstake_coins(position_id: str, request: Request):
         )
     
     # Check if lock period has ended
-    locked_until = datetime.fromisoformat(position["locked_until"]) if isinstance(position["locked_until"], str) else position["locked_until"]
+    locked_until = as_datetime(position["locked_until"])
     current_time = datetime.now(timezone.utc)
     
     if current_time < locked_until:
@@ -149,34 +155,48 @@ async def unstake_coins(position_id: str, request: Request):
         )
     
     # Calculate rewards
-    days_staked = (current_time - (datetime.fromisoformat(position["created_at"]) if isinstance(position["created_at"], str) else position["created_at"])).days
-    annual_reward = position["amount"] * (position["apy"] / 100)
-    daily_reward = annual_reward / 365
-    total_reward = daily_reward * days_staked
+    total_reward = staking_reward(position["amount"], position["apy"], days_staked(position["created_at"], current_time))
     
     # Unlock amount and add rewards
-    total_return = position["amount"] + total_reward
-    
-    await db.wallets.update_one(
-        {"user_id": user["id"]},
-        {
-            "$inc": {
-                "balance": total_reward,
-                "locked_balance": -position["amount"]
-            }
-        }
-    )
-    
-    # Update position
-    await db.staking_positions.update_one(
-        {"id": position_id},
-        {
-            "$set": {
-                "status": "completed",
-                "rewards_earned": total_reward
-            }
-        }
-    )
+    total_return = to_money(position["amount"]) + total_reward
+    
+    async def settle(session):
+        # Claim the position first, so concurrent unstakes cannot both pay out
+        claimed = await db.staking_positions.find_one_and_update(
+            {"id": position_id, "user_id": user["id"], "status": "active"},
+            {"$set": {"status": "completed", "rewards_earned": total_reward}},
+            projection={"_id": 1},
+            session=session
+        )
+        if claimed is None:
+            return False
+        try:
+            await ledger.post(
+                db,
+                "unstaking",
+                [
+                    locked(user["id"], -position["amount"]),
+                    available(user["id"], total_return),
+                    platform(REWARDS, -total_reward)
+                ],
+                {"position_id": position_id},
+                session=session
+            )
+        except Exception:
+            if session is None:
+                # No transaction to roll back the claim
+                await db.staking_positions.update_one(
+                    {"id": position_id, "status": "completed"},
+                    {"$set": {"status": "active", "rewards_earned": position.get("rewards_earned", ZERO)}}
+                )
+            raise
+        return True
+    
+    if not await run_in_transaction(settle):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Position is not active"
+        )
     
     # Create transactions
     unstake_tx = {
@@ -186,7 +206,7 @@ async def unstake_coins(position_id: str, request: Request):
         "status": TransactionStatus.COMPLETED,
         "description": f"Unstaked from {position['plan']} plan",
         "metadata": {"position_id": position_id},
-        "created_at": current_time.isoformat()
+        "created_at": current_time
     }
     
     reward_tx = {
@@ -196,11 +216,12 @@ async def unstake_coins(position_id: str, request: Request):
         "status": TransactionStatus.COMPLETED,
         "description": f"Staking rewards from {position['plan']} plan",
         "metadata": {"position_id": position_id},
-        "created_at": current_time.isoformat()
+        "created_at": current_time
     }
     
-    await db.transactions.insert_one(unstake_tx)
-    await db.transactions.insert_one(reward_tx)
+    await record_transaction(db, unstake_tx)
+    await record_transaction(db, reward_tx)
+    await staking_accrual.refresh_user(db, user["id"])
     
     await log_audit(db, user["id"], "COINS_UNSTAKED", {"amount": position["amount"], "reward": total_reward}, request)
     
@@ -223,13 +244,6 @@ async def get_staking_positions(request: Request):
         {"_id": 0}
     ).sort("created_at", -1).to_list(100)
     
-    # Convert datetime strings
-    for pos in positions:
-        if isinstance(pos["created_at"], str):
-            pos["created_at"] = datetime.fromisoformat(pos["created_at"])
-        if isinstance(pos["locked_until"], str):
-            pos["locked_until"] = datetime.fromisoformat(pos["locked_until"])
-    
     return positions
 
 @router.get("/rewards")
@@ -238,26 +252,5 @@ async def get_staking_rewards(request: Request):
     user = await get_current_user(request)
     db = get_database()
     
-    # Get all completed positions
-    positions = await db.staking_positions.find(
-        {"user_id": user["id"]},
-        {"_id": 0}
-    ).to_list(1000)
-    
-    total_earned = sum(pos.get("rewards_earned", 0) for pos in positions)
-    active_positions = [pos for pos in positions if pos["status"] == "active"]
-    
-    # Calculate pending rewards
-    pending_rewards = 0
-    for pos in active_positions:
-        created_at = datetime.fromisoformat(pos["created_at"]) if isinstance(pos["created_at"], str) else pos["created_at"]
-        days_staked = (datetime.now(timezone.utc) - created_at).days
-        annual_reward = pos["amount"] * (pos["apy"] / 100)
-        daily_reward = annual_reward / 365
-        pending_rewards += daily_reward * days_staked
-    
-    return {
-        "total_earned": total_earned,
-        "pending_rewards": pending_rewards,
-        "active_positions": len(active_positions)
-    }
+    # Maintained by the staking accrual job and refreshed on stake/unstake
+    return await staking_accrual.read_summary(db, user["id"])
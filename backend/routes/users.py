@@ -2,6 +2,8 @@ from fastapi import APIRouter, HTTPException, status, Request, UploadFile, File
 from models import UserProfile, KYCSubmission, KYCStatus
 from middleware import get_current_user, rate_limit, log_audit
 from database import get_database, get_gridfs
+from services.principal_cache import principal_cache
+from services.platform_metrics import platform_metrics
 from datetime import datetime, timezone
 import base64
 
@@ -21,7 +23,7 @@ async def get_profile(request: Request):
         role=user["role"],
         kyc_status=user["kyc_status"],
         is_2fa_enabled=user.get("is_2fa_enabled", False),
-        created_at=datetime.fromisoformat(user["created_at"]) if isinstance(user["created_at"], str) else user["created_at"]
+        created_at=user["created_at"]
     )
 
 @router.put("/profile")
@@ -37,11 +39,12 @@ async def update_profile(request: Request, full_name: str = None, phone: str = N
         update_data["phone"] = phone
     
     if update_data:
-        update_data["updated_at"] = datetime.now(timezone.utc).isoformat()
+        update_data["updated_at"] = datetime.now(timezone.utc)
         await db.users.update_one(
             {"id": user["id"]},
             {"$set": update_data}
         )
+        principal_cache.invalidate_user(user["id"])
     
     await log_audit(db, user["id"], "PROFILE_UPDATED", update_data, request)
     
@@ -113,16 +116,18 @@ async def submit_kyc(
         "selfie_file_id": str(selfie_id),
         "address_proof_file_id": str(address_proof_id) if address_proof_id else None,
         "status": KYCStatus.PENDING,
-        "submitted_at": datetime.now(timezone.utc).isoformat()
+        "submitted_at": datetime.now(timezone.utc)
     }
     
     await db.kyc_submissions.insert_one(kyc_data)
+    await platform_metrics.increment(db, {"pending.kyc": 1})
     
     # Update user KYC status
     await db.users.update_one(
         {"id": user["id"]},
         {"$set": {"kyc_status": KYCStatus.PENDING}}
     )
+    principal_cache.invalidate_user(user["id"])
     
     await log_audit(db, user["id"], "KYC_SUBMITTED", {"id_type": id_type}, request)
     
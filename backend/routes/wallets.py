@@ -1,9 +1,16 @@
-from fastapi import APIRouter, HTTPException, status, Request, Query
+from fastapi import APIRouter, HTTPException, status, Request, Response, Query
 from models import Wallet, DepositRequest, WithdrawalRequest, Transaction, TransactionType, TransactionStatus
 from middleware import get_current_user, rate_limit, log_audit
 from database import get_database
+from services.transactions import record_transaction
+from services.ledger import ledger
+from services.money import to_money
+from services.platform_metrics import platform_metrics
+from services.pagination import keyset_page
+from services.transaction_summary import transaction_summary
 from datetime import datetime, timezone
-from typing import List
+from typing import List, Optional
+import uuid
 
 router = APIRouter(prefix="/wallets", tags=["Wallets"])
 
@@ -22,9 +29,9 @@ async def get_balance(request: Request):
         )
     
     return {
-        "balance": wallet["balance"],
-        "locked_balance": wallet["locked_balance"],
-        "available_balance": wallet["balance"] - wallet["locked_balance"]
+        "balance": to_money(wallet["balance"]),
+        "locked_balance": to_money(wallet["locked_balance"]),
+        "available_balance": to_money(wallet["balance"]) - to_money(wallet["locked_balance"])
     }
 
 @router.post("/deposit")
@@ -40,36 +47,43 @@ async def request_deposit(deposit_req: DepositRequest, request: Request):
             detail="Amount must be greater than 0"
         )
     
-    # Create deposit request
+    transaction_id = str(uuid.uuid4())
+    
+    # Create deposit request, linked to its transaction
     deposit_data = {
+        "id": str(uuid.uuid4()),
+        "transaction_id": transaction_id,
         "user_id": user["id"],
         "amount": deposit_req.amount,
         "payment_method": deposit_req.payment_method,
         "payment_proof": deposit_req.payment_proof,
         "status": TransactionStatus.PENDING,
-        "created_at": datetime.now(timezone.utc).isoformat()
+        "created_at": datetime.now(timezone.utc)
     }
     
     await db.deposit_requests.insert_one(deposit_data)
+    await platform_metrics.increment(db, {"pending.deposits": 1})
     
     # Create transaction
     transaction = {
+        "id": transaction_id,
         "user_id": user["id"],
         "type": TransactionType.DEPOSIT,
         "amount": deposit_req.amount,
         "status": TransactionStatus.PENDING,
         "description": f"Deposit request via {deposit_req.payment_method}",
         "metadata": {"payment_method": deposit_req.payment_method},
-        "created_at": datetime.now(timezone.utc).isoformat()
+        "created_at": datetime.now(timezone.utc)
     }
     
-    await db.transactions.insert_one(transaction)
+    await record_transaction(db, transaction)
     
     await log_audit(db, user["id"], "DEPOSIT_REQUESTED", {"amount": deposit_req.amount}, request)
     
     return {
         "success": True,
-        "message": "Deposit request submitted. Waiting for admin approval."
+        "message": "Deposit request submitted. Waiting for admin approval.",
+        "deposit_id": deposit_data["id"]
     }
 
 @router.post("/withdraw")
@@ -85,36 +99,30 @@ async def request_withdrawal(withdrawal_req: WithdrawalRequest, request: Request
             detail="Amount must be greater than 0"
         )
     
-    # Check balance
-    wallet = await db.wallets.find_one({"user_id": user["id"]}, {"_id": 0})
-    available_balance = wallet["balance"] - wallet["locked_balance"]
+    withdrawal_id = str(uuid.uuid4())
+    transaction_id = str(uuid.uuid4())
     
-    if available_balance < withdrawal_req.amount:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Insufficient available balance"
-        )
+    # Lock the amount if the available balance covers it
+    await ledger.lock(db, user["id"], withdrawal_req.amount, "withdrawal_request", {"withdrawal_id": withdrawal_id})
     
-    # Lock the amount
-    await db.wallets.update_one(
-        {"user_id": user["id"]},
-        {"$inc": {"locked_balance": withdrawal_req.amount}}
-    )
-    
-    # Create withdrawal request
+    # Create withdrawal request, linked to its transaction
     withdrawal_data = {
+        "id": withdrawal_id,
+        "transaction_id": transaction_id,
         "user_id": user["id"],
         "amount": withdrawal_req.amount,
         "withdrawal_method": withdrawal_req.withdrawal_method,
         "withdrawal_address": withdrawal_req.withdrawal_address,
         "status": TransactionStatus.PENDING,
-        "created_at": datetime.now(timezone.utc).isoformat()
+        "created_at": datetime.now(timezone.utc)
     }
     
     await db.withdrawal_requests.insert_one(withdrawal_data)
+    await platform_metrics.increment(db, {"pending.withdrawals": 1})
     
     # Create transaction
     transaction = {
+        "id": transaction_id,
         "user_id": user["id"],
         "type": TransactionType.WITHDRAWAL,
         "amount": withdrawal_req.amount,
@@ -124,26 +132,28 @@ async def request_withdrawal(withdrawal_req: WithdrawalRequest, request: Request
             "withdrawal_method": withdrawal_req.withdrawal_method,
             "withdrawal_address": withdrawal_req.withdrawal_address
         },
-        "created_at": datetime.now(timezone.utc).isoformat()
+        "created_at": datetime.now(timezone.utc)
     }
     
-    await db.transactions.insert_one(transaction)
+    await record_transaction(db, transaction)
     
     await log_audit(db, user["id"], "WITHDRAWAL_REQUESTED", {"amount": withdrawal_req.amount}, request)
     
     return {
         "success": True,
-        "message": "Withdrawal request submitted. Waiting for admin approval."
+        "message": "Withdrawal request submitted. Waiting for admin approval.",
+        "withdrawal_id": withdrawal_id
     }
 
 @router.get("/transactions", response_model=List[Transaction])
 async def get_transactions(
     request: Request,
+    response: Response,
     type: str = None,
-    skip: int = Query(0, ge=0),
+    cursor: Optional[str] = None,
     limit: int = Query(20, ge=1, le=100)
 ):
-    """Get transaction history"""
+    """Get transaction history (next page cursor in X-Next-Cursor)"""
     user = await get_current_user(request)
     db = get_database()
     
@@ -151,14 +161,31 @@ async def get_transactions(
     if type:
         query["type"] = type
     
-    transactions = await db.transactions.find(
-        query,
-        {"_id": 0}
-    ).sort("created_at", -1).skip(skip).limit(limit).to_list(limit)
-    
-    # Convert datetime strings
-    for tx in transactions:
-        if isinstance(tx["created_at"], str):
-            tx["created_at"] = datetime.fromisoformat(tx["created_at"])
+    transactions, next_cursor = await keyset_page(db.transactions, query, "created_at", cursor, limit)
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
     
     return transactions
+
+@router.get("/transactions/summary")
+@rate_limit(max_calls=60, time_window=60)
+async def get_transaction_summary(
+    request: Request,
+    bucket: str = Query("month", pattern="^(day|month)$"),
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None
+):
+    """Get transaction counts and totals per period, type and status"""
+    user = await get_current_user(request)
+    db = get_database()
+    
+    # Naive datetimes are taken as UTC
+    since = since.replace(tzinfo=timezone.utc) if since and since.tzinfo is None else since
+    until = until.replace(tzinfo=timezone.utc) if until and until.tzinfo is None else until
+    
+    periods = await transaction_summary.get(db, user["id"], bucket, since, until)
+    
+    return {
+        "bucket": bucket,
+        "periods": periods
+    }
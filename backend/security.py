@@ -4,6 +4,7 @@ from datetime import datetime, timedelta, timezone
 from config import settings
 from models import TokenData
 from typing import Optional
+from services.password_pool import password_pool
 import secrets
 import hashlib
 
@@ -17,6 +18,14 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
     """Verify a password against a hash"""
     return pwd_context.verify(plain_password, hashed_password)
 
+async def hash_password_async(password: str) -> str:
+    """Hash a password on the password worker pool"""
+    return await password_pool.run(hash_password, password)
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """Verify a password on the password worker pool"""
+    return await password_pool.run(verify_password, plain_password, hashed_password)
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
     """Create a JWT access token"""
     to_encode = data.copy()
@@ -1,7 +1,18 @@
 from fastapi import FastAPI, APIRouter
 from fastapi.middleware.cors import CORSMiddleware
 from config import settings
-from database import connect_to_mongo, close_mongo_connection
+from database import connect_to_mongo, close_mongo_connection, get_database
+from services.password_pool import password_pool
+from services.rate_limiter import rate_limiter
+from services.scheduler import scheduler
+from services.platform_metrics import platform_metrics
+from services.maturity import maturity_engine
+from services.staking_rewards import staking_accrual
+from services.index_manager import index_manager
+from services.audit_writer import audit_writer
+from services.audit_store import audit_store
+from services.response_cache import ResponseCacheMiddleware, response_cache
+from services.ledger import ledger
 import logging
 
 # Configure logging
@@ -54,6 +65,9 @@ async def health_check():
 # Include router in app
 app.include_router(api_router)
 
+# Cached public GET responses (added first so CORS still wraps them)
+app.add_middleware(ResponseCacheMiddleware, cache=response_cache)
+
 # CORS middleware
 app.add_middleware(
     CORSMiddleware,
@@ -68,13 +82,30 @@ app.add_middleware(
 async def startup_event():
     logger.info("Starting Document Exchange API...")
     await connect_to_mongo()
+    
+    # Missing indexes build in the background; startup does not wait
+    index_manager.start(get_database())
+    audit_writer.start()
+    
+    scheduler.register("rate_limit_sweep", settings.RATE_LIMIT_SWEEP_INTERVAL, rate_limiter.sweep)
+    scheduler.register("metrics_reconcile", settings.METRICS_RECONCILE_INTERVAL, platform_metrics.reconcile, run_on_start=True)
+    scheduler.register("investment_maturity", settings.MATURITY_SETTLE_INTERVAL, maturity_engine.run, run_on_start=True)
+    scheduler.register("staking_accrual", settings.STAKING_ACCRUAL_INTERVAL, staking_accrual.run, run_on_start=True)
+    scheduler.register("audit_archive", settings.AUDIT_ARCHIVE_INTERVAL, audit_store.run)
+    scheduler.register("ledger_audit", settings.LEDGER_AUDIT_INTERVAL, ledger.run)
+    scheduler.start()
     logger.info("Document Exchange API started successfully")
 
 # Shutdown event
 @app.on_event("shutdown")
 async def shutdown_event():
     logger.info("Shutting down Document Exchange API...")
+    await scheduler.stop()
+    await index_manager.stop()
+    # Flush buffered audit entries while the connection is still open
+    await audit_writer.stop()
     await close_mongo_connection()
+    password_pool.shutdown()
     logger.info("Document Exchange API shut down successfully")
 
 if __name__ == "__main__":
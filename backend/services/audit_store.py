@@ -0,0 +1,349 @@
+from fastapi import HTTPException, status
+from pymongo import IndexModel, ReturnDocument, ASCENDING, DESCENDING
+from pymongo.errors import DuplicateKeyError
+from bson import json_util
+from bson.codec_options import TypeRegistry
+from services.pagination import keyset_page, encode_cursor, decode_cursor, count_total
+from database import get_database
+from config import settings
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Iterator, List, Optional, Tuple
+import asyncio
+import gzip
+import logging
+import os
+import re
+import shutil
+import uuid
+
+logger = logging.getLogger(__name__)
+
+PREFIX = "audit_logs_"
+PARTITION_PATTERN = re.compile(r"^audit_logs_(\d{4})_(\d{2})$")
+ARCHIVE_SUFFIX = ".jsonl.gz"
+
+PARTITION_INDEXES = [
+    IndexModel([("timestamp", DESCENDING), ("_id", DESCENDING)]),
+    IndexModel([("user_id", ASCENDING), ("timestamp", DESCENDING), ("_id", DESCENDING)]),
+    IndexModel([("action", ASCENDING), ("timestamp", DESCENDING), ("_id", DESCENDING)]),
+]
+
+def _utc(value: Optional[datetime]) -> Optional[datetime]:
+    # Naive datetimes (e.g. query parameters without an offset) are UTC
+    if value is not None and value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value
+
+def partition_name(timestamp: datetime) -> str:
+    """Monthly partition holding entries written at ``timestamp`` (UTC)"""
+    timestamp = _utc(timestamp).astimezone(timezone.utc)
+    return f"{PREFIX}{timestamp.year:04d}_{timestamp.month:02d}"
+
+def _month_index(name: str) -> int:
+    match = PARTITION_PATTERN.match(name)
+    return int(match.group(1)) * 12 + int(match.group(2)) - 1
+
+def _overlaps(name: str, since: Optional[datetime], until: Optional[datetime]) -> bool:
+    month = _month_index(name)
+    if since is not None and month < _month_index(partition_name(since)):
+        return False
+    if until is not None and month > _month_index(partition_name(until)):
+        return False
+    return True
+
+def _with_range(query: dict, since: Optional[datetime], until: Optional[datetime]) -> dict:
+    if not since and not until:
+        return query
+    query = dict(query)
+    query["timestamp"] = {}
+    if since:
+        query["timestamp"]["$gte"] = since
+    if until:
+        query["timestamp"]["$lt"] = until
+    return query
+
+def _matches(entry: dict, user_id: Optional[str], action: Optional[str], since: Optional[datetime], until: Optional[datetime]) -> bool:
+    if user_id is not None and entry.get("user_id") != user_id:
+        return False
+    if action is not None and entry.get("action") != action:
+        return False
+    if since is not None and entry["timestamp"] < since:
+        return False
+    if until is not None and entry["timestamp"] >= until:
+        return False
+    return True
+
+class AuditStore:
+    """Audit log entries stored in one collection per UTC month
+
+    Writes go to ``audit_logs_YYYY_MM``; reads visit only the partitions
+    that overlap the requested time range, newest first, so a page costs
+    the same however much history exists. Partitions older than
+    ``AUDIT_HOT_MONTHS`` are archived to gzip JSONL files and dropped;
+    ``search_archive`` scans those files offline.
+
+    Every worker runs the archiver, so a partition is first claimed in
+    ``audit_archive_claims`` for ``lease`` seconds. A partition is only
+    dropped once the archive on disk holds every one of its entries.
+    """
+
+    def __init__(self, archive_dir: Path, hot_months: int, lease: int):
+        self.archive_dir = Path(archive_dir)
+        self.hot_months = hot_months
+        self.lease = timedelta(seconds=lease)
+        # Identifies this process's claims and temporary files
+        self.owner = str(uuid.uuid4())
+        self._indexed = set()
+        self.archived = 0
+
+    async def partitions(self, db) -> List[str]:
+        """Existing partitions, newest first"""
+        names = await db.list_collection_names(filter={"name": {"$regex": PARTITION_PATTERN.pattern}})
+        return sorted(names, reverse=True)
+
+    async def _ensure_indexes(self, db, name: str):
+        if name not in self._indexed:
+            await db[name].create_indexes(PARTITION_INDEXES)
+            self._indexed.add(name)
+
+    async def write(self, db, entries: List[dict]):
+        """Insert entries into their monthly partitions"""
+        by_partition = {}
+        for entry in entries:
+            by_partition.setdefault(partition_name(entry["timestamp"]), []).append(entry)
+        for name, batch in by_partition.items():
+            await self._ensure_indexes(db, name)
+            await db[name].insert_many(batch, ordered=False)
+
+    async def query(
+        self,
+        db,
+        query: dict,
+        since: Optional[datetime],
+        until: Optional[datetime],
+        cursor: Optional[str],
+        limit: int
+    ) -> Tuple[List[dict], Optional[str]]:
+        """One page of entries across partitions, newest first
+
+        The cursor names the partition to resume in and the keyset cursor
+        within it.
+        """
+        since, until = _utc(since), _utc(until)
+        names = [name for name in await self.partitions(db) if _overlaps(name, since, until)]
+
+        inner_cursor = None
+        if cursor:
+            position = decode_cursor(cursor)
+            if (
+                not isinstance(position, dict)
+                or not isinstance(position.get("partition"), str)
+                or not isinstance(position.get("after"), (str, type(None)))
+            ):
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail="Invalid cursor"
+                )
+            names = [name for name in names if name <= position["partition"]]
+            if names and names[0] == position["partition"]:
+                inner_cursor = position.get("after")
+                if inner_cursor is None:
+                    names = names[1:]
+
+        query = _with_range(query, since, until)
+        rows = []
+        for i, name in enumerate(names):
+            page, after = await keyset_page(db[name], query, "timestamp", inner_cursor, limit - len(rows))
+            inner_cursor = None
+            rows.extend(page)
+            if len(rows) == limit:
+                if after is not None:
+                    return rows, encode_cursor({"partition": name, "after": after})
+                if i + 1 < len(names):
+                    return rows, encode_cursor({"partition": name, "after": None})
+                break
+        return rows, None
+
+    async def count(self, db, query: dict, since: Optional[datetime], until: Optional[datetime]) -> int:
+        since, until = _utc(since), _utc(until)
+        names = [name for name in await self.partitions(db) if _overlaps(name, since, until)]
+        query = _with_range(query, since, until)
+        totals = await asyncio.gather(*(count_total(db[name], query) for name in names))
+        return sum(totals)
+
+    def _cold_partitions(self, names: List[str], now: datetime) -> List[str]:
+        current = _month_index(partition_name(now))
+        return [name for name in names if current - _month_index(name) >= self.hot_months]
+
+    def _archive_path(self, name: str) -> Path:
+        return self.archive_dir / f"{name}{ARCHIVE_SUFFIX}"
+
+    @staticmethod
+    def _count_lines(path: Path) -> int:
+        if not path.exists():
+            return 0
+        with gzip.open(path, "rt", encoding="utf-8") as fh:
+            return sum(1 for _ in fh)
+
+    async def _claim(self, db, name: str, now: datetime) -> Optional[dict]:
+        """Lease a partition to this process
+
+        Returns the claim as a previous holder left it (empty if there was
+        none), or None while another worker's lease is current.
+        """
+        try:
+            previous = await db.audit_archive_claims.find_one_and_update(
+                {"_id": name, "claimed_at": {"$lte": now - self.lease}},
+                {"$set": {"owner": self.owner, "claimed_at": now}},
+                upsert=True,
+                return_document=ReturnDocument.BEFORE
+            )
+        except DuplicateKeyError:
+            return None
+        return previous or {}
+
+    async def _export(self, db, name: str, tmp_path: Path) -> int:
+        """Write a partition to ``tmp_path`` after the existing archive
+
+        A partition recreated after its month was archived (e.g. by
+        migrations.partition_audit_logs) is appended to the existing file
+        as a further gzip member, which readers see as one stream.
+        """
+        path = self._archive_path(name)
+        mode = "wt"
+        if path.exists():
+            await asyncio.to_thread(shutil.copyfile, path, tmp_path)
+            mode = "at"
+        written = 0
+        with gzip.open(tmp_path, mode, encoding="utf-8") as fh:
+            # Read amounts as raw Decimal128, which json_util can write
+            raw = db.get_collection(name, codec_options=db.codec_options.with_options(type_registry=TypeRegistry()))
+            cursor = raw.find({}, {"_id": 0}).sort("timestamp", 1).batch_size(1000)
+            lines = []
+            async for entry in cursor:
+                lines.append(json_util.dumps(entry, json_options=json_util.RELAXED_JSON_OPTIONS))
+                if len(lines) == 1000:
+                    await asyncio.to_thread(fh.write, "\n".join(lines) + "\n")
+                    written += len(lines)
+                    lines = []
+            if lines:
+                await asyncio.to_thread(fh.write, "\n".join(lines) + "\n")
+                written += len(lines)
+        return written
+
+    async def _archive_partition(self, db, name: str, claim: dict) -> bool:
+        """Export and drop one claimed partition
+
+        Returns False if the partition was kept and its claim must stay
+        for an operator to look at.
+        """
+        path = self._archive_path(name)
+        on_disk = await asyncio.to_thread(self._count_lines, path)
+        expected = await db[name].count_documents({})
+
+        if "lines" in claim and on_disk != claim["before"]:
+            # The last holder verified its export but stopped before
+            # dropping; exporting again would duplicate its entries
+            if on_disk != claim["lines"] or expected != claim["written"]:
+                logger.error(f"Archive of {name} changed since an interrupted run; not dropping")
+                return False
+            written = expected
+        else:
+            self.archive_dir.mkdir(parents=True, exist_ok=True)
+            tmp_path = path.with_name(f"{path.name}.{self.owner}.tmp")
+            try:
+                written = await self._export(db, name, tmp_path)
+                lines = await asyncio.to_thread(self._count_lines, tmp_path)
+                if written != expected or lines != on_disk + written:
+                    # Entries arrived mid-export (clock skew); keep the
+                    # partition and leave the archive as it was
+                    logger.warning(f"Archive of {name} wrote {written} of {expected} entries; not dropping")
+                    return True
+                # Record the verified export before the file is replaced
+                result = await db.audit_archive_claims.update_one(
+                    {"_id": name, "owner": self.owner},
+                    {"$set": {"before": on_disk, "lines": lines, "written": written}}
+                )
+                if result.matched_count == 0:
+                    logger.warning(f"Claim on {name} expired during its export; not dropping")
+                    return True
+                os.replace(tmp_path, path)
+            finally:
+                tmp_path.unlink(missing_ok=True)
+
+        await db[name].drop()
+        self._indexed.discard(name)
+        self.archived += 1
+        logger.info(f"Archived {written} audit log entries from {name}")
+        return True
+
+    async def archive(self, db, now: Optional[datetime] = None):
+        """Export cold partitions to compressed files and drop them"""
+        now = now or datetime.now(timezone.utc)
+        for name in self._cold_partitions(await self.partitions(db), now):
+            claim = await self._claim(db, name, now)
+            if claim is None:
+                continue
+            # A failed run keeps its claim, so the next holder can tell
+            # whether the archive was already replaced
+            if await self._archive_partition(db, name, claim):
+                await db.audit_archive_claims.delete_one({"_id": name, "owner": self.owner})
+
+    async def run(self):
+        await self.archive(get_database())
+
+    def search_archive(
+        self,
+        user_id: Optional[str] = None,
+        action: Optional[str] = None,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None
+    ) -> Iterator[dict]:
+        """Matching archived entries, newest partition first"""
+        since, until = _utc(since), _utc(until)
+        paths = sorted(self.archive_dir.glob(f"{PREFIX}*{ARCHIVE_SUFFIX}"), reverse=True)
+        for path in paths:
+            name = path.name[:-len(ARCHIVE_SUFFIX)]
+            if not PARTITION_PATTERN.match(name) or not _overlaps(name, since, until):
+                continue
+            with gzip.open(path, "rt", encoding="utf-8") as fh:
+                for line in fh:
+                    entry = json_util.loads(line, json_options=json_util.RELAXED_JSON_OPTIONS.with_options(tz_aware=True, tzinfo=timezone.utc))
+                    if _matches(entry, user_id, action, since, until):
+                        yield entry
+
+    def stats(self) -> dict:
+        return {
+            "hot_months": self.hot_months,
+            "archive_dir": str(self.archive_dir),
+            "archived_partitions": self.archived
+        }
+
+audit_store = AuditStore(
+    archive_dir=settings.AUDIT_ARCHIVE_DIR,
+    hot_months=settings.AUDIT_HOT_MONTHS,
+    lease=settings.AUDIT_ARCHIVE_LEASE
+)
+
+if __name__ == "__main__":
+    # Offline search of archived partitions, no database needed:
+    #   python -m services.audit_store --user-id <id> --since 2024-01-01
+    import argparse
+    import sys
+
+    def parse_date(value: str) -> datetime:
+        parsed = datetime.fromisoformat(value)
+        return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+    parser = argparse.ArgumentParser(description="Search archived audit logs")
+    parser.add_argument("--dir", default=str(settings.AUDIT_ARCHIVE_DIR))
+    parser.add_argument("--user-id")
+    parser.add_argument("--action")
+    parser.add_argument("--since", type=parse_date)
+    parser.add_argument("--until", type=parse_date)
+    args = parser.parse_args()
+
+    store = AuditStore(archive_dir=args.dir, hot_months=settings.AUDIT_HOT_MONTHS, lease=settings.AUDIT_ARCHIVE_LEASE)
+    for entry in store.search_archive(args.user_id, args.action, args.since, args.until):
+        sys.stdout.write(json_util.dumps(entry, json_options=json_util.RELAXED_JSON_OPTIONS) + "\n")
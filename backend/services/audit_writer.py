@@ -0,0 +1,128 @@
+from database import get_database
+from services.audit_store import audit_store
+from config import settings
+from typing import List, Optional
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()
+
+class AuditWriter:
+    """Buffers audit entries and writes them with ``insert_many``
+
+    Request handlers only enqueue. A background task drains the queue and
+    flushes a batch once it holds ``batch_size`` entries or the oldest
+    entry has waited ``flush_interval`` seconds. When the queue is full
+    the ``block`` policy makes the caller wait for room, while ``drop``
+    discards the entry and counts it. ``stop`` flushes whatever is still
+    queued.
+    """
+
+    def __init__(self, max_queue: int, batch_size: int, flush_interval: float, policy: str = "block"):
+        if policy not in ("block", "drop"):
+            raise ValueError(f"Unknown audit queue policy: {policy}")
+        self.max_queue = max_queue
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.policy = policy
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+        self.batches = 0
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    async def enqueue(self, entry: dict):
+        if not self.running:
+            # No writer loop (scripts, startup failures): write directly
+            await self._flush([entry])
+            return
+        if self.policy == "block":
+            await self._queue.put(entry)
+            return
+        try:
+            self._queue.put_nowait(entry)
+        except asyncio.QueueFull:
+            self.dropped += 1
+
+    async def _flush(self, batch: List[dict]):
+        try:
+            await audit_store.write(get_database(), batch)
+            self.written += len(batch)
+            self.batches += 1
+        except Exception as e:
+            self.failed += len(batch)
+            logger.error(f"Failed to write {len(batch)} audit logs: {e}")
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        stopping = False
+        while not stopping:
+            entry = await self._queue.get()
+            if entry is _STOP:
+                break
+            batch = [entry]
+            deadline = loop.time() + self.flush_interval
+            while len(batch) < self.batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    entry = await asyncio.wait_for(self._queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                if entry is _STOP:
+                    stopping = True
+                    break
+                batch.append(entry)
+            await self._flush(batch)
+
+        # Drain anything enqueued before the stop marker
+        batch = []
+        while not self._queue.empty():
+            entry = self._queue.get_nowait()
+            if entry is not _STOP:
+                batch.append(entry)
+            if len(batch) == self.batch_size:
+                await self._flush(batch)
+                batch = []
+        if batch:
+            await self._flush(batch)
+
+    def start(self):
+        if self._task is None:
+            self._queue = asyncio.Queue(maxsize=self.max_queue)
+            self._task = asyncio.create_task(self._run(), name="audit_writer")
+
+    async def stop(self):
+        """Flush queued entries and stop the writer"""
+        if self._task is None:
+            return
+        await self._queue.put(_STOP)
+        await self._task
+        self._task = None
+        logger.info(f"Audit writer stopped: {self.written} written, {self.dropped} dropped, {self.failed} failed")
+
+    def stats(self) -> dict:
+        return {
+            "policy": self.policy,
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+            "max_queue": self.max_queue,
+            "written": self.written,
+            "batches": self.batches,
+            "dropped": self.dropped,
+            "failed": self.failed
+        }
+
+audit_writer = AuditWriter(
+    max_queue=settings.AUDIT_QUEUE_SIZE,
+    batch_size=settings.AUDIT_BATCH_SIZE,
+    flush_interval=settings.AUDIT_FLUSH_INTERVAL,
+    policy=settings.AUDIT_QUEUE_POLICY
+)
@@ -0,0 +1,23 @@
+from datetime import datetime, timezone
+
+# Rows not yet converted by migrations.iso_dates still hold the
+# datetime.isoformat() strings of UTC times that older writers stored.
+# These helpers keep reads working on them until the migration has run.
+
+def as_datetime(value) -> datetime:
+    """Aware UTC datetime for a BSON date or a legacy isoformat string"""
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+        if value.tzinfo is None:
+            value = value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc)
+
+def date_filter(field: str, condition: dict) -> dict:
+    """``{field: condition}`` that also matches legacy isoformat strings
+
+    Range operators never compare across BSON types, so the same bounds are
+    applied to string values as isoformat strings, which sort like the UTC
+    times they encode.
+    """
+    legacy = {op: bound.astimezone(timezone.utc).isoformat() for op, bound in condition.items()}
+    return {"$or": [{field: condition}, {field: legacy}]}
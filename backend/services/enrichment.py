@@ -0,0 +1,46 @@
+from typing import Dict, List
+
+# Output field -> documents field
+DOCUMENT_SUMMARY_FIELDS = {
+    "document_title": "title",
+    "document_revenue": "revenue"
+}
+
+def _get_path(row: dict, path: str):
+    value = row
+    for part in path.split("."):
+        if not isinstance(value, dict):
+            return None
+        value = value.get(part)
+    return value
+
+async def attach_documents(
+    db,
+    rows: List[dict],
+    key: str = "document_id",
+    fields: Dict[str, str] = DOCUMENT_SUMMARY_FIELDS
+) -> List[dict]:
+    """Copy document fields onto rows that reference a document
+
+    ``key`` may be a dotted path (e.g. ``metadata.document_id`` for
+    purchase transactions). All referenced documents are fetched with a
+    single ``$in`` query, so the cost is one round trip per call.
+    """
+    document_ids = {_get_path(row, key) for row in rows}
+    document_ids.discard(None)
+    if not document_ids:
+        return rows
+
+    projection = {"_id": 0, "id": 1}
+    projection.update({source: 1 for source in fields.values()})
+
+    documents = {}
+    async for document in db.documents.find({"id": {"$in": list(document_ids)}}, projection):
+        documents[document["id"]] = document
+
+    for row in rows:
+        document = documents.get(_get_path(row, key))
+        if document:
+            for target, source in fields.items():
+                row[target] = document.get(source)
+    return rows
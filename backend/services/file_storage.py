@@ -0,0 +1,118 @@
+from fastapi import HTTPException, UploadFile, status
+from typing import AsyncIterator, List, Optional, Tuple
+from dataclasses import dataclass
+from bson import ObjectId
+import hashlib
+import os
+
+@dataclass
+class StoredFile:
+    file_id: ObjectId
+    size: int
+    sha256: str
+
+def check_file_type(filename: str, allowed_types: List[str]):
+    """Reject filenames whose extension is not allowed"""
+    extension = os.path.splitext(filename or "")[1].lower()
+    if extension not in allowed_types:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"File type not allowed. Allowed types: {', '.join(allowed_types)}"
+        )
+
+async def stream_upload_to_gridfs(
+    fs,
+    upload: UploadFile,
+    filename: str,
+    metadata: dict,
+    max_size: int,
+    chunk_size: int
+) -> StoredFile:
+    """Copy an upload into GridFS chunk by chunk
+
+    Only one chunk is held in memory at a time. The size limit is enforced
+    while streaming and a partially written file is removed on any error.
+    """
+    grid_in = fs.open_upload_stream(filename, metadata=metadata)
+    hasher = hashlib.sha256()
+    size = 0
+
+    try:
+        while True:
+            chunk = await upload.read(chunk_size)
+            if not chunk:
+                break
+
+            size += len(chunk)
+            if size > max_size:
+                raise HTTPException(
+                    status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                    detail=f"File exceeds maximum size of {max_size // (1024 * 1024)}MB"
+                )
+
+            hasher.update(chunk)
+            await grid_in.write(chunk)
+
+        digest = hasher.hexdigest()
+        await grid_in.set("sha256", digest)
+    except BaseException:
+        await grid_in.abort()
+        raise
+
+    await grid_in.close()
+    return StoredFile(file_id=grid_in._id, size=size, sha256=digest)
+
+def parse_range_header(range_header: Optional[str], length: int) -> Optional[Tuple[int, int]]:
+    """Parse a single ``bytes=`` range into inclusive (start, end) offsets
+
+    Returns None when the whole file should be sent (no header, multiple
+    ranges or a malformed header). Raises 416 if the range can't be served.
+    """
+    if not range_header or not range_header.startswith("bytes="):
+        return None
+
+    spec = range_header[len("bytes="):].strip()
+    if "," in spec:
+        return None
+
+    start_text, _, end_text = spec.partition("-")
+    try:
+        if start_text == "":
+            # Suffix range: the last N bytes
+            start = max(0, length - int(end_text))
+            end = length - 1
+        else:
+            start = int(start_text)
+            end = min(int(end_text), length - 1) if end_text else length - 1
+    except ValueError:
+        return None
+
+    if start < 0 or start > end or start >= length:
+        raise HTTPException(
+            status_code=status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE,
+            detail="Requested range not satisfiable",
+            headers={"Content-Range": f"bytes */{length}"}
+        )
+    return start, end
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Weak comparison of an If-None-Match header against an ETag"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    candidates = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+    return etag.removeprefix("W/") in candidates
+
+async def iter_gridfs_range(grid_out, start: int, end: int, chunk_size: int) -> AsyncIterator[bytes]:
+    """Yield bytes ``start..end`` (inclusive) of a GridFS file chunk by chunk"""
+    if start:
+        grid_out.seek(start)
+
+    remaining = end - start + 1
+    while remaining > 0:
+        chunk = await grid_out.read(min(chunk_size, remaining))
+        if not chunk:
+            break
+        remaining -= len(chunk)
+        yield chunk
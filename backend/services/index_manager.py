@@ -0,0 +1,187 @@
+from pymongo import IndexModel
+from pymongo.errors import OperationFailure
+from indexes import INDEXES
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+import asyncio
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+# Options whose difference makes a live index not the one we declared
+COMPARED_OPTIONS = ("unique", "sparse", "expireAfterSeconds", "partialFilterExpression")
+
+def _declared_key(model: IndexModel) -> list:
+    return [(field, direction) for field, direction in model.document["key"].items()]
+
+def _live_key(info: dict) -> list:
+    return [(field, direction) for field, direction in info["key"]]
+
+def _is_text(model: IndexModel) -> bool:
+    return "text" in model.document["key"].values()
+
+def _differences(model: IndexModel, info: dict) -> List[str]:
+    differences = []
+    # Text indexes are stored under internal _fts/_ftsx keys, so match them by name
+    if not _is_text(model) and _declared_key(model) != _live_key(info):
+        differences.append("key")
+    for option in COMPARED_OPTIONS:
+        if model.document.get(option) != info.get(option):
+            differences.append(option)
+    return differences
+
+class IndexManager:
+    """Keeps the live indexes in line with the ``indexes.INDEXES`` registry
+
+    ``start`` builds missing indexes in a background task, one
+    ``createIndexes`` command per collection with all collections in
+    parallel, so the API can serve requests while they build. A TTL that
+    differs from its declaration is changed in place with ``collMod``; any
+    other difference in keys or options is reported, never dropped.
+    """
+
+    def __init__(self, registry: Dict[str, List[IndexModel]]):
+        self.registry = registry
+        self.state = "idle"
+        self.created: List[str] = []
+        self.errors: Dict[str, str] = {}
+        self.started_at: Optional[datetime] = None
+        self.duration = 0.0
+        self._task: Optional[asyncio.Task] = None
+
+    async def _live(self, db, collection: str) -> dict:
+        try:
+            return await db[collection].index_information()
+        except OperationFailure:
+            # Collection does not exist yet
+            return {}
+
+    async def diff(self, db) -> dict:
+        """Declared indexes that are missing or differ, and undeclared ones"""
+        missing, conflicting, extra = {}, {}, {}
+        for collection, models in self.registry.items():
+            live = await self._live(db, collection)
+            declared = {model.document["name"] for model in models}
+            for model in models:
+                name = model.document["name"]
+                if name not in live:
+                    missing.setdefault(collection, []).append(model)
+                else:
+                    differences = _differences(model, live[name])
+                    if differences:
+                        conflicting.setdefault(collection, []).append({"name": name, "differs_in": differences, "model": model})
+            undeclared = [name for name in live if name != "_id_" and name not in declared]
+            if undeclared:
+                extra[collection] = undeclared
+        return {"missing": missing, "conflicting": conflicting, "extra": extra}
+
+    async def _create(self, db, collection: str, models: List[IndexModel]):
+        try:
+            names = await db[collection].create_indexes(models)
+            self.created.extend(f"{collection}.{name}" for name in names)
+        except Exception as e:
+            self.errors[collection] = str(e)
+            logger.error(f"Failed to build indexes on {collection}: {e}")
+
+    async def _set_ttl(self, db, collection: str, model: IndexModel) -> bool:
+        try:
+            await db.command(
+                "collMod",
+                collection,
+                index={"name": model.document["name"], "expireAfterSeconds": model.document["expireAfterSeconds"]}
+            )
+            self.created.append(f"{collection}.{model.document['name']} (ttl)")
+            return True
+        except OperationFailure as e:
+            # Turning a plain index into a TTL index needs MongoDB 5.1+
+            logger.error(f"Could not set TTL on {collection}.{model.document['name']}: {e}")
+            return False
+
+    async def ensure(self, db):
+        """Build every missing declared index"""
+        self.state = "running"
+        self.started_at = datetime.now(timezone.utc)
+        started = time.perf_counter()
+        try:
+            diff = await self.diff(db)
+            await asyncio.gather(*(
+                self._create(db, collection, models)
+                for collection, models in diff["missing"].items()
+            ))
+            for collection, conflicts in diff["conflicting"].items():
+                for conflict in conflicts:
+                    if conflict["differs_in"] == ["expireAfterSeconds"] and "expireAfterSeconds" in conflict["model"].document:
+                        if await self._set_ttl(db, collection, conflict["model"]):
+                            continue
+                    logger.warning(
+                        f"Index {collection}.{conflict['name']} differs from its declaration in {', '.join(conflict['differs_in'])}"
+                    )
+            self.state = "failed" if self.errors else "done"
+            logger.info(f"Index check finished: {len(self.created)} indexes built")
+        except Exception as e:
+            self.state = "failed"
+            self.errors["*"] = str(e)
+            logger.exception("Index check failed")
+        finally:
+            self.duration = time.perf_counter() - started
+
+    def start(self, db):
+        if self._task is None:
+            self._task = asyncio.create_task(self.ensure(db), name="index_manager")
+
+    async def stop(self):
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        self._task = None
+
+    async def usage(self, db) -> Dict[str, Dict[str, dict]]:
+        """Per-index access counts from $indexStats, since each server start"""
+        usage = {}
+        for collection in self.registry:
+            try:
+                stats = await db[collection].aggregate([{"$indexStats": {}}]).to_list(None)
+            except OperationFailure:
+                continue
+            usage[collection] = {
+                row["name"]: {"ops": row["accesses"]["ops"], "since": row["accesses"]["since"]}
+                for row in stats
+            }
+        return usage
+
+    async def report(self, db) -> dict:
+        diff = await self.diff(db)
+        usage = await self.usage(db)
+        unused = {
+            collection: sorted(name for name, stats in indexes.items() if name != "_id_" and stats["ops"] == 0)
+            for collection, indexes in usage.items()
+        }
+        return {
+            "missing": {
+                collection: [model.document["name"] for model in models]
+                for collection, models in diff["missing"].items()
+            },
+            "conflicting": {
+                collection: [{"name": conflict["name"], "differs_in": conflict["differs_in"]} for conflict in conflicts]
+                for collection, conflicts in diff["conflicting"].items()
+            },
+            "extra": diff["extra"],
+            "unused": {collection: names for collection, names in unused.items() if names},
+            "usage": usage,
+            "build": self.stats()
+        }
+
+    def stats(self) -> dict:
+        return {
+            "state": self.state,
+            "created": len(self.created),
+            "errors": self.errors,
+            "started_at": self.started_at.isoformat() if self.started_at else None,
+            "duration_seconds": round(self.duration, 3)
+        }
+
+index_manager = IndexManager(INDEXES)
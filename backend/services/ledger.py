@@ -0,0 +1,443 @@
+from fastapi import HTTPException, status
+from pymongo import ReturnDocument, UpdateOne
+from pymongo.errors import NotPrimaryError, OperationFailure
+from database import get_database, run_in_transaction
+from services.money import Money, ZERO, to_money
+from config import settings
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+import asyncio
+import logging
+import random
+import time
+import uuid
+
+logger = logging.getLogger(__name__)
+
+WRITE_CONFLICT = 112
+WALLET_PROJECTION = {"_id": 0, "user_id": 1, "balance": 1, "locked_balance": 1, "ledger_seq": 1}
+
+# A wallet's balance is split across two accounts: available + locked = balance
+AVAILABLE = "available"
+LOCKED = "locked"
+# Platform-side accounts that money enters or leaves the wallets through
+EXTERNAL = "external"            # deposits and withdrawals
+REWARDS = "rewards"              # staking and investment returns
+REVENUE_SHARE = "revenue_share"  # investor payouts on document sales
+OPENING = "opening"              # balances that predate the ledger
+
+# Leg amounts are exact two-place Decimals, so journals balance to exactly zero
+def available(user_id: str, amount) -> dict:
+    return {"user_id": user_id, "account": AVAILABLE, "amount": to_money(amount)}
+
+def locked(user_id: str, amount) -> dict:
+    return {"user_id": user_id, "account": LOCKED, "amount": to_money(amount)}
+
+def platform(account: str, amount) -> dict:
+    return {"account": account, "amount": to_money(amount)}
+
+def available_at_least(amount: Money) -> dict:
+    """Filter matching wallets whose ``balance - locked_balance`` covers ``amount``"""
+    return {"$expr": {"$gte": [{"$subtract": ["$balance", "$locked_balance"]}, amount]}}
+
+def wallet_deltas(legs: List[dict]) -> Dict[str, Dict[str, Money]]:
+    """Per-user ``$inc`` for the wallet fields a set of legs moves"""
+    deltas = {}
+    for leg in legs:
+        if "user_id" not in leg:
+            continue
+        delta = deltas.setdefault(leg["user_id"], {"balance": ZERO, "locked_balance": ZERO})
+        delta["balance"] += leg["amount"]
+        if leg["account"] == LOCKED:
+            delta["locked_balance"] += leg["amount"]
+    return deltas
+
+def _merge(legs: List[dict]) -> List[dict]:
+    """One leg per account and user (e.g. a buyer who is also an investor)"""
+    merged = {}
+    for leg in legs:
+        key = (leg.get("user_id"), leg["account"])
+        if key in merged:
+            merged[key] = {**merged[key], "amount": merged[key]["amount"] + leg["amount"]}
+        else:
+            merged[key] = leg
+    return list(merged.values())
+
+def _is_transient(error: Exception) -> bool:
+    # Only errors that prove the write was not applied; a bare network error
+    # is ambiguous and retrying an $inc after it could apply it twice
+    if isinstance(error, NotPrimaryError):
+        return True
+    return isinstance(error, OperationFailure) and (
+        error.code == WRITE_CONFLICT or error.has_error_label("TransientTransactionError")
+    )
+
+def _wallet_not_found() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_404_NOT_FOUND,
+        detail="Wallet not found"
+    )
+
+class Ledger:
+    """Double-entry journal behind every wallet balance change
+
+    ``post`` applies a journal (legs summing to zero) to the wallets it
+    touches and appends one ``ledger_entries`` row per leg. Each touched
+    wallet's ``ledger_seq`` is incremented and tags that user's rows, so a
+    user's journals form a gapless sequence. Wallet documents stay the
+    O(1) read path; ``reconcile`` checks one against its entries from the
+    last verified snapshot on, and ``audit`` does that for every wallet in
+    parallel.
+
+    Debits and locks are guarded: the update's filter only matches while
+    the available balance covers the amount, so concurrent requests cannot
+    overdraw a wallet. Transient driver errors are retried with jittered
+    backoff; inside a transaction (``session`` given) the driver's
+    ``with_transaction`` retries the whole callback instead.
+    """
+
+    def __init__(self, max_retries: int, backoff: float, audit_concurrency: int):
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.audit_concurrency = audit_concurrency
+        self.journals = 0
+        self.rejected = 0
+        self.retries = 0
+        self.last_audit: Optional[dict] = None
+
+    async def _retry(self, operation, session=None):
+        attempt = 0
+        while True:
+            try:
+                return await operation()
+            except Exception as e:
+                if session is not None or attempt >= self.max_retries or not _is_transient(e):
+                    raise
+                attempt += 1
+                self.retries += 1
+                logger.warning(f"Retrying wallet update after transient error ({attempt}/{self.max_retries}): {e}")
+                await asyncio.sleep(self.backoff * 2 ** (attempt - 1) * (0.5 + random.random()))
+
+    async def _update_wallet(self, db, query: dict, update: dict, session=None) -> Optional[dict]:
+        return await self._retry(
+            lambda: db.wallets.find_one_and_update(
+                query,
+                update,
+                projection=WALLET_PROJECTION,
+                return_document=ReturnDocument.AFTER,
+                session=session
+            ),
+            session
+        )
+
+    async def _apply(self, db, deltas: dict, guard: Optional[Tuple[str, Money]], session=None) -> Dict[str, int]:
+        """Increment each wallet and return the new ``ledger_seq`` per user"""
+        deltas = dict(deltas)
+        seqs = {}
+        now = datetime.now(timezone.utc)
+
+        if session is None and len(deltas) > 1:
+            # Nothing rolls back a partly applied journal, so every wallet
+            # must exist before the first one is incremented
+            if await db.wallets.count_documents({"user_id": {"$in": list(deltas)}}) != len(deltas):
+                raise _wallet_not_found()
+
+        if guard is not None:
+            user_id, amount = guard
+            wallet = await self._update_wallet(
+                db,
+                {"user_id": user_id, **available_at_least(amount)},
+                {"$inc": {**deltas.pop(user_id), "ledger_seq": 1}, "$set": {"updated_at": now}},
+                session
+            )
+            if wallet is None:
+                self.rejected += 1
+                if await db.wallets.count_documents({"user_id": user_id}, limit=1, session=session) == 0:
+                    raise _wallet_not_found()
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail="Insufficient available balance"
+                )
+            seqs[user_id] = wallet["ledger_seq"]
+
+        if deltas and (len(deltas) == 1 or session is None):
+            # One find_one_and_update per wallet returns the sequence number
+            # this journal set; without a transaction a separate read could
+            # already see another journal's increment
+            wallets = await asyncio.gather(*(
+                self._update_wallet(
+                    db,
+                    {"user_id": user_id},
+                    {"$inc": {**delta, "ledger_seq": 1}, "$set": {"updated_at": now}},
+                    session
+                )
+                for user_id, delta in deltas.items()
+            ))
+            if any(wallet is None for wallet in wallets):
+                raise _wallet_not_found()
+            for wallet in wallets:
+                seqs[wallet["user_id"]] = wallet["ledger_seq"]
+        elif deltas:
+            # Many wallets in a transaction: one bulk write, then read the
+            # sequence numbers back. The rows stay write-locked until
+            # commit, so the values read are the ones this journal set.
+            result = await self._retry(
+                lambda: db.wallets.bulk_write(
+                    [
+                        UpdateOne({"user_id": user_id}, {"$inc": {**delta, "ledger_seq": 1}, "$set": {"updated_at": now}})
+                        for user_id, delta in deltas.items()
+                    ],
+                    ordered=False,
+                    session=session
+                ),
+                session
+            )
+            if result.matched_count != len(deltas):
+                raise _wallet_not_found()
+            async for wallet in db.wallets.find(
+                {"user_id": {"$in": list(deltas)}},
+                {"_id": 0, "user_id": 1, "ledger_seq": 1},
+                session=session
+            ):
+                seqs[wallet["user_id"]] = wallet["ledger_seq"]
+        return seqs
+
+    async def post(
+        self,
+        db,
+        kind: str,
+        legs: List[dict],
+        ref: Optional[dict] = None,
+        guard: Optional[Tuple[str, Money]] = None,
+        session=None
+    ) -> Dict[str, int]:
+        """Apply a balanced journal and append its entries
+
+        ``guard`` is ``(user_id, amount)``: the journal only applies if that
+        user's available balance covers ``amount``. Returns the new
+        ``ledger_seq`` per touched user.
+        """
+        legs = _merge(legs)
+        total = sum(leg["amount"] for leg in legs)
+        if total != 0:
+            raise ValueError(f"Unbalanced {kind} journal: legs sum to {total}")
+
+        seqs = await self._apply(db, wallet_deltas(legs), guard, session)
+
+        journal_id = str(uuid.uuid4())
+        now = datetime.now(timezone.utc)
+        entries = []
+        for leg in legs:
+            entry = {"journal_id": journal_id, "kind": kind, **leg, "ref": ref or {}, "created_at": now}
+            if "user_id" in leg:
+                entry["seq"] = seqs[leg["user_id"]]
+            entries.append(entry)
+        await db.ledger_entries.insert_many(entries, session=session)
+
+        self.journals += 1
+        return seqs
+
+    async def lock(self, db, user_id: str, amount: Money, kind: str = "lock", ref: Optional[dict] = None, session=None):
+        """Move ``amount`` of the available balance into ``locked_balance``"""
+        amount = to_money(amount)
+        self._check_amount(amount)
+        await self.post(
+            db,
+            kind,
+            [available(user_id, -amount), locked(user_id, amount)],
+            ref,
+            guard=(user_id, amount),
+            session=session
+        )
+
+    async def debit_crypto(self, db, user_id: str, crypto_type: str, amount: float, session=None) -> dict:
+        """Take ``amount`` out of a crypto wallet's balance
+
+        Crypto wallets hold coin amounts rather than platform currency, so
+        they are guarded but not journaled.
+        """
+        self._check_amount(amount)
+        wallet = await self._retry(
+            lambda: db.crypto_wallets.find_one_and_update(
+                {"user_id": user_id, "crypto_type": crypto_type, "balance": {"$gte": amount}},
+                {"$inc": {"balance": -amount}},
+                projection={"_id": 0},
+                return_document=ReturnDocument.AFTER,
+                session=session
+            ),
+            session
+        )
+        if wallet is not None:
+            return wallet
+
+        self.rejected += 1
+        if await db.crypto_wallets.count_documents({"user_id": user_id, "crypto_type": crypto_type}, limit=1, session=session) == 0:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Crypto wallet not found"
+            )
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Insufficient crypto balance"
+        )
+
+    @staticmethod
+    def _check_amount(amount: float):
+        # A negative amount would turn a debit into a credit, and a zero
+        # one would journal (or create a position for) nothing
+        if amount <= 0:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Amount must be positive"
+            )
+
+    async def _base(self, db, user_id: str, seq: int, session=None) -> dict:
+        """Last verified snapshot up to ``seq``, or the opening balance at seq 0"""
+        snapshot = await db.ledger_snapshots.find_one(
+            {"user_id": user_id, "seq": {"$lte": seq}},
+            {"_id": 0},
+            sort=[("seq", -1)],
+            session=session
+        )
+        if snapshot:
+            return snapshot
+        base = {"seq": 0, "balance": ZERO, "locked_balance": ZERO}
+        async for entry in db.ledger_entries.find(
+            {"user_id": user_id, "seq": 0},
+            {"_id": 0, "account": 1, "amount": 1},
+            session=session
+        ):
+            base["balance"] += to_money(entry["amount"])
+            if entry["account"] == LOCKED:
+                base["locked_balance"] += to_money(entry["amount"])
+        return base
+
+    async def _replay(self, db, user_id: str) -> Tuple[dict, dict, dict]:
+        """Wallet, base snapshot and entry totals read as of one point in time
+
+        The reads share a transaction where the server supports them. The
+        wallet is read first and bounds the rest, so journals applied
+        meanwhile are left for the next check.
+        """
+
+        async def read(session):
+            wallet = await db.wallets.find_one({"user_id": user_id}, WALLET_PROJECTION, session=session)
+            if wallet is None:
+                raise _wallet_not_found()
+            seq = wallet.get("ledger_seq", 0)
+            base = await self._base(db, user_id, seq, session)
+            rows = await db.ledger_entries.aggregate([
+                {"$match": {"user_id": user_id, "seq": {"$gt": base["seq"], "$lte": seq}}},
+                {"$group": {
+                    "_id": "$seq",
+                    "balance": {"$sum": "$amount"},
+                    "locked_balance": {"$sum": {"$cond": [{"$eq": ["$account", LOCKED]}, "$amount", 0]}}
+                }},
+                {"$group": {
+                    "_id": None,
+                    "balance": {"$sum": "$balance"},
+                    "locked_balance": {"$sum": "$locked_balance"},
+                    "journals": {"$sum": 1}
+                }}
+            ], session=session).to_list(1)
+            replayed = rows[0] if rows else {"balance": ZERO, "locked_balance": ZERO, "journals": 0}
+            return wallet, base, replayed
+
+        return await run_in_transaction(read)
+
+    async def reconcile(self, db, user_id: str, snapshot: bool = True) -> dict:
+        """Check a wallet against its entries since the last snapshot
+
+        On success a snapshot is stored at the wallet's current sequence
+        number, so the next check replays only what follows.
+        """
+        wallet, base, replayed = await self._replay(db, user_id)
+        seq = wallet.get("ledger_seq", 0)
+        if (seq - base["seq"]) != replayed["journals"]:
+            # Outside a transaction a journal increments the wallet just
+            # before inserting its entries; look again before calling them
+            # missing
+            await asyncio.sleep(self.backoff)
+            wallet, base, replayed = await self._replay(db, user_id)
+            seq = wallet.get("ledger_seq", 0)
+
+        expected = {
+            "balance": to_money(base["balance"]) + to_money(replayed["balance"]),
+            "locked_balance": to_money(base["locked_balance"]) + to_money(replayed["locked_balance"])
+        }
+        actual = {"balance": to_money(wallet["balance"]), "locked_balance": to_money(wallet["locked_balance"])}
+        missing = (seq - base["seq"]) - replayed["journals"]
+        ok = missing == 0 and all(expected[field] == actual[field] for field in expected)
+
+        if ok and snapshot and seq > base["seq"]:
+            # Audits on several workers may verify the same sequence number
+            await db.ledger_snapshots.update_one(
+                {"user_id": user_id, "seq": seq},
+                {"$setOnInsert": {**actual, "taken_at": datetime.now(timezone.utc)}},
+                upsert=True
+            )
+
+        return {
+            "user_id": user_id,
+            "ok": ok,
+            "seq": seq,
+            "replayed_from": base["seq"],
+            "missing_journals": missing,
+            "expected": expected,
+            "actual": actual
+        }
+
+    async def audit(self, db) -> dict:
+        """Reconcile every wallet, ``audit_concurrency`` at a time"""
+        started = time.perf_counter()
+        mismatched = []
+        checked = 0
+
+        async def check(user_id: str):
+            nonlocal checked
+            result = await self.reconcile(db, user_id)
+            checked += 1
+            if not result["ok"]:
+                mismatched.append(result)
+
+        pending = set()
+        async for wallet in db.wallets.find({}, {"_id": 0, "user_id": 1}):
+            if len(pending) >= self.audit_concurrency:
+                _, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            pending.add(asyncio.create_task(check(wallet["user_id"])))
+        if pending:
+            await asyncio.gather(*pending)
+
+        self.last_audit = {
+            "checked": checked,
+            "mismatched": mismatched,
+            "finished_at": datetime.now(timezone.utc),
+            "duration_seconds": round(time.perf_counter() - started, 3)
+        }
+        if mismatched:
+            logger.error(f"Ledger audit: {len(mismatched)} of {checked} wallets do not match their entries")
+        else:
+            logger.info(f"Ledger audit: all {checked} wallets match their entries")
+        return self.last_audit
+
+    async def run(self):
+        await self.audit(get_database())
+
+    def stats(self) -> dict:
+        return {
+            "journals": self.journals,
+            "rejected": self.rejected,
+            "retries": self.retries,
+            "last_audit": {
+                "checked": self.last_audit["checked"],
+                "mismatched": len(self.last_audit["mismatched"]),
+                "finished_at": self.last_audit["finished_at"].isoformat(),
+                "duration_seconds": self.last_audit["duration_seconds"]
+            } if self.last_audit else None
+        }
+
+ledger = Ledger(
+    max_retries=settings.LEDGER_MAX_RETRIES,
+    backoff=settings.LEDGER_RETRY_BACKOFF,
+    audit_concurrency=settings.LEDGER_AUDIT_CONCURRENCY
+)
@@ -0,0 +1,203 @@
+from pymongo import UpdateOne
+from models import TransactionType, TransactionStatus
+from database import get_database, run_in_transaction
+from services.transactions import record_transactions
+from services.ledger import ledger, available, locked, platform, REWARDS
+from services.money import minor_array, rate_array, percent_of_minor, from_minor
+from services.dates import as_datetime, date_filter
+from config import settings
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional
+import logging
+import uuid
+
+logger = logging.getLogger(__name__)
+
+class MaturityEngine:
+    """Settles matured investment positions in the background
+
+    Each batch is claimed by flipping ``active`` positions to ``settling``
+    under a fresh ``settlement_id`` and ``claimed_at``, so concurrent
+    workers never pick the same position. The claimed batch is then paid
+    out in one transaction. Positions still ``settling`` once their claim
+    is older than ``lease`` seconds were left by a crash; they are
+    re-claimed under a new ``settlement_id`` the same conditional way and
+    resumed. The maturity journal lists the ids of the positions it paid
+    in ``ref.position_ids``; positions found there are only given their
+    missing reward row and marked completed, so a replayed batch never
+    pays twice even without transactions.
+    """
+
+    def __init__(self, batch_size: int, lease: int):
+        self.batch_size = batch_size
+        self.lease = timedelta(seconds=lease)
+        self.settled = 0
+        self.resumed = 0
+        self.batches = 0
+        self.lag_seconds = 0.0
+        self.last_settled_at: Optional[datetime] = None
+
+    async def _measure_lag(self, db, now: datetime):
+        # Age of the oldest position that should already be settled
+        oldest = await db.investment_positions.find_one(
+            {"status": {"$in": ["active", "settling"]}, **date_filter("expires_at", {"$lte": now})},
+            {"_id": 0, "expires_at": 1},
+            sort=[("expires_at", 1)]
+        )
+        if oldest is None:
+            self.lag_seconds = 0.0
+        else:
+            self.lag_seconds = max(0.0, (now - as_datetime(oldest["expires_at"])).total_seconds())
+
+    async def _claim(self, db, now: datetime) -> Optional[str]:
+        due = await db.investment_positions.find(
+            {"status": "active", **date_filter("expires_at", {"$lte": now})},
+            {"_id": 0, "id": 1}
+        ).sort("expires_at", 1).limit(self.batch_size).to_list(self.batch_size)
+        if not due:
+            return None
+
+        settlement_id = str(uuid.uuid4())
+        result = await db.investment_positions.update_many(
+            {"id": {"$in": [pos["id"] for pos in due]}, "status": "active"},
+            {"$set": {"status": "settling", "settlement_id": settlement_id, "claimed_at": now}}
+        )
+        return settlement_id if result.modified_count else None
+
+    def _stale(self, now: datetime) -> dict:
+        # Claims from before claimed_at was recorded count as stale
+        return {
+            "status": "settling",
+            "$or": [{"claimed_at": {"$lte": now - self.lease}}, {"claimed_at": {"$exists": False}}]
+        }
+
+    async def _reclaim(self, db, stale_id: str, now: datetime) -> Optional[str]:
+        """Take over a batch whose claim has outlived the lease"""
+        settlement_id = str(uuid.uuid4())
+        result = await db.investment_positions.update_many(
+            {"settlement_id": stale_id, **self._stale(now)},
+            {"$set": {"settlement_id": settlement_id, "claimed_at": now}}
+        )
+        return settlement_id if result.modified_count else None
+
+    async def _settle(self, db, settlement_id: str) -> int:
+        """Pay out every position claimed under ``settlement_id``"""
+
+        async def apply(session):
+            positions = await db.investment_positions.find(
+                {"settlement_id": settlement_id, "status": "settling"},
+                {"_id": 0},
+                session=session
+            ).to_list(None)
+            if not positions:
+                return 0
+
+            # Skip payouts already journaled by an earlier attempt; the
+            # journal is the record of the money moving, so it is the only
+            # safe marker when a crash can land between it and the rows below
+            ids = [pos["id"] for pos in positions]
+            journaled = set(await db.ledger_entries.distinct(
+                "ref.position_ids",
+                {"kind": "investment_maturity", "ref.position_ids": {"$in": ids}},
+                session=session
+            ))
+            # Batches settled before journals listed their positions
+            rewarded = {
+                tx["metadata"]["position_id"]
+                for tx in await db.transactions.find(
+                    {"type": TransactionType.REWARD, "metadata.position_id": {"$in": ids}},
+                    {"_id": 0, "metadata.position_id": 1},
+                    session=session
+                ).to_list(None)
+            }
+
+            now = datetime.now(timezone.utc)
+            principal, payout = {}, {}
+            position_updates: List[UpdateOne] = []
+            rewards = []
+            unpaid = []
+            # Returns for the whole batch in exact int64 minor units
+            amounts = minor_array(pos["amount"] for pos in positions)
+            returns_minor = percent_of_minor(amounts, rate_array(pos["expected_return"] for pos in positions))
+            for pos, amount, returns in zip(positions, amounts, returns_minor):
+                amount, returns = from_minor(amount), from_minor(returns)
+                position_updates.append(UpdateOne(
+                    {"id": pos["id"], "settlement_id": settlement_id, "status": "settling"},
+                    {"$set": {"status": "completed", "returns_earned": returns}}
+                ))
+                if pos["id"] not in rewarded:
+                    rewards.append({
+                        "user_id": pos["user_id"],
+                        "type": TransactionType.REWARD,
+                        "amount": returns,
+                        "status": TransactionStatus.COMPLETED,
+                        "description": f"Investment returns from {pos['package']} package",
+                        "metadata": {"position_id": pos["id"], "settlement_id": settlement_id},
+                        "created_at": now
+                    })
+                if pos["id"] in journaled or pos["id"] in rewarded:
+                    continue
+
+                # Unlock the principal and add the returns
+                principal[pos["user_id"]] = principal.get(pos["user_id"], 0) + amount
+                payout[pos["user_id"]] = payout.get(pos["user_id"], 0) + amount + returns
+                unpaid.append(pos["id"])
+
+            if unpaid:
+                legs = [locked(user_id, -amount) for user_id, amount in principal.items()]
+                legs += [available(user_id, amount) for user_id, amount in payout.items()]
+                legs.append(platform(REWARDS, sum(principal.values()) - sum(payout.values())))
+                await ledger.post(
+                    db,
+                    "investment_maturity",
+                    legs,
+                    {"settlement_id": settlement_id, "position_ids": unpaid},
+                    session=session
+                )
+            await record_transactions(db, rewards, session=session)
+            await db.investment_positions.bulk_write(position_updates, ordered=False, session=session)
+            return len(positions)
+
+        return await run_in_transaction(apply)
+
+    async def run(self):
+        """Settle every due position, oldest first"""
+        db = get_database()
+        now = datetime.now(timezone.utc)
+        await self._measure_lag(db, now)
+
+        # Finish batches interrupted by a crash or restart; younger claims
+        # may still be settling on another worker
+        settled = 0
+        for stale_id in await db.investment_positions.distinct("settlement_id", self._stale(now)):
+            settlement_id = await self._reclaim(db, stale_id, now)
+            if settlement_id is None:
+                continue
+            resumed = await self._settle(db, settlement_id)
+            self.resumed += resumed
+            settled += resumed
+            self.batches += 1
+
+        while True:
+            settlement_id = await self._claim(db, now)
+            if settlement_id is None:
+                break
+            settled += await self._settle(db, settlement_id)
+            self.batches += 1
+
+        if settled:
+            self.settled += settled
+            self.last_settled_at = datetime.now(timezone.utc)
+            logger.info(f"Investment maturity: settled {settled} positions")
+        await self._measure_lag(db, datetime.now(timezone.utc))
+
+    def stats(self) -> dict:
+        return {
+            "settled": self.settled,
+            "resumed": self.resumed,
+            "batches": self.batches,
+            "lag_seconds": round(self.lag_seconds, 1),
+            "last_settled_at": self.last_settled_at.isoformat() if self.last_settled_at else None
+        }
+
+maturity_engine = MaturityEngine(batch_size=settings.MATURITY_BATCH_SIZE, lease=settings.MATURITY_CLAIM_LEASE)
@@ -0,0 +1,107 @@
+from bson.codec_options import TypeCodec, TypeRegistry
+from bson.decimal128 import Decimal128
+from pydantic import AfterValidator, PlainSerializer
+from decimal import Decimal, InvalidOperation, ROUND_HALF_EVEN
+from typing import Annotated, Iterable, Union
+import numpy as np
+
+# Amounts are exact decimals with two places, stored as BSON Decimal128.
+# Batch jobs work in integer minor units (cents) held in int64 arrays.
+PLACES = 2
+QUANTUM = Decimal(1).scaleb(-PLACES)
+ZERO = Decimal(0).quantize(QUANTUM)
+# Rates (percentages) are scaled to integers with this many steps per 1%
+RATE_SCALE = 10 ** 4
+# Largest amount a Money field accepts. Its minor units are exact in float64
+# and, times a 100% rate, still fit an int64 (10**12 * 10**6 < 2**63).
+MAX_AMOUNT = Decimal(10) ** 10
+
+Number = Union[Decimal, Decimal128, float, int, str]
+
+def to_money(value: Number) -> Decimal:
+    """Exact two-place Decimal for a stored, computed or legacy float amount"""
+    if isinstance(value, Decimal128):
+        value = value.to_decimal()
+    elif isinstance(value, float):
+        # repr gives the shortest string that round-trips: 0.1, not 0.1000000000000000055...
+        value = Decimal(repr(value))
+    elif not isinstance(value, Decimal):
+        value = Decimal(value)
+    return value.quantize(QUANTUM, rounding=ROUND_HALF_EVEN)
+
+def to_minor(value: Number) -> int:
+    return int(to_money(value).scaleb(PLACES))
+
+def from_minor(minor) -> Decimal:
+    return Decimal(int(minor)).scaleb(-PLACES)
+
+def rate_units(percent: Number) -> int:
+    if isinstance(percent, float):
+        percent = Decimal(repr(percent))
+    return int((Decimal(percent) * RATE_SCALE).to_integral_value(ROUND_HALF_EVEN))
+
+# Batch conversions go through float64, which represents every scaled
+# amount exactly up to 2**53 (about 9e13 at two places). Two-place amounts
+# and four-place rates therefore land on their exact integer, at NumPy speed.
+def minor_array(values: Iterable[Number]) -> np.ndarray:
+    return np.rint(np.fromiter(values, dtype=np.float64) * 10 ** PLACES).astype(np.int64)
+
+def rate_array(percentages: Iterable[Number]) -> np.ndarray:
+    return np.rint(np.fromiter(percentages, dtype=np.float64) * RATE_SCALE).astype(np.int64)
+
+def _round_half_even(quotient, remainder, denominator: int):
+    twice = 2 * remainder
+    return quotient + ((twice > denominator) | ((twice == denominator) & (quotient % 2 == 1)))
+
+def div_round_half_even(numerator, denominator: int):
+    """Integer division rounded half to even, for ints or int64 arrays"""
+    quotient, remainder = divmod(numerator, denominator)
+    return _round_half_even(quotient, remainder, denominator)
+
+def percent_of_minor(minor: np.ndarray, rates: np.ndarray, periods=1, per: int = 1) -> np.ndarray:
+    """``minor * rate% * periods / per`` per element, in minor units, rounded once
+
+    ``minor * rate`` fits an int64 up to ``MAX_AMOUNT``; ``periods`` (e.g.
+    days) is applied to its quotient and remainder separately, so a
+    multi-year period cannot overflow the product.
+    """
+    denominator = 100 * RATE_SCALE * per
+    quotient, remainder = divmod(minor * rates, denominator)
+    carry, remainder = divmod(remainder * periods, denominator)
+    return _round_half_even(quotient * periods + carry, remainder, denominator)
+
+def percent_of(amount: Number, percent: Number, periods: int = 1, per: int = 1) -> Decimal:
+    """``amount * percent% * periods / per``, rounded once to the money scale
+
+    Computed on Python ints, so it cannot overflow.
+    """
+    numerator = to_minor(amount) * rate_units(percent) * periods
+    return from_minor(div_round_half_even(numerator, 100 * RATE_SCALE * per))
+
+def _validate_money(value: Decimal) -> Decimal:
+    # Pydantic only reports ValueError as a validation error; quantize
+    # raises InvalidOperation for values with more than 26 integer digits
+    try:
+        value = to_money(value)
+    except InvalidOperation:
+        value = None
+    if value is None or abs(value) > MAX_AMOUNT:
+        raise ValueError(f"Amount must be between -{MAX_AMOUNT} and {MAX_AMOUNT}")
+    return value
+
+# Pydantic field type: validated to two places, serialized to JSON as a number
+Money = Annotated[Decimal, AfterValidator(_validate_money), PlainSerializer(float, return_type=float, when_used="json")]
+
+class DecimalCodec(TypeCodec):
+    """Stores Decimal as Decimal128 and reads Decimal128 back as Decimal"""
+
+    python_type = Decimal
+    bson_type = Decimal128
+
+    def transform_python(self, value: Decimal) -> Decimal128:
+        return Decimal128(value)
+
+    def transform_bson(self, value: Decimal128) -> Decimal:
+        return value.to_decimal()
+
+type_registry = TypeRegistry([DecimalCodec()])
@@ -0,0 +1,116 @@
+from fastapi import HTTPException, status
+from typing import List, Optional, Tuple
+from bson import json_util, ObjectId
+from bson.decimal128 import Decimal128
+from bson.errors import BSONError
+from services.cache import TTLCache
+from config import settings
+from datetime import datetime
+import base64
+
+_count_cache = TTLCache(maxsize=1000, ttl=settings.PAGINATION_COUNT_CACHE_TTL)
+
+# Types a keyset cursor's sort key and _id may decode to; anything else
+# (documents, regexes, code, ...) would change what the query matches
+SORT_KEY_TYPES = (datetime, str, ObjectId, int, float, Decimal128)
+
+def encode_cursor(value) -> str:
+    """Opaque, URL-safe cursor for any BSON-serialisable value"""
+    raw = json_util.dumps(value).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_cursor(cursor: str):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        return json_util.loads(raw)
+    # Malformed extended JSON ({"$oid": "zz"}, {"$numberDecimal": "abc"},
+    # ...) fails in the BSON type's own constructor with any of these
+    except (BSONError, ArithmeticError, LookupError, TypeError, ValueError, RecursionError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid cursor"
+        )
+
+def decode_offset_cursor(cursor: Optional[str]) -> int:
+    """Offset for listings without a stable sort key (e.g. relevance order)"""
+    if not cursor:
+        return 0
+    value = decode_cursor(cursor)
+    if not isinstance(value, dict) or not isinstance(value.get("offset"), int) or value["offset"] < 0:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid cursor"
+        )
+    return value["offset"]
+
+def _is_sort_key(value) -> bool:
+    return isinstance(value, SORT_KEY_TYPES) and not isinstance(value, bool)
+
+async def keyset_page(
+    collection,
+    query: dict,
+    sort_field: str,
+    cursor: Optional[str],
+    limit: int,
+    projection: Optional[dict] = None
+) -> Tuple[List[dict], Optional[str]]:
+    """Fetch one page ordered by ``(sort_field, _id)`` descending
+
+    The cursor holds the last row's sort key, so every page is a single
+    index range scan no matter how deep it is. Needs an index on
+    ``(<equality fields>, sort_field, _id)`` to avoid an in-memory sort.
+    Date sort keys still reach rows that hold legacy string dates.
+    """
+    if cursor:
+        last = decode_cursor(cursor)
+        # Rows without the sort field page on null
+        if (
+            not isinstance(last, list)
+            or len(last) != 2
+            or not (last[0] is None or _is_sort_key(last[0]))
+            or not _is_sort_key(last[1])
+        ):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Invalid cursor"
+            )
+        last_value, last_id = last
+        after = [
+            {sort_field: {"$lt": last_value}},
+            {sort_field: last_value, "_id": {"$lt": last_id}}
+        ]
+        if isinstance(last_value, datetime):
+            # Range operators stay within one BSON type, but the sort
+            # places legacy isoformat strings (services.dates) after every
+            # date; carry on into them once the dates run out
+            after.append({sort_field: {"$type": "string"}})
+        query = {"$and": [query, {"$or": after}]}
+
+    # The tiebreaker needs _id even when the caller hides it
+    projection = dict(projection or {})
+    projection.pop("_id", None)
+
+    rows = await collection.find(query, projection or None).sort(
+        [(sort_field, -1), ("_id", -1)]
+    ).limit(limit + 1).to_list(limit + 1)
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor([rows[-1].get(sort_field), rows[-1]["_id"]])
+
+    for row in rows:
+        del row["_id"]
+    return rows, next_cursor
+
+async def count_total(collection, query: dict) -> int:
+    """Total for a listing: estimated when unfiltered, cached otherwise"""
+    if not query:
+        return await collection.estimated_document_count()
+
+    key = f"{collection.name}:{json_util.dumps(query, sort_keys=True)}"
+    total = _count_cache.get(key)
+    if total is None:
+        total = await collection.count_documents(query)
+        _count_cache.set(key, total)
+    return total
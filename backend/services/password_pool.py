@@ -0,0 +1,102 @@
+from concurrent.futures import ThreadPoolExecutor
+from fastapi import HTTPException, status
+from config import settings
+import asyncio
+import threading
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+class PasswordHashPool:
+    """Bounded thread pool for CPU-heavy password hashing
+
+    bcrypt releases the GIL while hashing, so a small dedicated pool keeps
+    the event loop free. Once ``max_workers + max_queue`` jobs are pending
+    new jobs are rejected with 503 instead of piling up behind the pool.
+    """
+
+    def __init__(self, max_workers: int, max_queue: int):
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self._executor = None
+        self._lock = threading.Lock()
+        self._pending = 0  # submitted and not yet finished
+        self._running = 0  # currently executing on a worker
+        self.completed = 0
+        self.rejected = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.max_workers,
+                thread_name_prefix="password-hash"
+            )
+        return self._executor
+
+    def _run_job(self, func, args, enqueued_at: float):
+        started_at = time.perf_counter()
+        with self._lock:
+            self._running += 1
+        try:
+            return func(*args)
+        finally:
+            wait = started_at - enqueued_at
+            with self._lock:
+                self._running -= 1
+                self.completed += 1
+                self.total_wait += wait
+                self.max_wait = max(self.max_wait, wait)
+
+    async def run(self, func, *args):
+        """Run ``func(*args)`` on the pool, rejecting with 503 when saturated"""
+        with self._lock:
+            if self._pending >= self.max_workers + self.max_queue:
+                self.rejected += 1
+                saturated = True
+            else:
+                self._pending += 1
+                saturated = False
+
+        if saturated:
+            logger.warning("Password hash pool saturated, rejecting request")
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Server is busy. Please try again shortly.",
+                headers={"Retry-After": "1"}
+            )
+
+        loop = asyncio.get_running_loop()
+        try:
+            return await loop.run_in_executor(
+                self._get_executor(), self._run_job, func, args, time.perf_counter()
+            )
+        finally:
+            with self._lock:
+                self._pending -= 1
+
+    def stats(self) -> dict:
+        """Queue depth and wait-time metrics"""
+        with self._lock:
+            return {
+                "workers": self.max_workers,
+                "max_queue": self.max_queue,
+                "running": self._running,
+                "queue_depth": self._pending - self._running,
+                "completed": self.completed,
+                "rejected": self.rejected,
+                "avg_wait_ms": (self.total_wait / self.completed * 1000) if self.completed else 0.0,
+                "max_wait_ms": self.max_wait * 1000
+            }
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+password_pool = PasswordHashPool(
+    max_workers=settings.PASSWORD_HASH_WORKERS,
+    max_queue=settings.PASSWORD_HASH_MAX_QUEUE
+)
@@ -0,0 +1,141 @@
+from models import KYCStatus, DocumentStatus, TransactionStatus
+from database import get_database, after_commit
+from services.money import Money, to_money
+from typing import Iterable
+import logging
+
+logger = logging.getLogger(__name__)
+
+METRICS_ID = "platform"
+
+def _value(item) -> str:
+    return getattr(item, "value", item)
+
+def transaction_deltas(transactions: Iterable[dict]) -> dict:
+    """Counter changes for newly inserted transaction rows"""
+    deltas = {}
+    for tx in transactions:
+        for key, amount in (
+            ("transactions.total", 1),
+            (f"transactions.by_status.{_value(tx['status'])}", 1),
+            (f"transactions.by_type.{_value(tx['type'])}", 1),
+        ):
+            deltas[key] = deltas.get(key, 0) + amount
+        if tx["status"] == TransactionStatus.COMPLETED:
+            deltas["transactions.volume"] = deltas.get("transactions.volume", 0) + to_money(tx["amount"])
+    return deltas
+
+def transaction_status_deltas(amount: Money, old_status, new_status) -> dict:
+    """Counter changes for a transaction moving between statuses"""
+    if old_status == new_status:
+        return {}
+    deltas = {
+        f"transactions.by_status.{_value(old_status)}": -1,
+        f"transactions.by_status.{_value(new_status)}": 1
+    }
+    if new_status == TransactionStatus.COMPLETED:
+        deltas["transactions.volume"] = to_money(amount)
+    elif old_status == TransactionStatus.COMPLETED:
+        deltas["transactions.volume"] = -to_money(amount)
+    return deltas
+
+def document_status_deltas(old_status, new_status) -> dict:
+    if old_status == new_status:
+        return {}
+    return {
+        f"documents.by_status.{_value(old_status)}": -1,
+        f"documents.by_status.{_value(new_status)}": 1
+    }
+
+class PlatformMetrics:
+    """Pre-aggregated platform counters kept in a single document
+
+    Routes apply ``$inc`` deltas as they mutate users, documents,
+    transactions and request queues; deltas from a transaction are applied
+    once it commits. ``reconcile`` periodically rebuilds
+    the document from the source collections to correct any drift.
+    """
+
+    collection_name = "platform_metrics"
+
+    def _collection(self, db):
+        return db[self.collection_name]
+
+    async def increment(self, db, deltas: dict, session=None):
+        """Apply counter deltas, after commit when ``session`` is given
+
+        Every write path shares the one counter document; updating it
+        inside their transactions would serialise them on it.
+        """
+        if not deltas:
+            return
+        if session is not None:
+            after_commit(session, lambda: self.increment(db, deltas))
+            return
+        try:
+            await self._collection(db).update_one(
+                {"_id": METRICS_ID},
+                {"$inc": deltas},
+                upsert=True
+            )
+        except Exception as e:
+            # Counters are best effort; reconcile fixes any drift
+            logger.error(f"Failed to update platform metrics: {e}")
+
+    async def read(self, db) -> dict:
+        metrics = await self._collection(db).find_one({"_id": METRICS_ID})
+        if metrics is None:
+            metrics = await self.reconcile()
+        return metrics
+
+    async def reconcile(self) -> dict:
+        """Recompute every counter from the source collections"""
+        db = get_database()
+
+        documents_by_status = await db.documents.aggregate([
+            {"$group": {"_id": "$status", "count": {"$sum": 1}}}
+        ]).to_list(None)
+
+        transaction_facets = await db.transactions.aggregate([
+            {
+                "$facet": {
+                    "by_status": [{"$group": {"_id": "$status", "count": {"$sum": 1}}}],
+                    "by_type": [{"$group": {"_id": "$type", "count": {"$sum": 1}}}],
+                    "volume": [
+                        {"$match": {"status": TransactionStatus.COMPLETED}},
+                        {"$group": {"_id": None, "total": {"$sum": "$amount"}}}
+                    ]
+                }
+            }
+        ]).to_list(1)
+        facets = transaction_facets[0]
+        by_status = {row["_id"]: row["count"] for row in facets["by_status"]}
+
+        metrics = {
+            "_id": METRICS_ID,
+            "users": {
+                "total": await db.users.count_documents({}),
+                "verified": await db.users.count_documents({"kyc_status": KYCStatus.VERIFIED})
+            },
+            "documents": {
+                "total": sum(row["count"] for row in documents_by_status),
+                "by_status": {row["_id"]: row["count"] for row in documents_by_status}
+            },
+            "transactions": {
+                "total": sum(by_status.values()),
+                "by_status": by_status,
+                "by_type": {row["_id"]: row["count"] for row in facets["by_type"]},
+                "volume": facets["volume"][0]["total"] if facets["volume"] else 0
+            },
+            "pending": {
+                "deposits": await db.deposit_requests.count_documents({"status": TransactionStatus.PENDING}),
+                "withdrawals": await db.withdrawal_requests.count_documents({"status": TransactionStatus.PENDING}),
+                "kyc": await db.kyc_submissions.count_documents({"status": KYCStatus.PENDING})
+            }
+        }
+
+        await self._collection(db).replace_one({"_id": METRICS_ID}, metrics, upsert=True)
+        logger.info("Platform metrics reconciled")
+        return metrics
+
+platform_metrics = PlatformMetrics()
@@ -0,0 +1,209 @@
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+from typing import Dict, Iterable, List
+from services.money import minor_array, rate_array, percent_of_minor, from_minor
+import numpy as np
+
+SECONDS_PER_DAY = 86400
+
+def _to_naive_utc(value):
+    # numpy datetime64 has no timezone; stored values are all UTC
+    if isinstance(value, str):
+        return value[:19]
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+class PositionFrame:
+    """Columnar view of position documents
+
+    Money fields become int64 arrays of minor units and rate fields int64
+    arrays of ``RATE_SCALE`` steps per 1%, as in services.money; date
+    fields become datetime64[s] arrays and label fields integer codes into
+    ``categories[field]``. Analytics run as exact integer array expressions
+    instead of per-row Python loops, and round like the settlement jobs.
+    """
+
+    def __init__(
+        self,
+        rows: List[dict],
+        money: Iterable[str] = (),
+        rates: Iterable[str] = (),
+        dates: Iterable[str] = (),
+        labels: Iterable[str] = ()
+    ):
+        self.size = len(rows)
+        self.columns: Dict[str, np.ndarray] = {}
+        self.categories: Dict[str, List[str]] = {}
+        for field in money:
+            self.columns[field] = minor_array(row.get(field) or 0 for row in rows)
+        for field in rates:
+            self.columns[field] = rate_array(row.get(field) or 0 for row in rows)
+        for field in dates:
+            self.columns[field] = np.array([_to_naive_utc(row[field]) for row in rows], dtype="datetime64[s]")
+        for field in labels:
+            codes = {}
+            self.columns[field] = np.fromiter(
+                (codes.setdefault(str(row.get(field)), len(codes)) for row in rows),
+                dtype=np.intp,
+                count=self.size
+            )
+            self.categories[field] = list(codes)
+
+    def __len__(self) -> int:
+        return self.size
+
+    def __getitem__(self, field: str) -> np.ndarray:
+        return self.columns[field]
+
+    def is_label(self, field: str, value: str) -> np.ndarray:
+        """Boolean mask of rows whose label ``field`` equals ``value``"""
+        try:
+            return self.columns[field] == self.categories[field].index(value)
+        except ValueError:
+            return np.zeros(self.size, dtype=bool)
+
+    def group_sum(self, field: str, values: Dict[str, np.ndarray]) -> Dict[str, dict]:
+        """Per-label count and sums of each minor-unit column"""
+        codes = self.columns[field]
+        size = len(self.categories[field])
+        counts = np.bincount(codes, minlength=size)
+        sums = {}
+        for name, column in values.items():
+            # bincount weights would go through float64
+            sums[name] = np.zeros(size, dtype=np.int64)
+            np.add.at(sums[name], codes, column)
+        return {
+            label: {"count": int(counts[i]), **{name: from_minor(total[i]) for name, total in sums.items()}}
+            for i, label in enumerate(self.categories[field])
+        }
+
+    @classmethod
+    async def load(
+        cls,
+        collection,
+        query: dict,
+        money: Iterable[str] = (),
+        rates: Iterable[str] = (),
+        dates: Iterable[str] = (),
+        labels: Iterable[str] = ()
+    ):
+        """Fetch only the needed fields and build the columns"""
+        money, rates, dates, labels = tuple(money), tuple(rates), tuple(dates), tuple(labels)
+        projection = {"_id": 0, **{field: 1 for field in money + rates + dates + labels}}
+        rows = await collection.find(query, projection).to_list(None)
+        return cls(rows, money, rates, dates, labels)
+
+def _now64(now: datetime) -> np.datetime64:
+    return np.datetime64(_to_naive_utc(now), "s")
+
+def _days_staked(frame: PositionFrame, now: datetime) -> np.ndarray:
+    # Whole days, like unstake_coins
+    seconds = (_now64(now) - frame["created_at"]).astype(np.int64)
+    return np.maximum(seconds // SECONDS_PER_DAY, 0)
+
+def _accrued(frame: PositionFrame, days) -> np.ndarray:
+    # Same rounding as staking_rewards.staking_reward, in minor units
+    return percent_of_minor(frame["amount"], frame["apy"], days, 365)
+
+def _expected_returns(frame: PositionFrame) -> np.ndarray:
+    # Same rounding as the maturity settlement, in minor units
+    return percent_of_minor(frame["amount"], frame["expected_return"])
+
+def _total(column: np.ndarray) -> Decimal:
+    return from_minor(column.sum())
+
+def staking_accrued(frame: PositionFrame, now: datetime) -> np.ndarray:
+    """Rewards accrued so far per position, in minor units"""
+    return _accrued(frame, _days_staked(frame, now))
+
+def investment_summary(frame: PositionFrame) -> dict:
+    active = frame.is_label("status", "active")
+    expected = np.where(active, _expected_returns(frame), 0)
+    return {
+        "total_invested": _total(frame["amount"]),
+        "total_earned": _total(frame["returns_earned"]),
+        "expected_returns": _total(expected),
+        "active_positions": int(active.sum()),
+        "by_package": frame.group_sum("package", {
+            "invested": frame["amount"],
+            "earned": frame["returns_earned"],
+            "expected_returns": expected
+        })
+    }
+
+def staking_summary(frame: PositionFrame, now: datetime) -> dict:
+    active = frame.is_label("status", "active")
+    pending = np.where(active, staking_accrued(frame, now), 0)
+    return {
+        "total_earned": _total(frame["rewards_earned"]),
+        "pending_rewards": _total(pending),
+        "active_positions": int(active.sum()),
+        "by_plan": frame.group_sum("plan", {
+            "staked": np.where(active, frame["amount"], 0),
+            "earned": frame["rewards_earned"],
+            "pending_rewards": pending
+        })
+    }
+
+def document_investment_summary(frame: PositionFrame) -> dict:
+    return {
+        "total_invested": _total(frame["amount"]),
+        "total_earned": _total(frame["revenue_earned"]),
+        "total_investments": len(frame)
+    }
+
+def projection_series(investments: PositionFrame, staking: PositionFrame, now: datetime, days: int, step: int = 1) -> List[dict]:
+    """Projected value of active positions at each step over ``days``
+
+    Locked principal plus the gains each position will have earned by
+    that date: staking accrues daily, investment returns land at maturity.
+    """
+    offsets = np.arange(0, days + 1, step, dtype=np.int64)
+    times = _now64(now) + offsets.astype("timedelta64[D]")
+
+    # Investment returns land at maturity: a cumulative sum over positions
+    # sorted by expiry, indexed by how many have matured at each step
+    inv_active = investments.is_label("status", "active")
+    inv_returns = _expected_returns(investments)[inv_active]
+    order = np.argsort(investments["expires_at"][inv_active], kind="stable")
+    matured_returns = np.concatenate(([0], np.cumsum(inv_returns[order])))
+    matured = np.searchsorted(investments["expires_at"][inv_active][order], times, side="right")
+    investment_value = investments["amount"][inv_active].sum() + matured_returns[matured]
+
+    # Each position's reward at every step, rounded the way it will be paid
+    stk_active = staking.is_label("status", "active")
+    staked_days = _days_staked(staking, now)[stk_active][:, None] + offsets
+    accrued = percent_of_minor(
+        staking["amount"][stk_active][:, None], staking["apy"][stk_active][:, None], staked_days, 365
+    ).sum(axis=0)
+    staking_value = staking["amount"][stk_active].sum() + accrued
+
+    start = now.astimezone(timezone.utc)
+    return [
+        {
+            "date": (start + timedelta(days=int(offset))).isoformat(),
+            "investments": from_minor(investment_value[i]),
+            "staking": from_minor(staking_value[i]),
+            "value": from_minor(investment_value[i] + staking_value[i])
+        }
+        for i, offset in enumerate(offsets)
+    ]
+
+INVESTMENT_FIELDS = {
+    "money": ("amount", "returns_earned"),
+    "rates": ("expected_return",),
+    "dates": ("expires_at",),
+    "labels": ("status", "package")
+}
+
+STAKING_FIELDS = {
+    "money": ("amount", "rewards_earned"),
+    "rates": ("apy",),
+    "dates": ("created_at",),
+    "labels": ("status", "plan")
+}
+
+DOCUMENT_INVESTMENT_FIELDS = {
+    "money": ("amount", "revenue_earned")
+}
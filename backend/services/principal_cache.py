@@ -0,0 +1,65 @@
+from typing import Dict, Optional, Set
+from security import hash_token
+from services.cache import TTLCache
+from config import settings
+
+class PrincipalCache:
+    """Authenticated user records cached per session token or JWT subject
+
+    Keys are ``session:<sha256(token)>`` or ``user:<user_id>``, so raw
+    session tokens never sit in memory as cache keys. Routes that change a
+    user or session must call ``invalidate_user`` / ``invalidate_session``;
+    the TTL bounds staleness across workers.
+    """
+
+    def __init__(self, maxsize: int, ttl: float):
+        self._cache = TTLCache(maxsize, ttl, on_evict=self._forget)
+        self._keys_by_user: Dict[str, Set[str]] = {}
+        self.invalidations = 0
+
+    @staticmethod
+    def session_key(session_token: str) -> str:
+        return f"session:{hash_token(session_token)}"
+
+    @staticmethod
+    def user_key(user_id: str) -> str:
+        return f"user:{user_id}"
+
+    def get(self, key: str) -> Optional[dict]:
+        user = self._cache.get(key)
+        # Hand out copies so callers can't mutate the cached record
+        return dict(user) if user is not None else None
+
+    def put(self, key: str, user: dict, ttl: Optional[float] = None):
+        self._cache.set(key, user, ttl)
+        self._keys_by_user.setdefault(user["id"], set()).add(key)
+
+    def invalidate_user(self, user_id: str):
+        for key in self._keys_by_user.pop(user_id, ()):
+            self._cache.pop(key)
+        self.invalidations += 1
+
+    def invalidate_session(self, session_token: str):
+        key = self.session_key(session_token)
+        user = self._cache.pop(key)
+        if user is not None:
+            self._forget(key, user)
+        self.invalidations += 1
+
+    def _forget(self, key: str, user: dict):
+        keys = self._keys_by_user.get(user["id"])
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._keys_by_user[user["id"]]
+
+    def stats(self) -> dict:
+        return {
+            **self._cache.stats(),
+            "invalidations": self.invalidations
+        }
+
+principal_cache = PrincipalCache(
+    maxsize=settings.PRINCIPAL_CACHE_SIZE,
+    ttl=settings.PRINCIPAL_CACHE_TTL
+)
@@ -0,0 +1,169 @@
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from fastapi import HTTPException, status
+from pymongo import ReturnDocument
+from database import get_database
+from config import settings
+from datetime import datetime, timezone
+import asyncio
+import math
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+class RateLimitBackend(ABC):
+    """Storage for sliding-window counters
+
+    Each key keeps the hit count of the current fixed window and of the
+    previous one. The request rate is estimated as
+    ``previous * (1 - elapsed_fraction) + current``, which needs O(1) time
+    and constant memory per key.
+    """
+
+    @abstractmethod
+    async def hit(self, key: str, limit: int, window: int, now: float) -> float:
+        """Record a hit. Returns 0 if allowed, otherwise seconds to wait"""
+
+    async def sweep(self, now: float) -> int:
+        """Evict idle keys. Returns the number of keys removed"""
+        return 0
+
+    def stats(self) -> dict:
+        return {}
+
+def _retry_after(window: int, now: float) -> float:
+    return window - (now % window)
+
+class MemoryRateLimitBackend(RateLimitBackend):
+    """Per-process counters, enough for a single uvicorn worker
+
+    Keys are kept in least recently used order, so a new key arriving at
+    ``max_keys`` evicts the stalest one in O(1); idle keys are otherwise
+    removed by the periodic ``sweep``.
+    """
+
+    def __init__(self, max_keys: int):
+        self.max_keys = max_keys
+        # key -> [window_index, previous_count, current_count, window]
+        self._counters = OrderedDict()
+        self.evicted = 0
+
+    async def hit(self, key: str, limit: int, window: int, now: float) -> float:
+        index = int(now // window)
+        entry = self._counters.get(key)
+
+        if entry is None:
+            while len(self._counters) >= self.max_keys:
+                self._counters.popitem(last=False)
+                self.evicted += 1
+            entry = self._counters[key] = [index, 0, 0, window]
+        else:
+            self._counters.move_to_end(key)
+            if entry[0] != index:
+                entry[1] = entry[2] if entry[0] == index - 1 else 0
+                entry[2] = 0
+                entry[0] = index
+
+        elapsed = (now % window) / window
+        if entry[1] * (1 - elapsed) + entry[2] >= limit:
+            return _retry_after(window, now)
+
+        entry[2] += 1
+        return 0
+
+    def _sweep(self, now: float) -> int:
+        idle = [
+            key for key, (index, _, _, window) in self._counters.items()
+            if int(now // window) - index >= 2
+        ]
+        for key in idle:
+            del self._counters[key]
+        return len(idle)
+
+    async def sweep(self, now: float) -> int:
+        removed = self._sweep(now)
+        self.evicted += removed
+        return removed
+
+    def stats(self) -> dict:
+        return {
+            "backend": "memory",
+            "keys": len(self._counters),
+            "max_keys": self.max_keys,
+            "evicted": self.evicted
+        }
+
+class MongoRateLimitBackend(RateLimitBackend):
+    """Counters shared by all workers through the ``rate_limits`` collection
+
+    One document per key and window, removed by a TTL index on
+    ``expires_at`` once both windows that may read it have passed.
+    """
+
+    collection_name = "rate_limits"
+
+    async def hit(self, key: str, limit: int, window: int, now: float) -> float:
+        collection = get_database()[self.collection_name]
+        index = int(now // window)
+        expires_at = datetime.fromtimestamp((index + 2) * window, tz=timezone.utc)
+
+        current, previous = await asyncio.gather(
+            collection.find_one_and_update(
+                {"_id": f"{key}:{index}"},
+                {"$inc": {"count": 1}, "$setOnInsert": {"expires_at": expires_at}},
+                upsert=True,
+                return_document=ReturnDocument.AFTER
+            ),
+            collection.find_one({"_id": f"{key}:{index - 1}"})
+        )
+
+        elapsed = (now % window) / window
+        previous_count = previous["count"] if previous else 0
+        # current["count"] already includes this hit
+        if previous_count * (1 - elapsed) + current["count"] - 1 >= limit:
+            await collection.update_one({"_id": f"{key}:{index}"}, {"$inc": {"count": -1}})
+            return _retry_after(window, now)
+        return 0
+
+    def stats(self) -> dict:
+        return {"backend": "mongo", "collection": self.collection_name}
+
+class RateLimiter:
+    def __init__(self, backend: RateLimitBackend):
+        self.backend = backend
+        self.allowed = 0
+        self.rejected = 0
+
+    async def check(self, key: str, limit: int, window: int):
+        """Count a hit for ``key``, raising 429 when over the limit"""
+        retry_after = await self.backend.hit(key, limit, window, time.time())
+        if retry_after:
+            self.rejected += 1
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail="Too many requests. Please try again later.",
+                headers={"Retry-After": str(math.ceil(retry_after))}
+            )
+        self.allowed += 1
+
+    async def sweep(self):
+        removed = await self.backend.sweep(time.time())
+        if removed:
+            logger.info(f"Rate limiter evicted {removed} idle keys")
+
+    def stats(self) -> dict:
+        return {
+            "allowed": self.allowed,
+            "rejected": self.rejected,
+            **self.backend.stats()
+        }
+
+def create_backend(name: str) -> RateLimitBackend:
+    if name == "mongo":
+        return MongoRateLimitBackend()
+    if name == "memory":
+        return MemoryRateLimitBackend(max_keys=settings.RATE_LIMIT_MAX_KEYS)
+    raise ValueError(f"Unknown rate limit backend: {name}")
+
+rate_limiter = RateLimiter(create_backend(settings.RATE_LIMIT_BACKEND))
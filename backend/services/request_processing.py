@@ -0,0 +1,258 @@
+from fastapi import HTTPException, status
+from pymongo import ReturnDocument, UpdateOne
+from models import TransactionType, TransactionStatus
+from database import run_in_transaction
+from services.transactions import set_transaction_statuses
+from services.platform_metrics import platform_metrics
+from services.ledger import ledger, available, locked, platform, EXTERNAL
+from services.money import to_money
+from config import settings
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+import logging
+import uuid
+
+logger = logging.getLogger(__name__)
+
+PROCESSED = "processed"
+NOT_FOUND = "not_found"
+ALREADY_PROCESSED = "already_processed"
+WALLET_NOT_FOUND = "wallet_not_found"
+
+# Request collection, transaction type and pending counter per kind
+KINDS = {
+    "deposit": ("deposit_requests", TransactionType.DEPOSIT, "pending.deposits"),
+    "withdrawal": ("withdrawal_requests", TransactionType.WITHDRAWAL, "pending.withdrawals"),
+}
+
+def deposit_legs(requests: List[dict], approved: bool) -> list:
+    if not approved:
+        return []
+    legs = [available(req["user_id"], req["amount"]) for req in requests]
+    legs.append(platform(EXTERNAL, -sum(to_money(req["amount"]) for req in requests)))
+    return legs
+
+def withdrawal_legs(requests: List[dict], approved: bool) -> list:
+    # The amounts were locked when the withdrawals were requested
+    legs = [locked(req["user_id"], -to_money(req["amount"])) for req in requests]
+    if approved:
+        legs.append(platform(EXTERNAL, sum(to_money(req["amount"]) for req in requests)))
+    else:
+        legs += [available(req["user_id"], req["amount"]) for req in requests]
+    return legs
+
+async def _pair_transactions(db, tx_type, requests: List[dict], session=None) -> Dict[str, dict]:
+    """Pending transactions for requests created before they were linked
+
+    Each request is paired with a pending transaction of the same user,
+    type and amount, oldest first, and every transaction is used at most
+    once. Only needed until ``migrations.request_ids`` has run.
+    """
+    rows = await db.transactions.find(
+        {"user_id": {"$in": list({req["user_id"] for req in requests})}, "type": tx_type, "status": TransactionStatus.PENDING},
+        {"_id": 1, "user_id": 1, "amount": 1},
+        session=session
+    ).sort("created_at", 1).to_list(None)
+    candidates = {}
+    for row in rows:
+        candidates.setdefault((row["user_id"], to_money(row["amount"])), []).append(row)
+
+    paired = {}
+    for req in requests:
+        matches = candidates.get((req["user_id"], to_money(req["amount"])))
+        if matches:
+            paired[req["id"]] = matches.pop(0)
+    return paired
+
+async def _pending_transactions(db, tx_type, requests: List[dict], session=None) -> Dict[str, dict]:
+    """The pending transaction of each request, by request id"""
+    linked = {req["id"]: req["transaction_id"] for req in requests if req.get("transaction_id")}
+    paired = {}
+    if linked:
+        rows = await db.transactions.find(
+            {"id": {"$in": list(linked.values())}, "status": TransactionStatus.PENDING},
+            {"_id": 1, "id": 1, "user_id": 1, "amount": 1},
+            session=session
+        ).to_list(None)
+        by_id = {row["id"]: row for row in rows}
+        paired = {request_id: by_id[tx_id] for request_id, tx_id in linked.items() if tx_id in by_id}
+    unlinked = [req for req in requests if "transaction_id" not in req]
+    if unlinked:
+        paired.update(await _pair_transactions(db, tx_type, unlinked, session))
+    return paired
+
+async def _without_wallet(db, collection, ids: List[str]) -> set:
+    """Ids of pending requests whose user has no wallet"""
+    pending = await collection.find(
+        {"id": {"$in": ids}, "status": TransactionStatus.PENDING},
+        {"_id": 0, "id": 1, "user_id": 1}
+    ).to_list(None)
+    if not pending:
+        return set()
+    users = set(await db.wallets.distinct("user_id", {"user_id": {"$in": list({req["user_id"] for req in pending})}}))
+    return {req["id"] for req in pending if req["user_id"] not in users}
+
+class RequestProcessor:
+    """Approves or rejects deposit and withdrawal requests by id, in batches
+
+    A batch is claimed with one conditional bulk write that moves the
+    still-pending requests among the given ids to their final status under
+    a fresh ``batch_id`` (a single request with one ``find_one_and_update``
+    on the unique ``id`` index), so each request is processed by exactly
+    one call even when admins race. The claimed requests then move money
+    in a single ledger journal and settle the transactions they link to
+    through ``transaction_id`` with one lookup and one bulk write, all in
+    one transaction where the server supports it. Requests whose user has
+    no wallet are reported and left pending rather than failing the batch;
+    without transactions, a journal that still fails releases the claims.
+    """
+
+    def __init__(self, max_batch: int):
+        self.max_batch = max_batch
+        self.batches = 0
+        self.processed = 0
+        self.skipped = 0
+
+    async def process(
+        self,
+        db,
+        kind: str,
+        ids: List[str],
+        approved: bool,
+        admin_id: str,
+        reason: str = "",
+        tx_hashes: Optional[Dict[str, str]] = None
+    ) -> dict:
+        """Process ``ids`` and report a result per id
+
+        Returns ``{"batch_id", "results", "requests"}`` where ``results``
+        holds ``{"id", "result"}`` in request order and ``requests`` the
+        request documents this call processed.
+        """
+        ids = list(dict.fromkeys(ids))
+        if len(ids) > self.max_batch:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"At most {self.max_batch} requests can be processed at once"
+            )
+        collection_name, tx_type, pending_counter = KINDS[kind]
+        collection = db[collection_name]
+        tx_hashes = tx_hashes or {}
+        batch_id = str(uuid.uuid4())
+        new_status = TransactionStatus.COMPLETED if approved else TransactionStatus.FAILED
+
+        # Only journaled requests need a wallet; rejected deposits move nothing
+        no_wallet = set()
+        if approved or kind == "withdrawal":
+            no_wallet = await _without_wallet(db, collection, ids)
+        claim_ids = [request_id for request_id in ids if request_id not in no_wallet]
+
+        def claim_fields(request_id: str, now: datetime) -> dict:
+            fields = {
+                "status": new_status,
+                "processed_by": admin_id,
+                "processed_at": now,
+                "reason": reason,
+                "batch_id": batch_id
+            }
+            if kind == "withdrawal":
+                fields["tx_hash"] = tx_hashes.get(request_id, "") if approved else None
+            return fields
+
+        async def claim(session) -> List[dict]:
+            now = datetime.now(timezone.utc)
+            if not claim_ids:
+                return []
+            if len(claim_ids) == 1:
+                # One indexed lookup that also flips the status
+                claimed = await collection.find_one_and_update(
+                    {"id": claim_ids[0], "status": TransactionStatus.PENDING},
+                    {"$set": claim_fields(claim_ids[0], now)},
+                    projection={"_id": 0},
+                    return_document=ReturnDocument.AFTER,
+                    session=session
+                )
+                return [claimed] if claimed else []
+            result = await collection.bulk_write(
+                [
+                    UpdateOne({"id": request_id, "status": TransactionStatus.PENDING}, {"$set": claim_fields(request_id, now)})
+                    for request_id in claim_ids
+                ],
+                ordered=False,
+                session=session
+            )
+            if result.modified_count == 0:
+                return []
+            return await collection.find(
+                {"id": {"$in": claim_ids}, "batch_id": batch_id},
+                {"_id": 0},
+                session=session
+            ).sort("created_at", 1).to_list(None)
+
+        async def apply(session):
+            claimed = await claim(session)
+            if not claimed:
+                return claimed
+
+            legs = (deposit_legs if kind == "deposit" else withdrawal_legs)(claimed, approved)
+            if legs:
+                try:
+                    await ledger.post(
+                        db,
+                        kind if approved else f"{kind}_rejected",
+                        legs,
+                        {"batch_id": batch_id, f"{kind}_ids": [req["id"] for req in claimed]},
+                        session=session
+                    )
+                except Exception:
+                    if session is None:
+                        # No transaction rolls the claims back; hand them back
+                        await collection.update_many(
+                            {"batch_id": batch_id, "status": new_status},
+                            {
+                                "$set": {"status": TransactionStatus.PENDING},
+                                "$unset": {"processed_by": "", "processed_at": "", "reason": "", "batch_id": "", "tx_hash": ""}
+                            }
+                        )
+                    raise
+
+            paired = await _pending_transactions(db, tx_type, claimed, session)
+            extra = {}
+            if kind == "withdrawal" and approved:
+                extra = {tx["_id"]: {"metadata.tx_hash": tx_hashes.get(request_id, "")} for request_id, tx in paired.items()}
+            await set_transaction_statuses(db, list(paired.values()), new_status, extra, session=session)
+            await platform_metrics.increment(db, {pending_counter: -len(claimed)}, session=session)
+            return claimed
+
+        claimed = await run_in_transaction(apply)
+
+        processed_ids = {req["id"] for req in claimed}
+        unclaimed = [request_id for request_id in ids if request_id not in processed_ids]
+        found = set()
+        if unclaimed:
+            found = set(await collection.distinct("id", {"id": {"$in": unclaimed}}))
+
+        def result(request_id: str) -> str:
+            if request_id in processed_ids:
+                return PROCESSED
+            if request_id in no_wallet:
+                return WALLET_NOT_FOUND
+            return ALREADY_PROCESSED if request_id in found else NOT_FOUND
+
+        results = [{"id": request_id, "result": result(request_id)} for request_id in ids]
+        self.batches += 1
+        self.processed += len(claimed)
+        self.skipped += len(ids) - len(claimed)
+        if len(claimed) < len(ids):
+            logger.info(f"{kind} batch {batch_id}: processed {len(claimed)} of {len(ids)} requests")
+        return {"batch_id": batch_id, "results": results, "requests": claimed}
+
+    def stats(self) -> dict:
+        return {
+            "batches": self.batches,
+            "processed": self.processed,
+            "skipped": self.skipped,
+            "max_batch": self.max_batch
+        }
+
+request_processor = RequestProcessor(max_batch=settings.ADMIN_BATCH_MAX_SIZE)
@@ -0,0 +1,259 @@
+from services.cache import TTLCache
+from services.file_storage import etag_matches
+from config import settings
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Set, Tuple
+import asyncio
+import hashlib
+import logging
+import re
+import time
+
+logger = logging.getLogger(__name__)
+
+@dataclass(frozen=True)
+class CacheRule:
+    pattern: str
+    ttl: float
+    tags: Tuple[str, ...] = ()
+    # Only cache callers without credentials (responses that vary by user);
+    # served with Vary so shared caches keep the two variants apart
+    anonymous_only: bool = False
+
+# Public, read-mostly GET endpoints. Tags may use the pattern's named groups.
+RULES = [
+    CacheRule(r"^/api/staking/plans$", ttl=3600, tags=("config",)),
+    CacheRule(r"^/api/investments/packages$", ttl=3600, tags=("config",)),
+    CacheRule(r"^/api/crypto/rates$", ttl=30, tags=("rates",)),
+    CacheRule(r"^/api/documents$", ttl=30, tags=("documents",), anonymous_only=True),
+    CacheRule(r"^/api/documents/(?P<document_id>[^/]+)$", ttl=60, tags=("document:{document_id}",)),
+]
+
+@dataclass
+class CachedResponse:
+    status: int
+    headers: List[Tuple[bytes, bytes]]
+    body: bytes
+    etag: str
+    stored_at: float
+    ttl: float
+    tags: Tuple[str, ...]
+
+    def max_age(self) -> int:
+        return max(0, int(self.ttl - (time.monotonic() - self.stored_at)))
+
+class ResponseCache:
+    """In-process cache of whole GET responses for the routes in ``RULES``
+
+    Entries are keyed by path and query string and tagged so writes can
+    drop exactly what they change (``invalidate_document``). Concurrent
+    misses for one key share a single call into the app. Each worker
+    process holds its own cache, so with several workers an invalidation
+    only reaches the worker that handled the write and the TTL bounds how
+    stale the others can be.
+    """
+
+    def __init__(self, rules: List[CacheRule], maxsize: int, enabled: bool = True):
+        self.rules = [(re.compile(rule.pattern), rule) for rule in rules]
+        self.enabled = enabled
+        self.max_ttl = max(rule.ttl for rule in rules)
+        self._entries = TTLCache(maxsize=maxsize, ttl=self.max_ttl, on_evict=self._forget)
+        self._tagged: Dict[str, Set[str]] = {}
+        self._inflight: Dict[str, asyncio.Future] = {}
+        # Bumped on every invalidation so a fetch that raced one is not stored
+        self.generation = 0
+        self.coalesced = 0
+        self.not_modified = 0
+        self.invalidations = 0
+
+    def match(self, path: str) -> Optional[Tuple[CacheRule, Tuple[str, ...]]]:
+        for pattern, rule in self.rules:
+            found = pattern.match(path)
+            if found:
+                return rule, tuple(tag.format(**found.groupdict()) for tag in rule.tags)
+        return None
+
+    def get(self, key: str) -> Optional[CachedResponse]:
+        return self._entries.get(key)
+
+    def store(self, key: str, response: CachedResponse):
+        self._entries.set(key, response, ttl=response.ttl)
+        for tag in response.tags:
+            self._tagged.setdefault(tag, set()).add(key)
+
+    def _forget(self, key: str, response: CachedResponse):
+        for tag in response.tags:
+            keys = self._tagged.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tagged[tag]
+
+    def invalidate(self, *tags: str):
+        self.generation += 1
+        self.invalidations += 1
+        for tag in tags:
+            for key in self._tagged.pop(tag, set()):
+                response = self._entries.pop(key)
+                if response is not None:
+                    self._forget(key, response)
+
+    def invalidate_document(self, document_id: str):
+        """Drop a document's detail response and every cached listing"""
+        self.invalidate(f"document:{document_id}", "documents")
+
+    def clear(self):
+        self.generation += 1
+        self._entries.clear()
+        self._tagged.clear()
+
+    def stats(self) -> dict:
+        return {
+            **self._entries.stats(),
+            "enabled": self.enabled,
+            "coalesced": self.coalesced,
+            "not_modified": self.not_modified,
+            "invalidations": self.invalidations,
+            "inflight": len(self._inflight)
+        }
+
+def _has_credentials(headers: Dict[bytes, bytes]) -> bool:
+    return b"authorization" in headers or b"session_token=" in headers.get(b"cookie", b"")
+
+def _etag(body: bytes) -> str:
+    return '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+
+def _private(send):
+    """Wrap ``send`` so a per-user response is never stored by shared caches"""
+
+    async def send_private(message):
+        if message["type"] == "http.response.start":
+            headers = [
+                (name, value) for name, value in message.get("headers", [])
+                if name.lower() not in (b"cache-control", b"vary")
+            ]
+            headers += [(b"cache-control", b"private"), (b"vary", b"Authorization, Cookie")]
+            message = {**message, "headers": headers}
+        await send(message)
+
+    return send_private
+
+class ResponseCacheMiddleware:
+    """ASGI middleware serving GET responses from a ``ResponseCache``
+
+    Cached responses carry ``ETag`` and ``Cache-Control`` headers, plus
+    ``Vary: Authorization, Cookie`` for ``anonymous_only`` rules, whose
+    credentialed responses go out uncached and ``private``; a matching
+    ``If-None-Match`` gets a bodiless 304.
+    """
+
+    def __init__(self, app, cache: ResponseCache):
+        self.app = app
+        self.cache = cache
+
+    async def __call__(self, scope, receive, send):
+        if not self.cache.enabled or scope["type"] != "http" or scope["method"] != "GET":
+            await self.app(scope, receive, send)
+            return
+
+        matched = self.cache.match(scope["path"])
+        headers = dict(scope["headers"])
+        if matched is None:
+            await self.app(scope, receive, send)
+            return
+        if matched[0].anonymous_only and _has_credentials(headers):
+            await self.app(scope, receive, _private(send))
+            return
+
+        rule, tags = matched
+        key = scope["path"] + "?" + scope["query_string"].decode("latin-1")
+        cached = self.cache.get(key)
+        if cached is None:
+            cached = await self._fetch(key, rule, tags, scope, receive, send)
+            if cached is None:
+                # Not cacheable; the response was already sent
+                return
+            hit = False
+        else:
+            hit = True
+        await self._send(cached, rule, headers, hit, send)
+
+    async def _fetch(self, key, rule, tags, scope, receive, send) -> Optional[CachedResponse]:
+        inflight = self.cache._inflight.get(key)
+        if inflight is not None:
+            self.cache.coalesced += 1
+            cached = await asyncio.shield(inflight)
+            if cached is not None:
+                return cached
+            # The leader's response was not cacheable; fetch our own
+            await self.app(scope, receive, send)
+            return None
+
+        future = asyncio.get_running_loop().create_future()
+        self.cache._inflight[key] = future
+        generation = self.cache.generation
+        try:
+            start, body = await self._capture(scope, receive)
+            cached = None
+            if start["status"] == 200:
+                cached = CachedResponse(
+                    status=200,
+                    headers=[
+                        (name, value) for name, value in start.get("headers", [])
+                        if name.lower() not in (b"content-length", b"etag", b"cache-control", b"vary")
+                    ],
+                    body=body,
+                    etag=_etag(body),
+                    stored_at=time.monotonic(),
+                    ttl=rule.ttl,
+                    tags=tags
+                )
+            if cached is not None and generation == self.cache.generation:
+                self.cache.store(key, cached)
+                future.set_result(cached)
+            else:
+                # Followers must not reuse a response that raced an invalidation
+                future.set_result(None)
+        except BaseException:
+            if not future.done():
+                future.set_result(None)
+            raise
+        finally:
+            del self.cache._inflight[key]
+
+        if cached is None:
+            await send(start)
+            await send({"type": "http.response.body", "body": body})
+        return cached
+
+    async def _capture(self, scope, receive) -> Tuple[dict, bytes]:
+        start = {}
+        chunks = []
+
+        async def capture(message):
+            if message["type"] == "http.response.start":
+                start.update(message)
+            elif message["type"] == "http.response.body":
+                chunks.append(message.get("body", b""))
+
+        await self.app(scope, receive, capture)
+        return start, b"".join(chunks)
+
+    async def _send(self, cached: CachedResponse, rule: CacheRule, request_headers: Dict[bytes, bytes], hit: bool, send):
+        cache_headers = [
+            (b"etag", cached.etag.encode()),
+            (b"cache-control", f"public, max-age={cached.max_age()}".encode()),
+            (b"x-cache", b"HIT" if hit else b"MISS"),
+        ]
+        if rule.anonymous_only:
+            cache_headers.append((b"vary", b"Authorization, Cookie"))
+        if etag_matches(request_headers.get(b"if-none-match", b"").decode("latin-1"), cached.etag):
+            self.cache.not_modified += 1
+            await send({"type": "http.response.start", "status": 304, "headers": cache_headers})
+            await send({"type": "http.response.body", "body": b""})
+            return
+        headers = cached.headers + cache_headers + [(b"content-length", str(len(cached.body)).encode())]
+        await send({"type": "http.response.start", "status": cached.status, "headers": headers})
+        await send({"type": "http.response.body", "body": cached.body})
+
+response_cache = ResponseCache(RULES, maxsize=settings.RESPONSE_CACHE_SIZE, enabled=settings.RESPONSE_CACHE_ENABLED)
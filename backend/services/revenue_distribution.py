@@ -0,0 +1,117 @@
+from pymongo import UpdateOne
+from models import TransactionType, TransactionStatus
+from database import run_in_transaction
+from services.transactions import record_transactions
+from services.ledger import ledger, available, platform, REVENUE_SHARE
+from services.money import to_money, to_minor, from_minor, rate_array, percent_of_minor
+from datetime import datetime, timezone
+from decimal import Decimal
+import numpy as np
+
+def _investor_shares(price: Decimal, investments: list) -> dict:
+    """Revenue owed per investment id, with the investor it belongs to
+
+    All shares are computed at once in int64 minor units, each rounded
+    to the cent exactly once.
+    """
+    if not investments:
+        return {}
+    shares = percent_of_minor(
+        np.full(len(investments), to_minor(price), dtype=np.int64),
+        rate_array(inv["share_percentage"] for inv in investments)
+    )
+    return {
+        inv["id"]: (inv["user_id"], from_minor(share))
+        for inv, share in zip(investments, shares)
+    }
+
+async def distribute_purchase(db, document: dict, buyer_id: str):
+    """Apply every ledger effect of a document purchase atomically
+
+    Debits the buyer, credits the seller and each investor, records the
+    purchase, sale and reward transactions and updates the document and
+    investment totals with a fixed number of round trips, however many
+    investors the document has.
+    """
+    document_id = document["id"]
+    price = to_money(document["price"])
+
+    async def apply(session):
+        investments = await db.document_investments.find(
+            {"document_id": document_id},
+            {"_id": 0, "id": 1, "user_id": 1, "share_percentage": 1},
+            session=session
+        ).to_list(None)
+        shares = _investor_shares(price, investments)
+
+        # One credit per wallet, even if a user holds several positions
+        credits = {document["seller_id"]: price}
+        for user_id, share in shares.values():
+            credits[user_id] = credits.get(user_id, 0) + share
+
+        # Applies only if the buyer's available (unlocked) balance covers the price
+        legs = [available(buyer_id, -price)]
+        legs += [available(user_id, amount) for user_id, amount in credits.items()]
+        legs.append(platform(REVENUE_SHARE, -sum(share for _, share in shares.values())))
+        await ledger.post(
+            db,
+            "document_purchase",
+            legs,
+            {"document_id": document_id},
+            guard=(buyer_id, price),
+            session=session
+        )
+
+        if shares:
+            await db.document_investments.bulk_write(
+                [
+                    UpdateOne({"id": investment_id}, {"$inc": {"revenue_earned": share}})
+                    for investment_id, (_, share) in shares.items()
+                ],
+                ordered=False,
+                session=session
+            )
+
+        now = datetime.now(timezone.utc)
+        transactions = [
+            {
+                "user_id": buyer_id,
+                "type": TransactionType.PURCHASE,
+                "amount": price,
+                "status": TransactionStatus.COMPLETED,
+                "description": f"Purchased document: {document['title']}",
+                "metadata": {"document_id": document_id},
+                "created_at": now
+            },
+            {
+                "user_id": document["seller_id"],
+                "type": TransactionType.SALE,
+                "amount": price,
+                "status": TransactionStatus.COMPLETED,
+                "description": f"Sold document: {document['title']}",
+                "metadata": {"document_id": document_id, "buyer_id": buyer_id},
+                "created_at": now
+            }
+        ]
+        transactions.extend(
+            {
+                "user_id": user_id,
+                "type": TransactionType.REWARD,
+                "amount": share,
+                "status": TransactionStatus.COMPLETED,
+                "description": f"Investment return from document: {document['title']}",
+                "metadata": {"document_id": document_id},
+                "created_at": now
+            }
+            for user_id, share in shares.values()
+        )
+        await record_transactions(db, transactions, session=session)
+
+        await db.documents.update_one(
+            {"id": document_id},
+            {"$inc": {"downloads": 1, "revenue": price}},
+            session=session
+        )
+        return len(shares)
+
+    return await run_in_transaction(apply)
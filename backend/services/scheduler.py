@@ -0,0 +1,95 @@
+from datetime import datetime, timezone
+from typing import Awaitable, Callable, Dict, Optional
+import asyncio
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+class PeriodicTask:
+    """A coroutine function re-run every ``interval`` seconds"""
+
+    def __init__(self, name: str, interval: float, func: Callable[[], Awaitable], run_on_start: bool = False):
+        self.name = name
+        self.interval = interval
+        self.func = func
+        self.run_on_start = run_on_start
+        self.runs = 0
+        self.errors = 0
+        self.last_error: Optional[str] = None
+        self.last_run_at: Optional[datetime] = None
+        self.last_duration = 0.0
+        self._task: Optional[asyncio.Task] = None
+
+    async def run_once(self):
+        started = time.perf_counter()
+        try:
+            await self.func()
+        except Exception as e:
+            self.errors += 1
+            self.last_error = str(e)
+            logger.exception(f"Periodic task {self.name} failed")
+        finally:
+            self.runs += 1
+            self.last_duration = time.perf_counter() - started
+            self.last_run_at = datetime.now(timezone.utc)
+
+    async def _loop(self):
+        if not self.run_on_start:
+            await asyncio.sleep(self.interval)
+        while True:
+            await self.run_once()
+            await asyncio.sleep(self.interval)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._loop(), name=f"periodic:{self.name}")
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self) -> dict:
+        return {
+            "interval_seconds": self.interval,
+            "runs": self.runs,
+            "errors": self.errors,
+            "last_error": self.last_error,
+            "last_run_at": self.last_run_at,
+            "last_duration_ms": self.last_duration * 1000
+        }
+
+class Scheduler:
+    """Registry of in-process background jobs started with the app"""
+
+    def __init__(self):
+        self.tasks: Dict[str, PeriodicTask] = {}
+        self.running = False
+
+    def register(self, name: str, interval: float, func: Callable[[], Awaitable], run_on_start: bool = False) -> PeriodicTask:
+        task = PeriodicTask(name, interval, func, run_on_start=run_on_start)
+        self.tasks[name] = task
+        if self.running:
+            task.start()
+        return task
+
+    def start(self):
+        self.running = True
+        for task in self.tasks.values():
+            task.start()
+        logger.info(f"Started {len(self.tasks)} background tasks")
+
+    async def stop(self):
+        self.running = False
+        for task in self.tasks.values():
+            await task.stop()
+
+    def stats(self) -> dict:
+        return {name: task.stats() for name, task in self.tasks.items()}
+
+scheduler = Scheduler()
@@ -0,0 +1,18 @@
+from services.dates import date_filter
+from datetime import datetime, timezone
+from typing import Optional
+
+def live_filter(now: Optional[datetime] = None) -> dict:
+    """Sessions that have not expired yet
+
+    The TTL monitor only purges about once a minute, so reads must still
+    filter on ``expires_at`` themselves.
+    """
+    return date_filter("expires_at", {"$gt": now or datetime.now(timezone.utc)})
+
+async def find_live_session(db, session_token: str) -> Optional[dict]:
+    return await db.sessions.find_one({"session_token": session_token, **live_filter()})
+
+async def live_session_count(db) -> int:
+    # Range count on the expires_at TTL index, answered from the index alone
+    return await db.sessions.count_documents(live_filter())
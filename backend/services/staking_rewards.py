@@ -0,0 +1,129 @@
+from database import get_database
+from services.money import Money, percent_of
+from services.dates import as_datetime
+from datetime import datetime, timezone
+from typing import Optional
+import logging
+
+logger = logging.getLogger(__name__)
+
+DAY_MS = 24 * 60 * 60 * 1000
+
+def days_staked(created_at, now: datetime) -> int:
+    """Whole days a position has been staked"""
+    return (now - as_datetime(created_at)).days
+
+def staking_reward(amount: Money, apy: float, days: int) -> Money:
+    """Simple daily accrual of the plan APY, rounded once to the cent"""
+    return percent_of(amount, apy, days, 365)
+
+def _created_at_expr() -> dict:
+    # Rows not yet converted by migrations.iso_dates still hold isoformat
+    # strings, whose first 19 characters are the UTC second they were written
+    return {
+        "$cond": [
+            {"$eq": [{"$type": "$created_at"}, "date"]},
+            "$created_at",
+            {"$dateFromString": {"dateString": {"$substrCP": ["$created_at", 0, 19]}, "timezone": "UTC"}}
+        ]
+    }
+
+def accrual_pipeline(now: datetime) -> list:
+    """Update pipeline writing ``accrued_rewards`` on active positions
+
+    Mirrors ``staking_reward`` so the stored value matches what
+    ``unstake_coins`` pays out for the same day.
+    """
+    return [
+        {
+            "$set": {
+                "accrued_days": {
+                    "$max": [0, {"$floor": {"$divide": [{"$subtract": [now, _created_at_expr()]}, DAY_MS]}}]
+                }
+            }
+        },
+        {
+            "$set": {
+                # Decimal arithmetic with a single half-even rounding, like percent_of
+                "accrued_rewards": {
+                    "$round": [
+                        {"$divide": [{"$multiply": [{"$toDecimal": "$amount"}, "$apy", "$accrued_days"]}, 100 * 365]},
+                        2
+                    ]
+                },
+                "accrued_at": now
+            }
+        }
+    ]
+
+def summary_pipeline(match: dict) -> list:
+    """Aggregate positions into one ``staking_summaries`` document per user"""
+    return [
+        {"$match": match},
+        {
+            "$group": {
+                "_id": "$user_id",
+                "total_earned": {"$sum": {"$ifNull": ["$rewards_earned", 0]}},
+                "pending_rewards": {
+                    "$sum": {"$cond": [{"$eq": ["$status", "active"]}, {"$ifNull": ["$accrued_rewards", 0]}, 0]}
+                },
+                "active_positions": {"$sum": {"$cond": [{"$eq": ["$status", "active"]}, 1, 0]}},
+                "total_staked": {"$sum": {"$cond": [{"$eq": ["$status", "active"]}, "$amount", 0]}}
+            }
+        },
+        {"$set": {"updated_at": "$$NOW"}},
+        {"$merge": {"into": "staking_summaries", "on": "_id", "whenMatched": "replace", "whenNotMatched": "insert"}}
+    ]
+
+class StakingAccrual:
+    """Materialises pending staking rewards for cheap reads
+
+    ``run`` recomputes ``accrued_rewards`` on every active position with a
+    single server-side pipeline update, then rebuilds the per-user
+    ``staking_summaries`` collection read by ``GET /staking/rewards``.
+    ``refresh_user`` does the same for one user after a stake or unstake.
+    """
+
+    def __init__(self):
+        self.runs = 0
+        self.positions_updated = 0
+        self.last_accrued_at: Optional[datetime] = None
+
+    async def _accrue(self, db, match: dict, now: datetime) -> int:
+        result = await db.staking_positions.update_many(
+            {**match, "status": "active"},
+            accrual_pipeline(now)
+        )
+        await db.staking_positions.aggregate(summary_pipeline(match)).to_list(None)
+        return result.modified_count
+
+    async def run(self):
+        db = get_database()
+        now = datetime.now(timezone.utc)
+        updated = await self._accrue(db, {}, now)
+        self.runs += 1
+        self.positions_updated = updated
+        self.last_accrued_at = now
+        logger.info(f"Staking accrual: updated {updated} active positions")
+
+    async def refresh_user(self, db, user_id: str):
+        await self._accrue(db, {"user_id": user_id}, datetime.now(timezone.utc))
+
+    async def read_summary(self, db, user_id: str) -> dict:
+        summary = await db.staking_summaries.find_one({"_id": user_id})
+        if summary is None:
+            return {"total_earned": 0, "pending_rewards": 0, "active_positions": 0}
+        return {
+            "total_earned": summary["total_earned"],
+            "pending_rewards": summary["pending_rewards"],
+            "active_positions": summary["active_positions"]
+        }
+
+    def stats(self) -> dict:
+        return {
+            "runs": self.runs,
+            "positions_updated": self.positions_updated,
+            "last_accrued_at": self.last_accrued_at.isoformat() if self.last_accrued_at else None
+        }
+
+staking_accrual = StakingAccrual()
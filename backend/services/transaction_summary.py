@@ -0,0 +1,106 @@
+from services.cache import TTLCache
+from services.money import ZERO, to_money
+from services.dates import date_filter
+from config import settings
+from datetime import datetime, timezone
+from typing import Optional
+
+BUCKET_LENGTHS = {"day": 10, "month": 7}
+BUCKET_FORMATS = {"day": "%Y-%m-%d", "month": "%Y-%m"}
+
+def _bucket_expr(bucket: str) -> dict:
+    # Rows not yet converted by migrations.iso_dates still hold isoformat strings
+    return {
+        "$cond": [
+            {"$eq": [{"$type": "$created_at"}, "date"]},
+            {"$dateToString": {"format": BUCKET_FORMATS[bucket], "date": "$created_at"}},
+            {"$substrCP": ["$created_at", 0, BUCKET_LENGTHS[bucket]]}
+        ]
+    }
+
+def _bound(value: datetime) -> datetime:
+    return value.astimezone(timezone.utc)
+
+def summary_pipeline(user_id: str, bucket: str, since: Optional[datetime], until: Optional[datetime]) -> list:
+    """Counts and amounts per (period, type, status) for one user"""
+    match = {"user_id": user_id}
+    if since or until:
+        bounds = {}
+        if since:
+            bounds["$gte"] = _bound(since)
+        if until:
+            bounds["$lt"] = _bound(until)
+        match.update(date_filter("created_at", bounds))
+    return [
+        {"$match": match},
+        {
+            "$group": {
+                "_id": {"period": _bucket_expr(bucket), "type": "$type", "status": "$status"},
+                "count": {"$sum": 1},
+                "total": {"$sum": "$amount"}
+            }
+        },
+        {"$sort": {"_id.period": -1}}
+    ]
+
+def fold_summary(rows: list) -> list:
+    """Nest grouped rows into one entry per period, newest first"""
+    periods = {}
+    for row in rows:
+        key = row["_id"]
+        period = periods.setdefault(key["period"], {
+            "period": key["period"],
+            "count": 0,
+            "total": ZERO,
+            "by_type": {},
+            "by_status": {}
+        })
+        period["count"] += row["count"]
+        period["total"] += to_money(row["total"])
+        for group, name in (("by_type", key["type"]), ("by_status", key["status"])):
+            entry = period[group].setdefault(name, {"count": 0, "total": ZERO})
+            entry["count"] += row["count"]
+            entry["total"] += to_money(row["total"])
+    return list(periods.values())
+
+class TransactionSummaryCache:
+    """Per-user transaction summaries, dropped when the user's rows change
+
+    Each user has one cache entry holding up to ``max_variants`` of the
+    variants (bucket and date range) requested since the last change,
+    least recently used dropped first, so ``invalidate`` is a single pop.
+    Other workers see new rows once their TTL runs out.
+    """
+
+    def __init__(self, maxsize: int, ttl: float, max_variants: int):
+        self._cache = TTLCache(maxsize, ttl)
+        self.max_variants = max_variants
+
+    async def get(self, db, user_id: str, bucket: str, since: Optional[datetime] = None, until: Optional[datetime] = None) -> list:
+        variant = (bucket, since and _bound(since), until and _bound(until))
+        variants = self._cache.get(user_id)
+        if variants is not None and variant in variants:
+            variants[variant] = variants.pop(variant)
+            return variants[variant]
+
+        rows = await db.transactions.aggregate(summary_pipeline(user_id, bucket, since, until)).to_list(None)
+        summary = fold_summary(rows)
+        if variants is None:
+            variants = {}
+            self._cache.set(user_id, variants)
+        variants[variant] = summary
+        while len(variants) > self.max_variants:
+            del variants[next(iter(variants))]
+        return summary
+
+    def invalidate(self, user_id: str):
+        self._cache.pop(user_id)
+
+    def stats(self) -> dict:
+        return self._cache.stats()
+
+transaction_summary = TransactionSummaryCache(
+    maxsize=settings.TRANSACTION_SUMMARY_CACHE_SIZE,
+    ttl=settings.TRANSACTION_SUMMARY_CACHE_TTL,
+    max_variants=settings.TRANSACTION_SUMMARY_MAX_VARIANTS
+)
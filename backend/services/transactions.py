@@ -0,0 +1,87 @@
+from pymongo import ReturnDocument, UpdateOne
+from models import TransactionStatus
+from typing import Any, Dict, List, Optional
+from services.platform_metrics import platform_metrics, transaction_deltas, transaction_status_deltas
+from services.transaction_summary import transaction_summary
+from database import after_commit
+import logging
+
+logger = logging.getLogger(__name__)
+
+async def _invalidate_summaries(user_ids, session=None):
+    # Inside a transaction, wait for the commit so a concurrent read
+    # cannot cache totals from before it again
+    if session is not None:
+        after_commit(session, lambda: _invalidate_summaries(user_ids))
+        return
+    for user_id in user_ids:
+        transaction_summary.invalidate(user_id)
+
+async def record_transactions(db, transactions: List[dict], session=None):
+    """Insert transaction rows and update the platform counters"""
+    if not transactions:
+        return
+    if len(transactions) == 1:
+        await db.transactions.insert_one(transactions[0], session=session)
+    else:
+        await db.transactions.insert_many(transactions, session=session)
+    await platform_metrics.increment(db, transaction_deltas(transactions), session=session)
+    await _invalidate_summaries({tx["user_id"] for tx in transactions}, session)
+
+async def record_transaction(db, transaction: dict, session=None):
+    """Insert a single transaction row and update the platform counters"""
+    await record_transactions(db, [transaction], session=session)
+
+async def set_transaction_status(db, query: dict, new_status, extra: Optional[dict] = None, session=None) -> Optional[dict]:
+    """Move the transaction matching ``query`` to ``new_status``
+
+    Returns the transaction as it was before the update, or None.
+    """
+    previous = await db.transactions.find_one_and_update(
+        query,
+        {"$set": {"status": new_status, **(extra or {})}},
+        projection={"_id": 0, "user_id": 1, "amount": 1, "status": 1},
+        return_document=ReturnDocument.BEFORE,
+        session=session
+    )
+    if previous:
+        await platform_metrics.increment(
+            db,
+            transaction_status_deltas(previous["amount"], previous["status"], new_status),
+            session=session
+        )
+        await _invalidate_summaries({previous["user_id"]}, session)
+    return previous
+
+async def set_transaction_statuses(db, transactions: List[dict], new_status, extra: Optional[Dict[Any, dict]] = None, session=None) -> int:
+    """Move pending transaction rows, already read, to ``new_status`` in one bulk write
+
+    ``transactions`` need ``_id``, ``user_id`` and ``amount``; ``extra``
+    maps a row's ``_id`` to further fields to set on it. Rows that are no
+    longer pending are left alone. Returns how many rows were updated.
+    """
+    if not transactions:
+        return 0
+    extra = extra or {}
+    result = await db.transactions.bulk_write(
+        [
+            UpdateOne(
+                {"_id": tx["_id"], "status": TransactionStatus.PENDING},
+                {"$set": {"status": new_status, **extra.get(tx["_id"], {})}}
+            )
+            for tx in transactions
+        ],
+        ordered=False,
+        session=session
+    )
+    deltas = {}
+    for tx in transactions:
+        for key, value in transaction_status_deltas(tx["amount"], TransactionStatus.PENDING, new_status).items():
+            deltas[key] = deltas.get(key, 0) + value
+    if result.modified_count == len(transactions):
+        await platform_metrics.increment(db, deltas, session=session)
+    else:
+        # A row changed under us; the periodic reconcile restores the counters
+        logger.warning(f"Updated {result.modified_count} of {len(transactions)} pending transactions")
+    await _invalidate_summaries({tx["user_id"] for tx in transactions}, session)
+    return result.modified_count
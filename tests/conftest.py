@@ -0,0 +1,6 @@
+import os
+import sys
+
+# The backend is run from its own directory and imports modules top-level
+# (``from services.money import ...``); do the same here
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "backend"))
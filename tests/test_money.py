@@ -0,0 +1,111 @@
+from decimal import Decimal, InvalidOperation
+
+import bson
+import numpy as np
+import pytest
+from bson.codec_options import CodecOptions
+from bson.decimal128 import Decimal128
+from pydantic import BaseModel, ValidationError
+
+from services.money import (
+    MAX_AMOUNT, Money, div_round_half_even, from_minor, minor_array, percent_of, percent_of_minor,
+    rate_array, rate_units, to_minor, to_money, type_registry
+)
+
+class Amount(BaseModel):
+    amount: Money
+
+@pytest.mark.parametrize("numerator, denominator, expected", [
+    (4, 2, 2),
+    (5, 2, 2),    # 2.5 -> 2
+    (7, 2, 4),    # 3.5 -> 4
+    (-5, 2, -2),  # -2.5 -> -2
+    (-7, 2, -4),  # -3.5 -> -4
+    (1, 3, 0),
+    (2, 3, 1),
+    (-2, 3, -1),
+])
+def test_div_round_half_even(numerator, denominator, expected):
+    assert div_round_half_even(numerator, denominator) == expected
+
+def test_div_round_half_even_on_arrays():
+    numerators = np.array([5, 7, 15, -5, 1, 2], dtype=np.int64)
+    assert div_round_half_even(numerators, 2).tolist() == [2, 4, 8, -2, 0, 1]
+
+def test_to_money_reads_floats_by_their_shortest_repr():
+    assert to_money(0.1 + 0.2) == Decimal("0.30")
+    # 2.675 is stored as 2.67499999..., but it was written as 2.675
+    assert to_money(2.675) == Decimal("2.68")
+    assert to_money(2.665) == Decimal("2.66")
+
+def test_to_money_accepts_stored_and_legacy_types():
+    assert to_money(Decimal128("1.005")) == Decimal("1.00")
+    assert to_money(Decimal128("1.015")) == Decimal("1.02")
+    assert to_money(7) == Decimal("7.00")
+    assert to_money("12.345") == Decimal("12.34")
+    assert str(to_money(1)) == "1.00"
+
+def test_to_money_oversized_input():
+    with pytest.raises(InvalidOperation):
+        to_money(Decimal("1e30"))
+
+def test_money_field_rejects_out_of_range_values():
+    for value in (1e30, "1e400", MAX_AMOUNT + Decimal("0.01"), -MAX_AMOUNT - 1):
+        with pytest.raises(ValidationError):
+            Amount(amount=value)
+    assert Amount(amount=MAX_AMOUNT).amount == MAX_AMOUNT
+    assert Amount(amount=-MAX_AMOUNT).amount == -MAX_AMOUNT
+
+def test_money_field_serializes_to_json_number():
+    assert Amount(amount="10.005").model_dump_json() == '{"amount":10.0}'
+    assert Amount(amount=0.1).model_dump() == {"amount": Decimal("0.10")}
+
+def test_minor_units_round_trip():
+    assert to_minor("12.34") == 1234
+    assert from_minor(1234) == Decimal("12.34")
+    assert from_minor(np.int64(-5)) == Decimal("-0.05")
+    assert rate_units(12.5) == 125000
+    assert rate_units(3.3333) == 33333
+
+def test_percent_of_rounds_once_half_even():
+    assert percent_of(Decimal("0.10"), 5) == Decimal("0.00")  # 0.005 -> 0.00
+    assert percent_of(Decimal("0.30"), 5) == Decimal("0.02")  # 0.015 -> 0.02
+    assert percent_of(0.3, 5) == Decimal("0.02")
+    # 100 * 5% * 30 / 365 = 0.4109...
+    assert percent_of(100, 5, 30, 365) == Decimal("0.41")
+    assert percent_of(1000, 10, 365, 365) == Decimal("100.00")
+
+def test_percent_of_does_not_overflow():
+    # Python ints, well past what an int64 could hold
+    assert percent_of(10 ** 20, 12.5) == Decimal("12500000000000000000.00")
+
+def test_percent_of_minor_matches_percent_of():
+    amounts = [Decimal("0.10"), Decimal("0.30"), Decimal("1234.56"), Decimal("999999.99")]
+    rates = [5, 5, 12.5, 3.3333]
+    shares = percent_of_minor(minor_array(amounts), rate_array(rates))
+    assert [from_minor(share) for share in shares] == [percent_of(a, r) for a, r in zip(amounts, rates)]
+
+def test_percent_of_minor_with_periods_matches_percent_of():
+    amounts = [Decimal("1000.00"), Decimal("0.30"), MAX_AMOUNT, MAX_AMOUNT]
+    rates = [12, 5, 100, 3.3333]
+    days = [30, 365, 100000, 3651]
+    shares = percent_of_minor(minor_array(amounts), rate_array(rates), np.array(days), 365)
+    assert [from_minor(share) for share in shares] == [
+        percent_of(a, r, d, 365) for a, r, d in zip(amounts, rates, days)
+    ]
+
+def test_minor_array_is_exact_up_to_max_amount():
+    values = [float(MAX_AMOUNT - Decimal("0.01")), 0.1, 0.29, 1e-2]
+    assert minor_array(values).tolist() == [to_minor(value) for value in values]
+
+def test_percent_of_minor_fits_int64_at_max_amount():
+    minor = minor_array([MAX_AMOUNT, -MAX_AMOUNT])
+    # A 100% rate returns the amount itself; the product stays below 2**63
+    assert percent_of_minor(minor, rate_array([100, 100])).tolist() == minor.tolist()
+    assert int(minor[0]) * 100 * 10 ** 4 < 2 ** 63
+
+def test_decimal_codec_round_trips_through_bson():
+    options = CodecOptions(type_registry=type_registry)
+    encoded = bson.encode({"amount": Decimal("12.30")}, codec_options=options)
+    assert bson.decode(encoded)["amount"] == Decimal128("12.30")
+    assert bson.decode(encoded, codec_options=options)["amount"] == Decimal("12.30")
@@ -0,0 +1,45 @@
+import asyncio
+import base64
+from datetime import datetime
+
+import pytest
+from bson import ObjectId, Regex
+from fastapi import HTTPException
+
+from services.pagination import decode_cursor, encode_cursor, keyset_page
+
+def raw_cursor(text: str) -> str:
+    return base64.urlsafe_b64encode(text.encode()).decode()
+
+@pytest.mark.parametrize("cursor", [
+    raw_cursor('{"$oid": "zz"}'),
+    raw_cursor('{"$numberDecimal": "abc"}'),
+    raw_cursor('{"$binary": "zz"}'),
+    raw_cursor('{"$date": "zz"}'),
+    raw_cursor('{"$date": 1e400}'),
+    raw_cursor("[" * 5000),
+    "not base64!",
+    5,
+])
+def test_decode_cursor_rejects_malformed_input(cursor):
+    with pytest.raises(HTTPException) as error:
+        decode_cursor(cursor)
+    assert error.value.status_code == 400
+
+def test_cursor_round_trips():
+    # BSON dates decode as naive UTC, which the server compares the same way
+    value = [datetime(2024, 1, 2, 3, 4, 5), ObjectId()]
+    assert decode_cursor(encode_cursor(value)) == value
+
+@pytest.mark.parametrize("last", [
+    [{"$ne": None}, ObjectId()],
+    [Regex("a"), ObjectId()],
+    [True, ObjectId()],
+    ["2024-01-01", None],
+    ["2024-01-01"],
+])
+def test_keyset_page_rejects_non_scalar_sort_keys(last):
+    # Rejected before the collection is touched
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(keyset_page(None, {}, "created_at", encode_cursor(last), 10))
+    assert error.value.status_code == 400